@@ -9,9 +9,16 @@ zs. elter, a. cserkaszky 2019
 import os
 import math
 import re
+import zlib
+import json
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import matplotlib.pyplot as plt
 from feign.geometry import *
+from feign import tracing
+from feign.cache import TraceCache, traceMemory
+from feign.xcom import MuTable, tableCache, interpolate, open_library
 
 
 def isFloat(s):
@@ -37,20 +44,11 @@ def readMu(path,column,energy):
     Returns
     -------
     float or list of floats
-        the interpolated value(s) of the attenuaton coefficient.
+        the interpolated value(s) of the attenuaton coefficient (log-log
+        interpolation with absorption edges, see :class:`feign.xcom.MuTable`).
+        The parsed file is kept in :data:`feign.xcom.tableCache`.
     """
-    try:
-        inputfile=open(path,'r').readlines()
-    except FileNotFoundError:
-        inputfile=open(os.getcwd()+path,'r').readlines()
-    en=[]
-    mu=[]
-    for line in inputfile:
-        x=line.strip().split()
-        if len(x)>=1 and isFloat(x[0]):
-            en.append(float(x[0]))
-            mu.append(float(x[column]))
-    return np.interp(energy,en,mu)
+    return tableCache.get(path,column)(energy)
 
 
 def is_hex_color(input_string):
@@ -132,6 +130,9 @@ class Material(object):
         density of material in (g/cm3)
     path : str
         path to attenuation coefficient file
+    entry : str
+        name of the attenuation coefficient table in the library of the Experiment
+        (see :meth:`Experiment.set_library()`), used instead of path if set
     color : str
         color of material when plotting
     """
@@ -141,6 +142,7 @@ class Material(object):
     def __init__(self, *args, **kwargs):
         self._density = None
         self._path = None
+        self._entry = None
         self._color = None
         self._id = getID(self._idName, args, kwargs)
 
@@ -155,6 +157,10 @@ class Material(object):
     def path(self):
         return self._path
 
+    @property
+    def entry(self):
+        return self._entry
+
     @property
     def color(self):
         return self._color
@@ -186,6 +192,20 @@ class Material(object):
         else:
             raise ValueError(('Path has to be (str,int) tuple for Material ID="{}"'.format(self._id)))
 
+    def set_entry(self, entry=None):
+        """The function to set the name of the attenuation data of the Material
+        in the library of the Experiment (see :meth:`Experiment.set_library()`).
+
+        Parameters
+        ----------
+        entry : str
+            name of the entry, eg. 'UO2' for a library packed from data/UO2.dat
+        """
+        if isinstance(entry, str):
+            self._entry=entry
+        else:
+            raise ValueError(('Entry has to be str for Material ID="{}"'.format(self._id)))
+
     def set_color(self, color=None):
         """The function to set the color of Material in case the geometry is plotted.
 
@@ -339,7 +359,7 @@ class Assembly(object):
         fuelmap to describe which pins are filled in the positions
     coolant : str
         :attr:`Material._id` of the coolant (ie. materal filled between pins)
-    pool : Rectangle() (optional)
+    pool : Rectangle() or Polygon() (optional)
         pool in which the assembly is placed. Within the pool coolant material is
         filled, outside the pool surrounding material is filled.
     surrounding : str (mandatory if pool is present)
@@ -579,13 +599,13 @@ class Assembly(object):
 
         Parameters
         ----------
-        pool : Rectangle()
+        pool : Rectangle() or Polygon()
             the shape of the pool
         """
-        if isinstance(pool,Rectangle):
+        if isinstance(pool,Polygon):
             self._pool=pool
         else:
-            raise TypeError('Pool has to be a Rectangle() object')
+            raise TypeError('Pool has to be a Rectangle() or Polygon() object')
 
     def checkComplete(self):
         """
@@ -643,10 +663,7 @@ class Assembly(object):
                 print('ERROR: Pool is inside fuel')
                 return False
 
-        if len(pooldummy.intersection(self.pool.p1p2))>1 or \
-              len(pooldummy.intersection(self.pool.p2p3))>1 or \
-              len(pooldummy.intersection(self.pool.p3p4))>1 or \
-              len(pooldummy.intersection(self.pool.p4p1))>1:
+        if True in [len(pooldummy.intersection_params(side))>1 for side in self.pool.sides]:
             print('ERROR: Assembly does not fit in pool')
             return False
 
@@ -728,7 +745,7 @@ class Absorber(object):
     ----------
     _id : str
         ID of the absorber
-    form : Rectangle() or Circle()
+    form : Rectangle(), Polygon() or Circle()
         the shape of the absorber
     material : str
         :attr:`Material._id` of the Material the absorber is made of
@@ -766,13 +783,13 @@ class Absorber(object):
 
         Parameters
         ----------
-        form : Rectangle() or Circle()
+        form : Rectangle(), Polygon() or Circle()
             shape of the absorber
         """
-        if isinstance(form,Rectangle) or isinstance(form,Circle):
+        if isinstance(form,Polygon) or isinstance(form,Circle):
             self._form=form
         else:
-            raise TypeError('Absorber has to be a Rectangle or Circle object')
+            raise TypeError('Absorber has to be a Rectangle, Polygon or Circle object')
 
     def set_material(self, material=None):
         """The function to set the material of Absorber
@@ -868,7 +885,7 @@ class Collimator(object):
 
         if self._back is None:
             self._front=front
-        elif len(self._back.intersection(front))>0:
+        elif len(self._back.intersection_params(front))>0:
             raise ValueError('Collimator back and front should not intersect')
         else:
             self._front=front
@@ -887,7 +904,7 @@ class Collimator(object):
 
         if self._front is None:
             self._back=back
-        elif len(self._front.intersection(back))>0:
+        elif len(self._front.intersection_params(back))>0:
             raise ValueError('Collimator back and front should not intersect')
         else:
             self._back=back
@@ -905,6 +922,205 @@ class Collimator(object):
         else:
             raise ValueError(('Color has to be hex str for Material ID="{}"'.format(self._id)))
 
+    def acceptance(self,location):
+        """The function to compute the region from which gamma rays pass through
+        the Collimator to a detector location, as the intersection of six half-planes
+        (three for seeing the location through the front, three through the back).
+
+        Parameters
+        ----------
+        location : Point()
+          location of the detector
+
+        Returns
+        -------
+        numpy.ndarray, shape (6,3) or None
+          rows (nx,ny,c) of the half-planes nx*x+ny*y<=c (see :func:`feign.geometry.halfplanes_contain`),
+          None if the location is on the line of the front or the back.
+        """
+        front=view_halfplanes(location,self._front)
+        back=view_halfplanes(location,self._back)
+        if front is None or back is None:
+            return None
+        return np.vstack([front,back])
+
+#Experiment of the worker processes of Experiment.Run(workers=...)
+_workerExperiment=None
+
+def _initWorker(experiment):
+    """Initializer of the worker processes, the Experiment is received once per process."""
+    global _workerExperiment
+    _workerExperiment=experiment
+
+def _workerUnit(k,name,seed,sourceNorm):
+    """The function to calculate a work unit (random sample k, detector name) in a worker process."""
+    experiment=_workerExperiment
+    result=experiment._runUnit(k,name,{name: None},{},seed,sourceNorm,verbose=False)
+    #the stages are sent back to be reused in the next runs of the calling process
+    return result,experiment._exportStages(k,name,seed)
+
+def sampleMoments(samples):
+    """The function to compute the count, the sum and the sum of squared
+    deviations from the mean of samples (along the first axis).
+
+    Parameters
+    ----------
+    samples : numpy.ndarray
+        the samples, first axis is the sample index
+
+    Returns
+    -------
+    tuple
+        (count, sum, sum of squared deviations)
+    """
+    samples=np.asarray(samples,dtype=float)
+    total=np.sum(samples,axis=0)
+    mean=total/len(samples)
+    return len(samples),total,np.sum((samples-mean)**2,axis=0)
+
+def mergeMoments(parts):
+    """The function to merge (count, sum, sum of squared deviations) tuples of
+    disjoint sets of samples, and compute the mean and the std (as numpy.std) of
+    all the samples.
+
+    Parameters
+    ----------
+    parts : list of tuples
+        (count, sum, sum of squared deviations) of the sets of samples
+
+    Returns
+    -------
+    tuple
+        (mean, std) of all the samples
+    """
+    n,total,m2=parts[0]
+    for nb,totalb,m2b in parts[1:]:
+        delta=totalb/nb-total/n
+        m2=m2+m2b+delta**2*n*nb/(n+nb)
+        total=total+totalb
+        n=n+nb
+    return total/n,np.sqrt(m2/n)
+
+class RunningMoments(object):
+    """A class used to represent the running moments of samples which are added
+    one by one (Welford's algorithm), thus the samples do not need to be kept.
+
+    The mean is the running sum divided by the count (as numpy.mean along the
+    first axis), the sum of squared deviations from the mean is updated with
+    Welford's algorithm.
+
+    Attributes
+    ----------
+    count : int
+        number of the samples
+    mean : numpy.ndarray
+        mean of the samples
+    std : numpy.ndarray
+        standard deviation of the samples (as numpy.std)
+
+    Examples
+    --------
+    >>> moments=RunningMoments()
+    >>> for sample in [1.0,2.0,4.0]:
+    ...     moments.add(sample)
+    >>> moments.mean, moments.std
+    (2.3333333333333335, 1.247219128924647)
+    """
+    def __init__(self):
+        self._count=0
+        self._total=None
+        self._mean=None
+        self._m2=None
+
+    def __repr__(self):
+        return "RunningMoments(count=%d)"%(self._count)
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def mean(self):
+        return self._total/self._count
+
+    @property
+    def std(self):
+        return np.sqrt(self._m2/self._count)
+
+    def add(self,sample):
+        """The function to add a sample (float or numpy.ndarray of the same shape
+        for every sample)."""
+        sample=np.array(sample,dtype=float)
+        self._count+=1
+        if self._count==1:
+            self._total=sample.copy()
+            self._mean=sample
+            self._m2=np.zeros_like(sample)
+        else:
+            self._total+=sample
+            delta=sample-self._mean
+            self._mean=self._mean+delta/self._count
+            self._m2+=delta*(sample-self._mean)
+
+    def moments(self):
+        """The function to get the (count, sum, sum of squared deviations) tuple
+        of the samples, which can be merged with :func:`mergeMoments`."""
+        return self._count,self._total,self._m2
+
+#Symmetry operations of the square (rotations by 0,90,180,270 deg and mirrors)
+#as (a,b,c,d) matrices mapping (x,y) to (a*x+b*y,c*x+d*y)
+symmetryOps=[(1,0,0,1),(0,-1,1,0),(-1,0,0,-1),(0,1,-1,0),
+             (1,0,0,-1),(-1,0,0,1),(0,1,1,0),(0,-1,-1,0)]
+
+def mapPoint(op,P):
+    """The function to map a Point with a symmetry operation.
+
+    Parameters
+    ----------
+    op : tuple
+        (a,b,c,d) matrix of the operation, see :data:`symmetryOps`
+    P : Point()
+        the Point to be mapped
+
+    Returns
+    -------
+    Point()
+        the image of the Point
+    """
+    return Point(op[0]*P.x+op[1]*P.y,op[2]*P.x+op[3]*P.y)
+
+def isImage(op,shape,other):
+    """The function to assess whether a shape (Point, Segment, Circle or Polygon)
+    is mapped onto an other shape by a symmetry operation.
+
+    Parameters
+    ----------
+    op : tuple
+        (a,b,c,d) matrix of the operation, see :data:`symmetryOps`
+    shape : Point(), Segment(), Circle() or Polygon()
+        the shape to be mapped
+    other : Point(), Segment(), Circle() or Polygon()
+        the shape which is compared with the image
+
+    Returns
+    -------
+    bool
+        True if the image of shape is the same as other (the order of the
+        end points or corners does not matter), False otherwise
+    """
+    def samePoints(ps,qs):
+        return len(ps)==len(qs) and all(True in [p.isEqual(q) for q in qs] for p in ps)
+    if isinstance(shape,Point):
+        return isinstance(other,Point) and mapPoint(op,shape).isEqual(other)
+    elif isinstance(shape,Segment):
+        return isinstance(other,Segment) and samePoints([mapPoint(op,shape.p),mapPoint(op,shape.q)],[other.p,other.q])
+    elif isinstance(shape,Circle):
+        return isinstance(other,Circle) and mapPoint(op,shape.c).isEqual(other.c) and abs(shape.r-other.r)<eps
+    elif isinstance(shape,Polygon):
+        return isinstance(other,Polygon) and samePoints([mapPoint(op,c) for c in shape.corners],other.corners)
+    else:
+        return False
+
 class Experiment(object):
     """A class used to represent an Experiment. An experiment is a complete passive
     gamma spectroscopy measurment setup with an assembly and detectors (absorbers
@@ -930,8 +1146,10 @@ class Experiment(object):
         each material in the problem.
     sourcePoints : list
         List of pin-wise source point locations for each random sample. Each list element is a 
-        dictionary, where the keys are :attr:`Detector._id` identifiers and the values are 2D numpy
-        arrays storing Point() objects
+        dictionary, where the keys are :attr:`Detector._id` identifiers and the values are NxM
+        shaped PointArray() objects (NaN at positions without source material).
+        Only kept if :attr:`keepSamples` is set, otherwise None (as the other lists of all
+        random samples: dTmaps, contributionMaps, contributionMapAves, geomEffs, geomEffAves).
     dTmap : dict of dictionaries of 2D numpy arrays
         The average distance travelled by a gamma-ray from a lattice position to a detector
         given for each material in the problem. Outer keys are :attr:`Detector._id` identifiers,
@@ -1001,6 +1219,18 @@ class Experiment(object):
         detectors.
     output : str, optional
       filename (and path) where to print the geometric efficiency
+    engine : str
+      implementation of :meth:`Experiment.distanceTravelled()`, 'loop' or 'vectorized'
+    symmetry : bool
+      whether the travelled distances of symmetric detectors are derived from each other
+    seed : int, optional
+      base seed of the random streams of the work units, see :meth:`Experiment.Run()`
+    cache : TraceCache(), optional
+      directory where the traced distances are cached, see :meth:`Experiment.set_cache()`
+    library : Library(), optional
+      library of attenuation coefficient tables, see :meth:`Experiment.set_library()`
+    keepSamples : bool
+      whether the results of all random samples are kept, see :meth:`Experiment.set_keep_samples()`
 
     Note
     ----
@@ -1055,6 +1285,15 @@ class Experiment(object):
         self._geomEffAveErr=None
         self._geomEffAves=None
         self._randomNum=1
+        self._engine='loop'
+        self._symmetry=True
+        self._seed=None
+        self._sceneIndex=None
+        self._pinCache={}
+        self._stages={}
+        self._cache=None
+        self._library=None
+        self._keepSamples=False
 
     def __repr__(self):
         return "Experiment()"
@@ -1159,6 +1398,30 @@ class Experiment(object):
     def randomNum(self):
         return self._randomNum
 
+    @property
+    def engine(self):
+        return self._engine
+
+    @property
+    def symmetry(self):
+        return self._symmetry
+
+    @property
+    def seed(self):
+        return self._seed
+
+    @property
+    def cache(self):
+        return self._cache
+
+    @property
+    def library(self):
+        return self._library
+
+    @property
+    def keepSamples(self):
+        return self._keepSamples
+
     def set_random(self,randomNum=1):
         """The function to set number of random source locations per pin.
 
@@ -1169,9 +1432,119 @@ class Experiment(object):
         """
         if isinstance(randomNum, int):
             self._randomNum=randomNum
+            self._invalidate()
         else:
             raise TypeError('Has to be int')
 
+    def set_engine(self,engine='loop'):
+        """The function to set the implementation used to calculate the travelled
+        distances.
+
+        Parameters
+        ----------
+        engine : str
+          'loop' traces the rays one by one, 'vectorized' traces all the rays to a
+          detector with array operations (see the :mod:`feign.tracing` module). The
+          results are the same, but the 'vectorized' engine does not warn about
+          absorbers around the source and does not check for degenerate absorber
+          intersections.
+        """
+        if engine in ['loop','vectorized']:
+            self._engine=engine
+            self._invalidate()
+        else:
+            raise ValueError("Engine has to be 'loop' or 'vectorized'")
+
+    def set_symmetry(self,symmetry=True):
+        """The function to set whether symmetries are used to derive the travelled
+        distances of a detector from an already computed one (see :meth:`Experiment.symmetricImage()`).
+
+        Parameters
+        ----------
+        symmetry : bool
+          True if symmetries are used, False otherwise.
+        """
+        if isinstance(symmetry,bool):
+            self._symmetry=symmetry
+        else:
+            raise TypeError('Has to be bool')
+
+    def set_seed(self,seed=None):
+        """The function to set the base seed of the random streams of the
+        work units of :meth:`Experiment.Run()`.
+
+        Parameters
+        ----------
+        seed : int or None
+          base seed. If None, it is drawn from the global numpy random stream
+          at the beginning of each run.
+        """
+        if seed is None or isinstance(seed,int):
+            self._seed=seed
+            self._invalidate()
+        else:
+            raise TypeError('Has to be int or None')
+
+    def set_cache(self,directory=None,maxBytes=None):
+        """The function to set the directory where the traced distances are cached
+        between runs and processes. The entries are identified by a hash of the geometry
+        they depend on (the fuelmap, the pins, the pitch, the pool, the collimator and
+        the location of the detector, and the seed of the sample if the source locations
+        are random), thus changes of the energy lines or the densities still hit the cache.
+        The distances within the absorbers are cached separately for each absorber.
+
+        Parameters
+        ----------
+        directory : str or None
+          path of the cache directory (see :class:`feign.cache.TraceCache`). If None,
+          no cache is used.
+        maxBytes : int, optional
+          upper limit of the size of the cache, the least recently used entries are
+          removed above it. By default the size is unlimited.
+        """
+        if directory is None:
+            self._cache=None
+        elif isinstance(directory,str):
+            self._cache=TraceCache(directory,maxBytes)
+        else:
+            raise TypeError('Cache directory has to be str or None')
+
+    def set_keep_samples(self,keepSamples=False):
+        """The function to set whether the results of all random samples are kept
+        in :attr:`sourcePoints`, :attr:`dTmaps`, :attr:`contributionMaps`,
+        :attr:`contributionMapAves`, :attr:`geomEffs` and :attr:`geomEffAves`.
+        By default only the running mean and std of the samples are kept (see
+        :class:`RunningMoments`), thus the memory does not grow with :attr:`randomNum`.
+
+        Parameters
+        ----------
+        keepSamples : bool
+          whether the samples are kept
+        """
+        if isinstance(keepSamples,bool):
+            self._keepSamples=keepSamples
+        else:
+            raise TypeError('keepSamples has to be bool')
+
+    def set_library(self,path=None):
+        """The function to set the library of attenuation coefficient tables
+        (written by :func:`feign.xcom.pack`, or by ``python -m feign.xcom pack``).
+        Materials with an entry (see :meth:`Material.set_entry()`) take their
+        attenuation coefficients from the library, the other materials from their path.
+        The library is memory-mapped and shared by the Experiments of the process.
+
+        Parameters
+        ----------
+        path : str or None
+          path of the library file. If None, no library is used.
+        """
+        if path is None:
+            self._library=None
+        elif isinstance(path,str):
+            self._library=open_library(path)
+        else:
+            raise TypeError('Library path has to be str or None')
+
     def set_output(self,output='output.dat'):
         """The function to set the output file for printing the geometric efficiency
 
@@ -1248,6 +1621,7 @@ class Experiment(object):
             raise TypeError('Inputs need to be Material() objects')
 
         addIDsToDict(self._materials, *argv)
+        self._invalidate()
 
     def remove_material(self,*argv):
         """The function to remove Material objects from an Experiment which
@@ -1283,6 +1657,7 @@ class Experiment(object):
             raise TypeError('Inputs need to be Material() objects')
 
         delIDsFromDict(self._materials, *argv)
+        self._invalidate()
 
     def set_absorbers(self,*argv):
         """The function to include Absorber objects in an Experiment
@@ -1347,6 +1722,7 @@ class Experiment(object):
             raise TypeError('Inputs need to be Absorber() objects')
 
         addIDsToDict(self._absorbers, *argv)
+        self._sceneIndex=None
 
     def remove_absorber(self,*argv):
         """The function to remove Absorber objects from an Experiment which
@@ -1382,6 +1758,7 @@ class Experiment(object):
             raise TypeError('Inputs need to be Absorber() objects')
 
         delIDsFromDict(self._absorbers, *argv)
+        self._sceneIndex=None
 
     def set_detectors(self,*argv):
         """The function to include Detector objects in an Experiment
@@ -1410,6 +1787,7 @@ class Experiment(object):
             if the Detector is already included
         """
         self._detectors={}
+        self._invalidate()
         self.add_detector(*argv)
 
     def add_detector(self,*argv):
@@ -1446,6 +1824,7 @@ class Experiment(object):
             raise TypeError('Inputs need to be Detector() objects')
 
         addIDsToDict(self._detectors, *argv)
+        self._sceneIndex=None
 
     def remove_detector(self,*argv):
         """The function to remove Detector objects from an Experiment which
@@ -1481,6 +1860,8 @@ class Experiment(object):
             raise TypeError('Inputs need to be Detector() objects')
 
         delIDsFromDict(self._detectors, *argv)
+        self._invalidate([detector._id for detector in argv])
+        self._sceneIndex=None
 
     def set_assembly(self,assembly=None):
         """The function to include Assembly in an Experiment
@@ -1494,6 +1875,8 @@ class Experiment(object):
         if isinstance(assembly,Assembly):
             self._assembly=assembly
             self._pins=self._assembly.pins
+            self._sceneIndex=None
+            self._invalidate()
         else:
             raise ValueError('Assembly has to be an Assembly() object')
 
@@ -1526,126 +1909,526 @@ class Experiment(object):
             Outer keys are energies as defined in :attr:`elines`,
             inner keys are :attr:`Material._id` identifiers.
         """
-        mu={e: {m: 0 for m in self.materials} for e in self._elines}
+        #materials sharing a file are parsed once (see feign.xcom.tableCache)
+        tables={}
+        for m,material in self.materials.items():
+            if material.entry is not None:
+                if self._library is None:
+                    raise ValueError('Library is not set for the entry of Material ID="{}"'.format(m))
+                tables[m]=self._library[material.entry]
+            else:
+                tables[m]=tableCache.get(material.path[0],material.path[1])
+        mum=interpolate(tables,self.elines)
+        self._mu={e: {m: mum[k,ei] for k,m in enumerate(tables)} for ei,e in enumerate(self._elines)}
+
+    def _buildSceneIndex(self):
+        """The function to build the spatial index (:class:`ShapeIndex`) over the
+        absorbers and the pool, which is used to skip the objects far from a ray
+        in :meth:`Experiment.distanceTravelled()`. The collimators are not indexed,
+        the rays are checked against the collimator of the traced detector (which
+        may be moved, see :meth:`Experiment.Scan()`).
+
+        The shapes may be changed without the setters of the Experiment (eg. with
+        :meth:`Absorber.set_form()`), thus the index is kept only if it contains
+        the same shapes (the geometry objects are immutable and compared by value).
 
-        for m in self.materials:
-            mum=readMu(self.materials[m].path[0],self.materials[m].path[1],self.elines)
-            for ei,mui in zip(self._elines,mum):
-                mu[ei][m]=mui
+        Returns
+        -------
+        ShapeIndex()
+            the up-to-date index
+        """
+        shapes={}
+        if self.absorbers is not None:
+            for absorber in self.absorbers.values():
+                shapes[('absorber',absorber._id)]=absorber.form
+        if self.assembly is not None and self.assembly.pool is not None:
+            shapes[('pool',None)]=self.assembly.pool
+        if self._sceneIndex is None or self._sceneIndex.shapes!=shapes:
+            self._sceneIndex=ShapeIndex(shapes)
+        return self._sceneIndex
+
+    def _pinSignature(self):
+        """The function to describe everything the pin tables depend on (the
+        materials, the pin types and the fuelmap), see :meth:`Experiment._chordTables()`
+        and :meth:`Experiment._pinTables()`."""
+        pins=tuple((pin._id,tuple(pin._radii),tuple(pin._materials)) for pin in self.pins.values())
+        return (tuple(self.materials),pins,tuple(tuple(row) for row in self.assembly.fuelmap))
+
+    def _cachedPinTables(self,name,build):
+        """The function to get the pin tables name, which are built by build()
+        only if the pins have changed since they were last built."""
+        signature=self._pinSignature()
+        entry=self._pinCache.get(name)
+        if entry is None or entry[0]!=signature:
+            entry=(signature,build())
+            self._pinCache[name]=entry
+        return entry[1]
+
+    def _chordTables(self):
+        """The function to prepare the data of the pin types for the chord length
+        calculation in :meth:`Experiment.distanceTravelled()`. The tables are
+        built once and kept until the pins change.
 
-        self._mu=mu
-#        OLD, nicer but more file reading.
-#        for e in self._elines:
-#            mu[e]={key: readMu(self.materials[key].path[0],self.materials[key].path[1],float(e)) for key in self.materials}
-#        self._mu=mu
+        Returns
+        -------
+        dict
+            Keys are pin identifiers, values are (radii, materials, incidence) tuples,
+            where radii is an array of the region radii, materials is the list of
+            distinct materials in the pin, and incidence is a (regions x materials)
+            matrix of 0 and 1 to sum up the region-wise chords material-wise.
+        """
+        def build():
+            tables={}
+            for key,pin in self.pins.items():
+                mats=list(dict.fromkeys(pin._materials))
+                incidence=np.zeros((len(pin._materials),len(mats)))
+                for k,mat in enumerate(pin._materials):
+                    incidence[k,mats.index(mat)]=1.0
+                tables[key]=(np.array(pin._radii,dtype=float),mats,incidence)
+            return tables
+        return self._cachedPinTables('chord',build)
+
+    def _sourceLocations(self,rng=None):
+        """The function to get the source locations of the pins containing source
+        material (randomly sampled within the innermost region if :attr:`randomNum`
+        is not 1, from rng or from the global numpy random stream).
 
-    def distanceTravelled(self,detector):
+        Returns
+        -------
+        ii : numpy.ndarray of int
+            row indices of the source pins (row by row)
+        jj : numpy.ndarray of int
+            column indices of the source pins
+        sources : numpy.ndarray, shape (S,2)
+            coordinates of the source locations
+        """
+        N=self.assembly.N
+        M=self.assembly.M
+        p=self.assembly.pitch/2
+        isSource=np.array([[True in [s in self.pins[self.assembly.fuelmap[i][j]]._materials for s in self.assembly.source]
+                            for j in range(M)] for i in range(N)])
+        ii,jj=np.nonzero(isSource)
+        sources=np.stack([-p*(M-1)+jj*2*p,p*(N-1)-ii*2*p],axis=1)
+        #TODO: might wanna handle cases when the source is not the innermost circle?
+        if self.randomNum != 1:
+            #uniform location in the innermost region, two random numbers for each pin
+            if rng is None:
+                rng=np.random
+            u=rng.uniform(size=(len(sources),2))
+            length=np.array([self.pins[self.assembly.fuelmap[i][j]]._radii[0] for i,j in zip(ii,jj)])*np.sqrt(u[:,0])
+            angle=np.pi*(2*u[:,1])
+            sources=sources+np.stack([length*np.cos(angle),length*np.sin(angle)],axis=1)
+        return ii,jj,sources
+
+    def _acceptedSources(self,detector,sources):
+        """The function to classify the source locations with the acceptance
+        region of the Collimator of a detector (see :meth:`Collimator.acceptance()`).
+        The classification is conservative (rays passing close to the edges of
+        the slit are accepted), the accepted rays still need to be checked.
+
+        Returns
+        -------
+        numpy.ndarray of bool
+            False for sources from which the rays surely do not pass through the Collimator.
+        """
+        if detector.collimator is not None:
+            planes=detector.collimator.acceptance(detector.location)
+            if planes is not None:
+                return halfplanes_contain(sources,planes,tol=1e-4)
+        return np.ones(len(sources),dtype=bool)
+
+    def distanceTravelled(self,detector,rng=None):
         """The function to calculate the distanced travelled in any material
         by a gamma ray emitted from any pin positions of the Assembly to a detector
 
         Parameters
         ----------
         detector : Detector()
+        rng : numpy.random.Generator, optional
+            random stream to sample the source locations (if :attr:`randomNum` is not 1),
+            by default the global numpy random stream (np.random)
         
         Returns
         -------
         dTmap : dict
             The travelled distance in various materials. Keys are material identifiers,
             values are pin-wise distance values.
-        sourcePoint : numpy array
-            Pin-wise source location in the given calculation. 
+        sourcePoint : PointArray()
+            Pin-wise source location in the given calculation (NaN at positions
+            without source material).
+        """
+        dTmap,sourcePoint=self._traceBase(detector,rng)
+        if self.absorbers is not None:
+            absorbers=list(self.absorbers.values())
+            self._addAbsorbers(dTmap,self._absorberDistances(detector,dTmap,sourcePoint,absorbers))
+        return dTmap,sourcePoint
+
+    def _traceBase(self,detector,rng=None,sample=None):
+        """The function to calculate the distanced travelled in the materials of
+        the Assembly (pins, coolant, pool and surrounding) by gamma rays emitted from
+        the pin positions to a detector, without the absorbers. Returns the same as
+        :meth:`Experiment.distanceTravelled()`. If sample is given (as returned by
+        :meth:`Experiment._sourceLocations()`), its source locations are used.
         """
+        if self._engine=='vectorized':
+            return self._traceVectorized(detector,rng,sample)
         dTmap={key: np.zeros((self.assembly.N,self.assembly.M)) for key in self.materials}
-        #sourcePoint=np.array([[0 for i in range(self.assembly.N)] for j in range(self.assembly.M)])
-        sourcePoint=np.empty((self.assembly.N,self.assembly.M),dtype=object)
+        chordTables=self._chordTables()
+        #source coordinates, NaN at positions without source
+        sourceX=np.full((self.assembly.N,self.assembly.M),np.nan)
+        sourceY=np.full((self.assembly.N,self.assembly.M),np.nan)
         #create distance seen maps for each material
         p=self.assembly.pitch/2
         N=self.assembly.N
         M=self.assembly.M
-        for i in range(N):
-            for j in range(M):
-                sourceIn=[s in self.pins[self.assembly.fuelmap[i][j]]._materials for s in self.assembly.source]
-                if True in sourceIn:                     
+        rows,cols,sources=self._sourceLocations(rng) if sample is None else sample
+        #sources which cannot see the detector through the collimator are rejected at once
+        accepted=self._acceptedSources(detector,sources)
+        for i,j,(x,y),acc in zip(rows,cols,sources,accepted):
+            dT={key: 0 for key in self.materials} #dict to track distances travelled in each material for a given pin
+            centerSource=Point(x,y)
+            sourceX[i][j]=centerSource.x
+            sourceY[i][j]=centerSource.y
+            if not acc: #the source cannot see the detector through the collimator
+                for key in dT:
+                    dTmap[key][i][j]=np.Inf
+                continue
+            segmentSourceDetector=Segment(centerSource,detector.location)
+            distSourceDetector=Point.distance(centerSource,detector.location)
+            #Only track rays which pass through the collimator
+            if detector.collimator is None or (len(detector.collimator.front.intersection_params(segmentSourceDetector))==1 and
+               len(detector.collimator.back.intersection_params(segmentSourceDetector))==1):
+
+               ###Distances traveled in other pin positions
+                ###the chords depend only on the distance of the ray from the pin
+                ###center (impact parameter) and on the radii of the pin type,
+                ###thus they are computed for each pin type in one call.
+                ux=(detector.location.x-centerSource.x)/distSourceDetector
+                uy=(detector.location.y-centerSource.y)/distSourceDetector
+                impacts={}
+                #pin channels in between Source and Detector are found by walking
+                #through the lattice along the ray (cell iy=0 is the bottom row)
+                for jj,iy in grid_traversal(centerSource,detector.location,-p*M,-p*N,2*p,M,N):
+                    ii=N-1-iy
+                    fx=-p*(M-1)+jj*2*p-centerSource.x
+                    fy=p*(N-1)-ii*2*p-centerSource.y
+                    impacts.setdefault(self.assembly.fuelmap[ii][jj],[]).append((abs(fx*uy-fy*ux),fx*ux+fy*uy))
+                for pinID,bs in impacts.items():
+                    radii,mats,incidence=chordTables[pinID]
+                    if len(radii)>0:
+                        #the chord within the source pin is measured from the source point,
+                        #for other pins it is the distance between the two intersections.
+                        bs=np.array(bs)
+                        chords=annular_chord_lengths(radii,bs[:,0],bs[:,1],distSourceDetector).sum(axis=0)
+                        for mat,D in zip(mats,chords@incidence):
+                            dT[mat]=dT[mat]+D
+
+                ###Distance traveled outside the pool = distance of ray-pool intersect and detector
+                if self.assembly.pool is not None:
+                    dT[self.assembly.surrounding]=dT[self.assembly.surrounding]+(1-self.assembly.pool.intersection_params(segmentSourceDetector)[0])*distSourceDetector
+
+                ###Distance traveled in coolantMat = total source-detector distance - everything else
+                dT[self.assembly.coolant]=dT[self.assembly.coolant]+distSourceDetector-sum([dT[k] for k in dT.keys()])  #in case there is a ring filled with the coolent, eg an empty control rod guide, we need keep that
+
+                #Update the map
+                for key in dT:
+                    dTmap[key][i][j]=dT[key]
+            else: #not through collimator
+                for key in dT:  
+                    dTmap[key][i][j]=np.Inf
+
+        return dTmap, PointArray(sourceX,sourceY)
+
+    def _pinTables(self):
+        """The function to tabulate the pins for :func:`feign.tracing.pin_distances`.
+        The tables are built once and kept until the pins change.
+
+        Returns
+        -------
+        pinmap : numpy.ndarray of int, shape (N,M)
+            pin type index of each lattice position
+        radii : numpy.ndarray, shape (T,R)
+            radii of the regions of each pin type, padded with the last region
+        regions : numpy.ndarray of int, shape (T,R)
+            index of the material (in :attr:`materials`) of the regions
+        """
+        def build():
+            N=self.assembly.N
+            M=self.assembly.M
+            mats=list(self.materials)
+            pinIDs=list(self.pins)
+            pinmap=np.array([[pinIDs.index(self.assembly.fuelmap[i][j]) for j in range(M)] for i in range(N)])
+            #radii and materials of the pin types, padded with the last region
+            R=max([1]+[len(pin._radii) for pin in self.pins.values()])
+            radii=np.zeros((len(pinIDs),R))
+            regions=np.zeros((len(pinIDs),R),dtype=int)
+            for t,pin in enumerate(self.pins.values()):
+                for k in range(R):
+                    if len(pin._radii)>0:
+                        radii[t,k]=pin._radii[min(k,len(pin._radii)-1)]
+                        regions[t,k]=mats.index(pin._materials[min(k,len(pin._materials)-1)])
+            #the tables are shared by the calls
+            for table in (pinmap,radii,regions):
+                table.setflags(write=False)
+            return pinmap,radii,regions
+        return self._cachedPinTables('pin',build)
+
+    def _visibleRays(self,detector,sources,tables):
+        """The function to calculate the distances travelled in the materials of
+        the Assembly by the rays from the sources to a detector, which pass through
+        its Collimator.
+
+        Parameters
+        ----------
+        detector : Detector()
+        sources : numpy.ndarray, shape (S,2)
+            coordinates of the source locations
+        tables : tuple
+            pin tables, see :meth:`Experiment._pinTables()`
+
+        Returns
+        -------
+        through : numpy.ndarray of bool, shape (S,)
+            True for the rays passing through the Collimator
+        dTseen : numpy.ndarray, shape (sum(through),len(materials))
+            distances travelled by these rays
+        """
+        pinmap,radii,regions=tables
+        target=np.array([detector.location.x,detector.location.y])
+        through=self._throughCollimator(detector,sources)
+        seen=sources[through]
+        dTseen=tracing.pin_distances(seen,target,self.assembly.pitch,pinmap,radii,regions,len(self.materials))
+        return through,self._outsidePins(seen,target,dTseen)
+
+    def _throughCollimator(self,detector,sources):
+        """The function to find the rays from the sources to a detector which pass
+        through its Collimator (all of them if it has no Collimator).
 
-                    dT={key: 0 for key in self.materials} #dict to track distances travelled in each material for a given pin
-                    
-                    #TODO: might wanna handle cases when the source is not the innermost circle?
-                    if self.randomNum == 1:
-                        centerSource=Point(-p*(M-1)+j*2*p,p*(N-1)-i*2*p)
+        Returns
+        -------
+        numpy.ndarray of bool, shape (S,)
+            True for the rays passing through the Collimator
+        """
+        #the sources are classified with the acceptance region, then the accepted ones are checked
+        through=self._acceptedSources(detector,sources)
+        if detector.collimator is not None:
+            target=np.array([detector.location.x,detector.location.y])
+            check=np.flatnonzero(through)
+            through[check]=(tracing.crosses_segment(sources[check],target,detector.collimator.front) &
+                            tracing.crosses_segment(sources[check],target,detector.collimator.back))
+        return through
+
+    def _outsidePins(self,seen,target,dTseen):
+        """The function to add the distances travelled outside the pins (in the
+        surrounding outside the pool, and in the coolant) to the distances travelled
+        within the pins by the rays from the sources seen to the target, in place."""
+        mats=list(self.materials)
+        d=target-seen
+        distSourceDetector=np.sqrt(d[:,0]**2+d[:,1]**2)
+        if self.assembly.pool is not None:
+            dTseen[:,mats.index(self.assembly.surrounding)]+=distSourceDetector-tracing.enclosed_lengths(seen,target,self.assembly.pool)
+        dTseen[:,mats.index(self.assembly.coolant)]+=distSourceDetector-dTseen.sum(axis=1)
+        return dTseen
+
+    def _traceVectorized(self,detector,rng=None,sample=None):
+        """The function to calculate the distanced travelled in the materials of
+        the Assembly by gamma rays emitted from all the pin positions to a detector
+        with array operations. Returns the same as :meth:`Experiment._traceBase()`.
+        """
+        N=self.assembly.N
+        M=self.assembly.M
+        mats=list(self.materials)
+        ii,jj,sources=self._sourceLocations(rng) if sample is None else sample
+        through,dTseen=self._visibleRays(detector,sources,self._pinTables())
+        dT=np.full((len(sources),len(mats)),np.Inf)
+        dT[through]=dTseen
+
+        dTmap={}
+        for k,key in enumerate(mats):
+            dTmap[key]=np.zeros((N,M))
+            dTmap[key][ii,jj]=dT[:,k]
+        sourceX=np.full((N,M),np.nan)
+        sourceY=np.full((N,M),np.nan)
+        sourceX[ii,jj]=sources[:,0]
+        sourceY[ii,jj]=sources[:,1]
+        return dTmap, PointArray(sourceX,sourceY)
+
+    def _absorberDistances(self,detector,dTmap,sourcePoint,absorbers):
+        """The function to calculate the distances travelled within absorbers by
+        the gamma rays of a traced detector (see :meth:`Experiment._traceBase()`).
+
+        Parameters
+        ----------
+        detector : Detector()
+        dTmap : dict
+            travelled distances without the absorbers, the rays with np.Inf are skipped
+        sourcePoint : PointArray()
+            pin-wise source locations
+        absorbers : list of Absorber()
+
+        Returns
+        -------
+        dict
+            Keys are the forms of the absorbers, values are pin-wise distances.
+        """
+        N=self.assembly.N
+        M=self.assembly.M
+        lengths={absorber.form: np.zeros((N,M)) for absorber in absorbers}
+        if len(absorbers)==0:
+            return lengths
+        #rays from the source pins which pass through the collimator
+        ii,jj=np.nonzero(~np.isnan(sourcePoint.x) & np.isfinite(dTmap[self.assembly.coolant]))
+        if self._engine=='vectorized':
+            seen=np.stack([sourcePoint.x[ii,jj],sourcePoint.y[ii,jj]],axis=1)
+            target=np.array([detector.location.x,detector.location.y])
+            for absorber in absorbers:
+                lengths[absorber.form][ii,jj]=tracing.enclosed_lengths(seen,target,absorber.form)
+            return lengths
+        self._buildSceneIndex()
+        for i,j in zip(ii,jj):
+            centerSource=Point(sourcePoint.x[i,j],sourcePoint.y[i,j])
+            segmentSourceDetector=Segment(centerSource,detector.location)
+            distSourceDetector=Point.distance(centerSource,detector.location)
+            candidates=set(self._sceneIndex.query(segmentSourceDetector))
+            ###Absorber can be Circle() or Polygon(), the syntax
+            ###is the same regarding .intersection_params(), thus the code
+            ###handles both as it is. The parameters are along the ray
+            ###(0 at the source, 1 at the detector).
+            ###Absorbers far from the ray are skipped.
+            for absorber in absorbers:
+                if ('absorber',absorber._id) not in candidates:
+                    continue
+                intersects=absorber.form.intersection_params(segmentSourceDetector)
+                if len(intersects)>1:
+                    dabs=abs(intersects[0]-intersects[1])*distSourceDetector
+                elif len(intersects)==1: #if the detector or source is within absorber.
+                    if absorber.form.encloses_point(detector.location):
+                        dabs=(1-intersects[0])*distSourceDetector
+                    elif absorber.form.encloses_point(centerSource):
+                        dabs=intersects[0]*distSourceDetector
+                        print('Warning: absorber #%s is around source at %.2f,%.2f'%(absorber._id,centerSource.x,centerSource.y))
                     else:
-                        length = self.pins[self.assembly.fuelmap[i][j]]._radii[0]*np.sqrt(np.random.uniform(0, 1))
-                        angle = np.pi * np.random.uniform(0, 2)
-                        xnoise = length * np.cos(angle)
-                        ynoise = length * np.sin(angle)
-                        centerSource=Point(-p*(M-1)+j*2*p,p*(N-1)-i*2*p).translate(xnoise,ynoise)                    
-                    sourcePoint[i][j]=centerSource
-                    segmentSourceDetector=Segment(centerSource,detector.location)
-                    #Only track rays which pass through the collimator
-                    if detector.collimator is None or (len(detector.collimator.front.intersection(segmentSourceDetector))==1 and
-                       len(detector.collimator.back.intersection(segmentSourceDetector))==1):
-                        
-                       ###Distances traveled in other pin positions
-                        for ii in range(N):
-                            for jj in range(M):
-                                centerShield=Point(-p*(M-1)+jj*2*p,p*(N-1)-ii*2*p)
-                                pinChannel=Rectangle(centerShield.translate(-p,p),centerShield.translate(p,p),
-                                                   centerShield.translate(p,-p),centerShield.translate(-p,-p))
-#                                    print('------')
-#                                    print(pinChannel)
-#                                    print(segmentSourceDetector)
-#                                    print('------')
-                                if len(pinChannel.intersection(segmentSourceDetector))>=1: #check only pins in between Source and Detector
-                                    if ii==i and jj==j: #pinChannel.encloses_point(centerSource): #in that case, only one intersection
-                                        Dprev=0
-                                        for r,mat in zip(self.pins[self.assembly.fuelmap[ii][jj]]._radii, self.pins[self.assembly.fuelmap[ii][jj]]._materials): 
-                                            intersects = Circle(centerShield,r).intersection(segmentSourceDetector)
-                                            D=Point.distance(intersects[0],centerSource) 
-                                            dT[mat]=dT[mat]+(D-Dprev)
-                                            Dprev=D
-                                    else:
-                                        Dprev=0
-                                        for r,mat in zip(self.pins[self.assembly.fuelmap[ii][jj]]._radii, self.pins[self.assembly.fuelmap[ii][jj]]._materials): 
-                                            intersects = Circle(centerShield,r).intersection(segmentSourceDetector)
-                                            if len(intersects)>1: #if len()==1, it is tangent, no distance traveled
-                                                D=Point.distance(intersects[0],intersects[1])
-                                                dT[mat]=dT[mat]+(D-Dprev)
-                                                Dprev=D                                        
-                                            
-                        ###Distance traveled outside the pool = distance of ray-pool intersect and detector
-                        if self.assembly.pool is not None:
-                            dT[self.assembly.surrounding]=dT[self.assembly.surrounding]+Point.distance(self.assembly.pool.intersection(segmentSourceDetector)[0],detector.location)
-                        
-                        ###Distance traveled in coolantMat = total source-detector distance - everything else
-                        dT[self.assembly.coolant]=dT[self.assembly.coolant]+Point.distance(centerSource,detector.location)-sum([dT[k] for k in dT.keys()])  #in case there is a ring filled with the coolent, eg an empty control rod guide, we need keep that
-                        
-                        ###Distance traveled in absorbers
-                        ###Absorber can be Circle() or Rectangular, the syntax
-                        ###is the same regarding .intersection(), thus the code
-                        ###handles both as it is. 
-                        for absorber in self.absorbers.values():
-                            intersects=absorber.form.intersection(segmentSourceDetector)
-                            if len(intersects)>1:
-                                dabs=Point.distance(intersects[0],intersects[1])
-                            elif len(intersects)==1: #if the detector or source is within absorber.
-                                if absorber.form.encloses_point(detector.location):
-                                    dabs=Point.distance(intersects[0],detector.location)
-                                elif absorber.form.encloses_point(centerSource):
-                                    dabs=Point.distance(intersects[0],centerSource)
-                                    print('Warning: absorber #%s is around source at %.2f,%.2f'%(absorber._id,centerSource.x,centerSource.y))
-                                else:
-                                    raise ValueError('Ray has only one intersection with Absorber \n and the detector neither the source is enclosed by it.')
-                            else: 
-                                dabs=0
-                            dT[absorber.material]=dT[absorber.material]+dabs
-                            dT[absorber.accommat]=dT[absorber.accommat]-dabs
-                        #Update the map
-                        for key in dT:
-                            dTmap[key][i][j]=dT[key]
-                    else: #not through collimator
-                        for key in dT:  
-                            dTmap[key][i][j]=np.Inf
-        
-        return dTmap, sourcePoint
+                        raise ValueError('Ray has only one intersection with Absorber \n and the detector neither the source is enclosed by it.')
+                else:
+                    dabs=0
+                lengths[absorber.form][i,j]=dabs
+        return lengths
+
+    def _addAbsorbers(self,dTmap,lengths):
+        """The function to add the distances travelled within the absorbers
+        (see :meth:`Experiment._absorberDistances()`) to a travelled distance map
+        in place, the accommodating materials are reduced by the same amount."""
+        for absorber in self.absorbers.values():
+            dabs=lengths[absorber.form]
+            dTmap[absorber.material]+=dabs
+            dTmap[absorber.accommat]-=dabs
+
+    def sceneSymmetries(self):
+        """The function to find the symmetry operations (rotations by 90, 180 and
+        270 degrees and mirrors to the axes and the diagonals) which map the fuelmap, the
+        pool and the absorbers onto themselves. The Assembly is centered at the origin,
+        the pins are rotationally symmetric, thus the operations can be checked on the
+        lattice positions.
+
+        Returns
+        -------
+        list of tuples
+            (a,b,c,d) matrices of the operations, see :data:`symmetryOps`
+        """
+        N=self.assembly.N
+        M=self.assembly.M
+        ops=[]
+        for op in symmetryOps:
+            if N!=M and op[1]!=0: #90 deg rotations and diagonal mirrors need a square lattice
+                continue
+            I,J=self._latticeImage(op)
+            if False in [self.assembly.fuelmap[i][j]==self.assembly.fuelmap[ii][jj]
+                         for i,j,ii,jj in zip(*np.indices((N,M)).reshape(2,-1),I.ravel(),J.ravel())]:
+                continue
+            if self.assembly.pool is not None and not isImage(op,self.assembly.pool,self.assembly.pool):
+                continue
+            if self.absorbers is not None:
+                absorbers=list(self.absorbers.values())
+                if False in [True in [isImage(op,a.form,b.form) and a.material==b.material and a.accommat==b.accommat
+                                      for b in absorbers] for a in absorbers]:
+                    continue
+            ops.append(op)
+        return ops
+
+    def _latticeImage(self,op):
+        """The function to map the lattice positions with a symmetry operation.
+        Returns the row and column index arrays (N x M) of the images."""
+        N=self.assembly.N
+        M=self.assembly.M
+        i,j=np.indices((N,M))
+        u=j-(M-1)/2 #x/pitch
+        v=(N-1)/2-i #y/pitch
+        return (np.rint((N-1)/2-(op[2]*u+op[3]*v)).astype(int),
+                np.rint(op[0]*u+op[1]*v+(M-1)/2).astype(int))
+
+    def symmetricImage(self,detector,computed,ops=None):
+        """The function to derive the travelled distances to a detector from an
+        already computed detector, if the detector's view is a symmetric image of
+        the computed one.
+
+        Parameters
+        ----------
+        detector : Detector()
+        computed : dict
+            Already computed results. Keys are detector identifiers, values are
+            (dTmap,sourcePoint) tuples as returned by :meth:`Experiment.distanceTravelled()`.
+        ops : list of tuples, optional
+            symmetry operations of the scene (by default :meth:`Experiment.sceneSymmetries()`)
+
+        Returns
+        -------
+        tuple or None
+            (dTmap,sourcePoint) of the detector, or None if it is not an image of any
+            computed detector.
+        """
+        if ops is None:
+            ops=self.sceneSymmetries()
+        image=self._imageOf(detector,list(computed),ops)
+        if image is None:
+            return None
+        name,op=image
+        return self._mapImage(op,computed[name][0],computed[name][1])
+
+    def _imageOf(self,detector,names,ops):
+        """The function to find a detector among names and a symmetry operation
+        which maps that detector (and its collimator) onto detector.
+
+        Returns
+        -------
+        tuple or None
+            (name,op), or None if there is no such detector.
+        """
+        for name in names:
+            other=self.detectors[name]
+            for op in ops:
+                if not isImage(op,other.location,detector.location):
+                    continue
+                if (other.collimator is None) != (detector.collimator is None):
+                    continue
+                if other.collimator is not None and not (isImage(op,other.collimator.front,detector.collimator.front) and
+                                                         isImage(op,other.collimator.back,detector.collimator.back)):
+                    continue
+                return name,op
+        return None
+
+    def _mapImage(self,op,dTmap,sourcePoint):
+        """The function to map the travelled distances and the source points
+        with a symmetry operation by permuting the lattice positions."""
+        I,J=self._latticeImage(op)
+        dTmapImage={}
+        for key in dTmap:
+            dTmapImage[key]=np.zeros(dTmap[key].shape)
+            dTmapImage[key][I,J]=dTmap[key]
+        sourceX=np.zeros(sourcePoint.shape)
+        sourceY=np.zeros(sourcePoint.shape)
+        sourceX[I,J]=op[0]*sourcePoint.x+op[1]*sourcePoint.y
+        sourceY[I,J]=op[2]*sourcePoint.x+op[3]*sourcePoint.y
+        return dTmapImage, PointArray(sourceX,sourceY)
 
     def attenuation(self,dTmap,mue,detector,sourcePoint):
         """The function to calculate the pin-wise contribution to the detector
@@ -1661,7 +2444,7 @@ class Experiment(object):
             Total attenuation coefficients at the given energy. Keys are materials,
             values are the total attenuation coefficient values. 
         detector : Detector()
-        sourcePoint : numpy array
+        sourcePoint : PointArray()
             Pin-wise source locations, as created by :meth:`Experiment.distanceTravelled()`.
         
         Returns
@@ -1669,20 +2452,47 @@ class Experiment(object):
         contribmap : numpy array
             Pin-wise probabilities that a gamma-ray emitted from a given pin hits the detector.
         """
-        p=self.assembly.pitch/2
+        muem=np.array([[mue[key]] for key in self.materials])
+        return self.attenuations(dTmap,muem,detector,sourcePoint)[0]
+
+    def attenuations(self,dTmap,muem,detector,sourcePoint):
+        """The function to calculate the pin-wise contributions to the detector
+        at many energies at once. The travelled distances are stacked into a
+        (pins x materials) array, and the optical depths at all energies are
+        obtained with one matrix product.
+
+        Parameters
+        ----------
+        dTmap : dict
+            The travelled distance in various materials, see :meth:`Experiment.attenuation()`
+        muem : array_like, shape (K,E)
+            Total attenuation coefficients (multiplied with the density) of the K
+            materials (in the order of :attr:`materials`) at E energies.
+        detector : Detector()
+        sourcePoint : PointArray()
+            Pin-wise source locations, as created by :meth:`Experiment.distanceTravelled()`.
+
+        Returns
+        -------
+        numpy.ndarray, shape (E,N,M)
+            Pin-wise probabilities that a gamma-ray emitted from a given pin hits the
+            detector at each energy. Positions without source material and rays with
+            np.Inf travelled distance give 0.
+        """
         N=self.assembly.N
         M=self.assembly.M
-        contribmap=np.zeros((N,M))
-        for i in range(N):
-            for j in range(M):
-                center=sourcePoint[i][j]
-                sourceIn=[s in self.pins[self.assembly.fuelmap[i][j]]._materials for s in self.assembly.source]
-                if True in sourceIn:
-                    contrib=1 #TODO might be a place to include a pre-known emission weight map. Or to provide a function which multiplies the contribution with some weight matrix
-                    for key in self.materials.keys():
-                        contrib=contrib*math.exp(-1*mue[key]*dTmap[key][i][j])
-                    contribmap[i][j]=contrib/(4*math.pi*(Point.distance(center,detector.location))**2)
-        return contribmap
+        muem=np.asarray(muem,dtype=float)
+        isSource=np.array([[True in [s in self.pins[self.assembly.fuelmap[i][j]]._materials for s in self.assembly.source]
+                            for j in range(M)] for i in range(N)]).ravel()
+        dT=np.stack([dTmap[key].ravel() for key in self.materials],axis=1)
+        #np.Inf is set if the ray does not pass through the collimator
+        rows=np.flatnonzero(isSource & np.all(np.isfinite(dT),axis=1))
+        dx=sourcePoint.x.ravel()[rows]-detector.location.x
+        dy=sourcePoint.y.ravel()[rows]-detector.location.y
+        contribmap=np.zeros((muem.shape[1],N*M))
+        #TODO might be a place to include a pre-known emission weight map.
+        contribmap[:,rows]=(np.exp(-dT[rows]@muem)/(4*np.pi*(dx*dx+dy*dy))[:,np.newaxis]).T
+        return contribmap.reshape(-1,N,M)
 
     def checkComplete(self):
         """Function to check whether everything is defined correctly in an
@@ -1747,9 +2557,16 @@ class Experiment(object):
             if True in [mat.density is None for mat in self.materials.values()]:
                 print('ERROR: Material density is missing')
                 errors.append(False)
-            if True in [mat.path is None for mat in self.materials.values()]:
+            if True in [mat.path is None and mat.entry is None for mat in self.materials.values()]:
                 print('ERROR: Path for attenuation file missing')
                 errors.append(False)
+            entries=[mat.entry for mat in self.materials.values() if mat.entry is not None]
+            if len(entries)>0 and self._library is None:
+                print('ERROR: Library for the material entries is not set')
+                errors.append(False)
+            elif len(entries)>0 and False in [entry in self._library for entry in entries]:
+                print('ERROR: material entry is missing from the library')
+                errors.append(False)
 
         if len(errors)!=0:
             print('%d errors encountered.'%(len(errors)))
@@ -1793,7 +2610,7 @@ class Experiment(object):
         ax.patch.set_facecolor(self.materials[self.assembly.surrounding].color)
         if self.assembly.pool is not None:
             pool=self.assembly.pool
-            polygon = plt.Polygon([[pool.p1.x,pool.p1.y],[pool.p2.x,pool.p2.y],[pool.p3.x,pool.p3.y],[pool.p4.x,pool.p4.y]], True,color=self.materials[self.assembly.coolant].color)
+            polygon = plt.Polygon([[c.x,c.y] for c in pool.corners], closed=True,color=self.materials[self.assembly.coolant].color)
             ax.add_artist(polygon)
         #fuelmap
         for i in range(N):
@@ -1804,8 +2621,8 @@ class Experiment(object):
                     ax.add_artist(circle1)
         for a in self.absorbers:
             absorber=self.absorbers[a]
-            if isinstance(absorber.form,Rectangle):
-                polygon = plt.Polygon([[absorber.form.p1.x,absorber.form.p1.y],[absorber.form.p2.x,absorber.form.p2.y],[absorber.form.p3.x,absorber.form.p3.y],[absorber.form.p4.x,absorber.form.p4.y]], True,color=self.materials[absorber.material].color)
+            if isinstance(absorber.form,Polygon):
+                polygon = plt.Polygon([[c.x,c.y] for c in absorber.form.corners], closed=True,color=self.materials[absorber.material].color)
                 ax.add_artist(polygon)
             else:
                 circle1 = plt.Circle((absorber.form.c.x,absorber.form.c.y),absorber.form.r,color=self.materials[absorber.material].color)
@@ -1817,9 +2634,9 @@ class Experiment(object):
                 if self.detectors[d].collimator.color is None:
                     self.detectors[d].collimator.set_color('#C2C5CC')
                 #the "orientation" of back and front is not know, so I plot two ways.
-                polygon=plt.Polygon([[self.detectors[d].collimator.front.p.x,self.detectors[d].collimator.front.p.y],[self.detectors[d].collimator.front.q.x, self.detectors[d].collimator.front.q.y],[self.detectors[d].collimator.back.p.x,self.detectors[d].collimator.back.p.y],[self.detectors[d].collimator.back.q.x,self.detectors[d].collimator.back.q.y]],True,color=self.detectors[d].collimator.color)
+                polygon=plt.Polygon([[self.detectors[d].collimator.front.p.x,self.detectors[d].collimator.front.p.y],[self.detectors[d].collimator.front.q.x, self.detectors[d].collimator.front.q.y],[self.detectors[d].collimator.back.p.x,self.detectors[d].collimator.back.p.y],[self.detectors[d].collimator.back.q.x,self.detectors[d].collimator.back.q.y]],closed=True,color=self.detectors[d].collimator.color)
                 ax.add_artist(polygon)
-                polygon=plt.Polygon([[self.detectors[d].collimator.front.p.x,self.detectors[d].collimator.front.p.y],[self.detectors[d].collimator.front.q.x, self.detectors[d].collimator.front.q.y],[self.detectors[d].collimator.back.q.x,self.detectors[d].collimator.back.q.y],[self.detectors[d].collimator.back.p.x,self.detectors[d].collimator.back.p.y]],True,color=self.detectors[d].collimator.color)
+                polygon=plt.Polygon([[self.detectors[d].collimator.front.p.x,self.detectors[d].collimator.front.p.y],[self.detectors[d].collimator.front.q.x, self.detectors[d].collimator.front.q.y],[self.detectors[d].collimator.back.q.x,self.detectors[d].collimator.back.q.y],[self.detectors[d].collimator.back.p.x,self.detectors[d].collimator.back.p.y]],closed=True,color=self.detectors[d].collimator.color)
                 ax.add_artist(polygon)
         plt.xlim(xl[0],xl[1])
         plt.ylim(yl[0],yl[1])
@@ -1829,130 +2646,994 @@ class Experiment(object):
         if show:
             plt.show()
 
-    def Run(self):
+    def Run(self,workers=None):
         """The function to run an Experiment. It will update the dTmap, the
         contributionMap and the geomEff attributes.
+
+        Parameters
+        ----------
+        workers : int, optional
+            Number of worker processes. By default everything is calculated in the
+            calling process. If workers is given, the (random sample, detector) units
+            are distributed over a pool of processes.
+
+        Notes
+        -----
+        If :attr:`seed` is set or workers are used, each unit draws the random
+        source locations from its own random stream derived from the seed, the index
+        of the sample and the detector ID, thus the results do not depend on the
+        number of workers. Otherwise the random source locations are drawn from the
+        global numpy random stream (np.random).
+
+        The Experiment is sent to each worker process once, when the process
+        starts, and the units only exchange indices and results.
+
+        The results of a random sample are added to the running mean and std as soon
+        as all its units are finished, and they are dropped unless :attr:`keepSamples`
+        is set (see :meth:`Experiment.set_keep_samples()`).
+
+        Only the stale parts of the previous run are recalculated: if only
+        :attr:`elines` or the densities of the materials have changed, the rays are
+        not traced again, only the attenuation is calculated; a new detector is traced
+        alone; and if only the absorbers have changed, only the distances within the
+        new absorbers are calculated (see :meth:`Experiment._stagedDistances()`).
         """
+        ops,sourceNorm=self._prepareRun()
+        plan=self._symmetryPlan(ops,list(self.detectors))
+        units=[(k,name) for k in range(self.randomNum) for name in self.detectors]
+        seed=self._seed if workers is None else self._runSeed()
+        statistics=self._newStatistics()
+        self._runUnits(units,plan,sourceNorm,workers,seed,
+                       consume=lambda k,results: self._accumulate(statistics,k,results))
+        self._finishStatistics(statistics)
+
+    def _runUnits(self,units,plan,sourceNorm,workers=None,seed=None,consume=None):
+        """The function to calculate work units (see :meth:`Experiment._runUnit()`),
+        in the calling process or in a pool of worker processes.
+
+        Parameters
+        ----------
+        units : list of tuples
+            (sample index, detector identifier) of the units in order
+        plan : dict
+            symmetry plan, see :meth:`Experiment._symmetryPlan()`
+        sourceNorm : int
+            number of pins containing source material
+        workers : int, optional
+            number of worker processes, by default the units are calculated in the calling process
+        seed : int, optional
+            base seed of the random streams of the units, by default the global
+            numpy random stream is used (only in the calling process)
+        consume : callable, optional
+            called as consume(k,results) when the last unit of sample k is finished,
+            it may remove the units of sample k from results.
+
+        Returns
+        -------
+        dict
+            Keys are the units, values are the results of the units (which are not
+            removed by consume).
+        """
+        results={}
+        lastUnit={unit[0]: i for i,unit in enumerate(units)}
+        if workers is None:
+            last=None
+            for i,(k,name) in enumerate(units):
+                if k!=last:
+                    print('#%d is being calculated'%(k))
+                    last=k
+                results[(k,name)]=self._runUnit(k,name,plan,results,seed,sourceNorm)
+                if consume is not None and lastUnit[k]==i:
+                    consume(k,results)
+        else:
+            if not isinstance(workers,int) or workers<1:
+                raise ValueError('workers has to be a positive int')
+            if seed is None:
+                seed=self._runSeed()
+            traced=iter([unit for unit in units if plan[unit[1]] is None])
+            futures={}
+            with ProcessPoolExecutor(max_workers=workers,initializer=_initWorker,initargs=(self,)) as executor:
+                for i,unit in enumerate(units):
+                    if plan[unit[1]] is None:
+                        #only a few units are submitted ahead, thus the finished results
+                        #waiting to be consumed do not pile up
+                        while len(futures)<4*workers:
+                            nextUnit=next(traced,None)
+                            if nextUnit is None:
+                                break
+                            futures[nextUnit]=executor.submit(_workerUnit,nextUnit[0],nextUnit[1],seed,sourceNorm)
+                        results[unit],stages=futures.pop(unit).result()
+                        if stages is not None:
+                            self._importStages(unit,stages)
+                        print('#%d detector %s is calculated'%unit)
+                    else:
+                        results[unit]=self._runUnit(unit[0],unit[1],plan,results,None,sourceNorm,verbose=False)
+                    if consume is not None and lastUnit[unit[0]]==i:
+                        consume(unit[0],results)
+        return results
+
+    async def run_async(self,workers=None,progress=None):
+        """The function to run an Experiment from asyncio code. It updates the
+        same attributes as :meth:`Experiment.Run()`, but the calculations are done
+        in an executor, and the event loop gets back the control between the
+        (random sample, detector) units.
+
+        Parameters
+        ----------
+        workers : int, optional
+            number of worker processes, by default the units are calculated one by
+            one in the default executor of the event loop (see :meth:`Experiment.Run()`
+            for the random streams).
+        progress : callable, optional
+            called as progress(done,total) with the number of the finished and of all
+            the units, after each finished unit.
+
+        Notes
+        -----
+        If the task is cancelled, the results of the Experiment are not changed
+        (they are updated only when all the units are finished). A unit which is
+        already being calculated in the executor of the event loop keeps the stages
+        (see :meth:`Experiment._stagedDistances()`), thus it is finished before the
+        cancellation is propagated, and the Experiment can be run again at once. A unit
+        already being calculated in a worker process is finished in the background, and
+        its result is dropped.
+
+        Examples
+        --------
+        >>> await experiment.run_async(progress=lambda done,total: print(done,'/',total))
+        """
+        loop=asyncio.get_running_loop()
+        async def inExecutor(function,*args):
+            future=loop.run_in_executor(None,function,*args)
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                #the thread cannot be stopped, and it writes the stages and the caches
+                await asyncio.wait({future})
+                raise
+        ops,sourceNorm=await inExecutor(self._prepareRun)
+        plan=self._symmetryPlan(ops,list(self.detectors))
+        units=[(k,name) for k in range(self.randomNum) for name in self.detectors]
+        results={}
+        statistics=self._newStatistics()
+        done=0
+        def report():
+            if progress is not None:
+                progress(done,len(units))
+        if workers is None:
+            seed=self._seed
+            for k,name in units:
+                results[(k,name)]=await inExecutor(self._runUnit,k,name,plan,results,seed,sourceNorm,False)
+                done+=1
+                report()
+                if name==units[-1][1]:
+                    self._accumulate(statistics,k,results)
+        else:
+            if not isinstance(workers,int) or workers<1:
+                raise ValueError('workers has to be a positive int')
+            seed=self._runSeed()
+            traced=[name for name in self.detectors if plan[name] is None]
+            tracedUnits=iter([unit for unit in units if plan[unit[1]] is None])
+            executor=ProcessPoolExecutor(max_workers=workers,initializer=_initWorker,initargs=(self,))
+            try:
+                futures={}
+                pending=set()
+                nextSample=0
+                while True:
+                    #only a few units are submitted ahead, as in Experiment._runUnits()
+                    while len(pending)<4*workers:
+                        nextUnit=next(tracedUnits,None)
+                        if nextUnit is None:
+                            break
+                        future=loop.run_in_executor(executor,_workerUnit,nextUnit[0],nextUnit[1],seed,sourceNorm)
+                        futures[future]=nextUnit
+                        pending.add(future)
+                    if len(pending)==0:
+                        break
+                    finished,pending=await asyncio.wait(pending,return_when=asyncio.FIRST_COMPLETED)
+                    for future in finished:
+                        unit=futures.pop(future)
+                        results[unit],stages=future.result()
+                        if stages is not None:
+                            await inExecutor(self._importStages,unit,stages)
+                        done+=1
+                        report()
+                    #the samples are accumulated in order, once their traced units are finished
+                    while nextSample<self.randomNum and False not in [(nextSample,name) in results for name in traced]:
+                        for name in self.detectors:
+                            if plan[name] is not None:
+                                #the symmetric image and the attenuation are calculated in the executor
+                                #as well, thus the event loop is not blocked
+                                results[(nextSample,name)]=await inExecutor(self._runUnit,nextSample,name,plan,
+                                                                             results,None,sourceNorm,False)
+                                done+=1
+                                report()
+                        self._accumulate(statistics,nextSample,results)
+                        nextSample+=1
+            finally:
+                executor.shutdown(wait=False,cancel_futures=True)
+        self._finishStatistics(statistics)
+
+    def Scan(self,detector,path,ts=None,collimators=None):
+        """The function to calculate the geometric efficiency and the contribution
+        maps of a detector moved along a path (eg. a linear stage or an arc around
+        the Assembly). The attributes of the Experiment are not updated.
+
+        Parameters
+        ----------
+        detector : Detector()
+            a detector of the Experiment. Its location is the reference location of its
+            Collimator, and its ID identifies the random streams (see :meth:`Experiment.Run()`).
+        path : list of Point() or callable
+            locations of the detector, or a function giving the location at a parameter value
+        ts : array_like, optional
+            values of the parameter (required if path is a function)
+        collimators : list of Collimator() or None, optional
+            Collimator at each location (None for no collimator). By default the
+            Collimator of the detector is translated together with the detector.
+
+        Returns
+        -------
+        dict
+            'locations' : numpy.ndarray, shape (P,2), coordinates of the P locations
+
+            'traced' : numpy.ndarray, shape (P,), number of the rays traversed at each location
+
+            'dTmap' : dict, keys are :attr:`Material._id` identifiers, values are
+            (P,N,M) shaped mean travelled distances
+
+            'geomEff', 'geomEffErr' : numpy.ndarray, shape (P,E), mean and std of the
+            geometric efficiency at the energies of :attr:`elines`
+
+            'contributionMap', 'contributionMapErr' : numpy.ndarray, shape (P,E,N,M),
+            mean and std of the pin-wise contributions
+
+            The last four are only given if :attr:`elines` are set.
+
+        Raises
+        ------
+        ValueError
+            if the detector is not in the Experiment, or the path is not valid
+
+        Notes
+        -----
+        The random source locations of a sample are drawn once and are used at every
+        location, and the pin tables are built once, thus the curves along the path are
+        smooth even with few samples. With the 'loop' :attr:`engine` every ray is traced at
+        every location. With the 'vectorized' engine the traversal of the lattice is reused
+        between neighbouring locations: the pins near a ray (within half a pitch) are kept
+        as candidates, and a ray is traversed again only if the detector moved so much that
+        the candidates may miss a pin (see :meth:`Experiment._scanDistances()`). The chord
+        lengths depend on the exact location of the detector, thus they are recalculated
+        for the candidates of every ray passing through the Collimator.
+
+        Examples
+        --------
+        Linear stage in front of the Assembly, the collimator is moved with the detector:
+
+        >>> ys=np.linspace(-20,20,41)
+        >>> scan=experiment.Scan(F3,[Point(150.0,y) for y in ys])
+        >>> scan['geomEff'].shape
+        (41, 34)
+
+        Arc of 90 degrees around the Assembly without collimator:
+
+        >>> scan=experiment.Scan(F5,lambda a: F5.location.rotate(a),ts=np.linspace(0,90,91),collimators=[None]*91)
+        """
+        if not isinstance(detector,Detector) or self.detectors is None or self.detectors.get(detector._id) is not detector:
+            raise ValueError('detector has to be a Detector() of the Experiment')
+        if callable(path):
+            if ts is None:
+                raise ValueError('ts are required if path is a function')
+            locations=[path(t) for t in ts]
+        else:
+            locations=list(path)
+        if len(locations)==0 or False in [isinstance(location,Point) for location in locations]:
+            raise ValueError('path has to give Point() locations')
+        if collimators is None:
+            collimators=[self._movedCollimator(detector,location) for location in locations]
+        elif len(collimators)!=len(locations):
+            raise ValueError('one collimator is needed for each location')
         if self.checkComplete() is False:
             raise ValueError('ERROR')
-        
+        if self._elines is not None:
+            self.get_MuTable()
+
+        N=self.assembly.N
+        M=self.assembly.M
+        P=len(locations)
+        mats=list(self.materials)
+        absorbers=list(self.absorbers.values())
+        samples=[self._sourceLocations(None if self._seed is None else self._unitRng(self._seed,k,detector._id))
+                 for k in range(self.randomNum)]
+        sourcePoints=[]
+        for ii,jj,sources in samples:
+            sourceX=np.full((N,M),np.nan)
+            sourceY=np.full((N,M),np.nan)
+            sourceX[ii,jj]=sources[:,0]
+            sourceY[ii,jj]=sources[:,1]
+            sourcePoints.append(PointArray(sourceX,sourceY))
+        sourceNorm=len(samples[0][2])
+        vectorized=self._engine=='vectorized'
+        if vectorized:
+            traversals=[self._newTraversal(sources) for ii,jj,sources in samples]
+        scan={'locations': np.array([[location.x,location.y] for location in locations]),
+              'dTmap': {mat: np.zeros((P,N,M)) for mat in mats},
+              'traced': np.zeros(P,dtype=int)}
+        if self._elines is not None:
+            E=len(self._elines)
+            #linear attenuation coefficients, rows are materials
+            muem=np.array([[self._mu[e][mat]*self.materials[mat].density for e in self._elines] for mat in mats])
+            for key,shape in [('geomEff',(P,E)),('geomEffErr',(P,E)),('contributionMap',(P,E,N,M)),('contributionMapErr',(P,E,N,M))]:
+                scan[key]=np.zeros(shape)
+        for p,(location,collimator) in enumerate(zip(locations,collimators)):
+            position=Detector(detector._id)
+            position.set_location(location)
+            if collimator is not None:
+                position.set_collimator(collimator)
+            dTs=np.zeros((self.randomNum,len(mats),N,M))
+            if self._elines is not None:
+                cmaps=np.zeros((self.randomNum,E,N,M))
+            for k,sample in enumerate(samples):
+                if vectorized:
+                    dTmap,traced=self._scanDistances(position,sample,traversals[k])
+                else:
+                    dTmap,sourcePoint=self._traceBase(position,sample=sample)
+                    self._addAbsorbers(dTmap,self._absorberDistances(position,dTmap,sourcePoint,absorbers))
+                    traced=len(sample[2])
+                scan['traced'][p]+=traced
+                dTs[k]=[dTmap[mat] for mat in mats]
+                if self._elines is not None:
+                    cmaps[k]=self.attenuations(dTmap,muem,position,sourcePoints[k])
+            for m,mat in enumerate(mats):
+                scan['dTmap'][mat][p]=np.mean(dTs[:,m],axis=0)
+            if self._elines is not None:
+                geffs=cmaps.sum(axis=(2,3))/sourceNorm
+                scan['geomEff'][p]=np.mean(geffs,axis=0)
+                scan['geomEffErr'][p]=np.std(geffs,axis=0)
+                scan['contributionMap'][p]=np.mean(cmaps,axis=0)
+                scan['contributionMapErr'][p]=np.std(cmaps,axis=0)
+        return scan
+
+    def _newTraversal(self,sources):
+        """The function to create the traversal of the lattice by the rays of the
+        sources for :meth:`Experiment._scanDistances()`.
+
+        Returns
+        -------
+        dict
+            'rays', 'pins' : the candidate (ray, pin) pairs (see :func:`feign.tracing.pin_candidates`),
+            'reference' : the detector location for which the candidates of each ray were
+            found (NaN if not yet), 'reach' : the largest distance from each source to
+            the lattice (enlarged with the largest pin radius), 'margin' : the margin of the candidates.
+        """
+        pinmap,radii,regions=self._pinTables()
+        half=np.array([self.assembly.M,self.assembly.N])*self.assembly.pitch/2+radii.max()
+        corners=np.array([[sx*half[0],sy*half[1]] for sx in (-1,1) for sy in (-1,1)])
+        reach=np.sqrt(((sources[:,np.newaxis,:]-corners)**2).sum(axis=2)).max(axis=1)
+        return {'rays': np.zeros(0,dtype=int), 'pins': np.zeros(0,dtype=int),
+                'reference': np.full((len(sources),2),np.nan), 'reach': reach,
+                'margin': self.assembly.pitch/2}
+
+    def _scanDistances(self,detector,sample,traversal):
+        """The function to calculate the travelled distances (with the absorbers)
+        of the rays of a sample to a detector with reusing the traversal of the
+        lattice from the previous locations of the detector.
+
+        The candidate pins of a ray (see :func:`feign.tracing.pin_candidates`) stay
+        valid while the detector is moved less than margin/u from the location they
+        were found for, where u is the largest relative position of the ray within the
+        lattice. Only the rays which pass through the Collimator and whose candidates
+        are not valid any more are traversed again, the chords are calculated for the
+        candidates of the rays passing through the Collimator.
+
+        Parameters
+        ----------
+        detector : Detector()
+            the detector at its current location
+        sample : tuple
+            source locations, see :meth:`Experiment._sourceLocations()`
+        traversal : dict
+            traversal of the sample, see :meth:`Experiment._newTraversal()`, it is updated
+
+        Returns
+        -------
+        dTmap : dict
+            pin-wise travelled distances, keys are :attr:`Material._id` identifiers
+        traced : int
+            number of the rays traversed again
+        """
+        N=self.assembly.N
+        M=self.assembly.M
+        mats=list(self.materials)
+        pitch=self.assembly.pitch
+        pinmap,radii,regions=self._pinTables()
+        ii,jj,sources=sample
+        target=np.array([detector.location.x,detector.location.y])
+        through=self._throughCollimator(detector,sources)
+        d=target-sources
+        length=np.sqrt(d[:,0]**2+d[:,1]**2)
+        moved=np.sqrt(((target-traversal['reference'])**2).sum(axis=1))
+        #NaN (never traversed) is not valid either
+        valid=np.minimum(1.0,traversal['reach']/length)*moved<=traversal['margin']
+        stale=np.flatnonzero(through & ~valid)
+        if len(stale)>0:
+            keep=~np.isin(traversal['rays'],stale)
+            rays,pins=tracing.pin_candidates(sources[stale],target,pitch,pinmap,radii,traversal['margin'])
+            traversal['rays']=np.concatenate([traversal['rays'][keep],stale[rays]])
+            traversal['pins']=np.concatenate([traversal['pins'][keep],pins])
+            traversal['reference'][stale]=target
+        pairs=through[traversal['rays']]
+        dTpins=tracing.candidate_distances(sources,target,traversal['rays'][pairs],traversal['pins'][pairs],
+                                           pitch,pinmap,radii,regions,len(mats))
+        seen=sources[through]
+        dTseen=self._outsidePins(seen,target,dTpins[through])
+        for absorber in self.absorbers.values():
+            dabs=tracing.enclosed_lengths(seen,target,absorber.form)
+            dTseen[:,mats.index(absorber.material)]+=dabs
+            dTseen[:,mats.index(absorber.accommat)]-=dabs
+        dT=np.full((len(sources),len(mats)),np.Inf)
+        dT[through]=dTseen
+        dTmap={}
+        for k,key in enumerate(mats):
+            dTmap[key]=np.zeros((N,M))
+            dTmap[key][ii,jj]=dT[:,k]
+        return dTmap,len(stale)
+
+    def _movedCollimator(self,detector,location):
+        """The function to translate the Collimator of a detector together with
+        the detector to a new location (None if the detector has no Collimator)."""
+        if detector.collimator is None:
+            return None
+        dx=location.x-detector.location.x
+        dy=location.y-detector.location.y
+        collimator=Collimator(detector.collimator._id)
+        for seg,setter in [(detector.collimator.front,collimator.set_front),(detector.collimator.back,collimator.set_back)]:
+            setter(Segment(seg.p.translate(dx,dy),seg.q.translate(dx,dy)))
+        if detector.collimator.color is not None:
+            collimator.set_color(detector.collimator.color)
+        return collimator
+
+    def _prepareRun(self):
+        """The function to check and prepare an Experiment before running it.
+
+        Returns
+        -------
+        ops : list of tuples
+            symmetry operations to be used (see :meth:`Experiment.sceneSymmetries()`)
+        sourceNorm : int
+            number of pins containing source material
+        """
+        if self.checkComplete() is False:
+            raise ValueError('ERROR')
+        #the objects may have been modified since they were included
+        self._buildSceneIndex()
+        #with random source locations every detector gets its own samples
+        if self.symmetry and self.randomNum == 1:
+            ops=self.sceneSymmetries()
+        else:
+            ops=[]
+        if self._elines is not None:
+            self.get_MuTable()
+
         sourceNorm=0
         for i in range(self.assembly.N):
             for j in range(self.assembly.M):
                 sourceIn=[s in self.pins[self.assembly.fuelmap[i][j]]._materials for s in self.assembly.source]
                 if True in sourceIn:
                     sourceNorm=sourceNorm+1
-        dTmaps=[]
-        contributionMaps=[]
-        contributionMapAves=[]
-        geomefficiencies=[]
-        geomefficiencyAves=[]
-        sourcePoints=[]
-        for k in range(self.randomNum):
-            print('#%d is being calculated'%(k))
-            dTmap={}
-            sourcePoint={}
-            for name in self.detectors:
+        return ops,sourceNorm
+
+    def _symmetryPlan(self,ops,names):
+        """The function to decide which detectors (among names) are traced, and
+        which are derived as symmetric images of traced ones.
+
+        Returns
+        -------
+        dict
+            Keys are detector identifiers, values are None if the detector is
+            traced, or (name,op) if it is the image of detector name by op.
+        """
+        plan={}
+        for name in names:
+            plan[name]=self._imageOf(self.detectors[name],[key for key in plan if plan[key] is None],ops)
+        return plan
+
+    def _runSeed(self):
+        """The function to get the base seed of the random streams of the work units.
+        If :attr:`seed` is not set, it is drawn from the global numpy random stream."""
+        if self._seed is None:
+            return int(np.random.randint(0,2**31-1))
+        return self._seed
+
+    def _unitRng(self,seed,k,name):
+        """The function to create the random stream of the work unit of sample k and detector name."""
+        return np.random.default_rng([seed,k,zlib.crc32(str(name).encode())])
+
+    def _traceSignature(self,detector,k,seed):
+        """The function to describe everything the travelled distances of a work unit
+        depend on, except the absorbers (see :meth:`Experiment._stagedDistances()`).
+        The Experiment and its objects may be modified after the last run either with
+        the set/add/remove methods or directly, thus the content is compared.
+        The random source locations are drawn from the stream of the unit, which
+        depends on the detector identifier (see :meth:`Experiment._unitRng()`), thus
+        the identifier is included if the run is random.
+        """
+        assembly=self.assembly
+        random=self.randomNum!=1
+        pins=tuple((pin._id,tuple(pin._radii),tuple(pin._materials)) for pin in self.pins.values())
+        collimator=None if detector.collimator is None else (detector.collimator.front,detector.collimator.back)
+        return (self._engine,random,k if random else None,seed if random else None,detector._id if random else None,
+                tuple(self.materials),pins,assembly.pitch,tuple(tuple(row) for row in assembly.fuelmap),
+                tuple(assembly.source),assembly.coolant,assembly.surrounding,assembly.pool,
+                detector.location,collimator)
+
+    def _stagedDistances(self,k,name,seed,verbose=True):
+        """The function to get the travelled distances of a traced work unit with
+        reusing the stages which are still valid since the last run.
+
+        The stages of a unit are the tracing through the Assembly (see
+        :meth:`Experiment._traceBase()`) and the distances within each absorber (see
+        :meth:`Experiment._absorberDistances()`). The tracing is repeated only if
+        anything it depends on has changed (see :meth:`Experiment._traceSignature()`),
+        otherwise only the distances within the new absorbers are calculated.
+        The attenuation is always recalculated by :meth:`Experiment._runUnit()`.
+        Units with random source locations drawn from the global numpy random stream
+        (:attr:`seed` is not set) are not reused. The stages which are not valid in
+        the Experiment are looked up in the caches (see :meth:`Experiment._cachedTrace()`),
+        thus Experiment objects with the same geometry share the tracing.
+
+        The Experiment keeps the stages of one unit per detector only if the source
+        locations are not random (:attr:`randomNum` is 1). The stages of the random
+        samples are only kept in the memory bounded cache :data:`feign.cache.traceMemory`
+        (and on disk, see :meth:`Experiment.set_cache()`), thus the memory does not
+        grow with :attr:`randomNum`.
+
+        Returns
+        -------
+        dTmap : dict
+        sourcePoint : PointArray()
+        """
+        detector=self.detectors[name]
+        random=self.randomNum!=1
+        reusable=not random or seed is not None
+        signature=self._traceSignature(detector,k,seed)
+        stages=self._stages.get((k,name))
+        if stages is None or stages['trace']!=signature or not reusable:
+            stages=self._cachedTrace(signature) if reusable else None
+            if stages is None:
+                rng=None if seed is None else self._unitRng(seed,k,name)
+                base,sourcePoint=self._traceBase(detector,rng)
+                stages={'trace': signature, 'dTmap': base, 'sourcePoint': sourcePoint, 'absorbers': {}}
+                if reusable:
+                    self._storeTrace(stages)
+            elif verbose:
+                print("Tracing to detector "+name+" is taken from the cache")
+            if not random:
+                self._stages[(k,name)]=stages
+        elif verbose:
+            print("Tracing to detector "+name+" is reused")
+        absorbers=list(self.absorbers.values())
+        #only the absorbers still in the Experiment are kept
+        lengths={}
+        for absorber in absorbers:
+            if absorber.form in stages['absorbers']:
+                lengths[absorber.form]=stages['absorbers'][absorber.form]
+            elif reusable:
+                dabs=self._cachedLengths(signature,absorber.form)
+                if dabs is not None:
+                    lengths[absorber.form]=dabs
+        missing=[absorber for absorber in absorbers if absorber.form not in lengths]
+        computed=self._absorberDistances(detector,stages['dTmap'],stages['sourcePoint'],missing)
+        if reusable:
+            for form,dabs in computed.items():
+                self._storeLengths(signature,form,dabs)
+        lengths.update(computed)
+        stages['absorbers']=lengths
+        #the stages are shared with the caches, the caller gets copies
+        dTmap={key: value.copy() for key,value in stages['dTmap'].items()}
+        self._addAbsorbers(dTmap,lengths)
+        return dTmap,PointArray(stages['sourcePoint'].x,stages['sourcePoint'].y)
+
+    def _exportStages(self,k,name,seed):
+        """The function to get the stages of a calculated unit (eg. in a worker
+        process) to be imported by :meth:`Experiment._importStages()`.
+
+        Returns
+        -------
+        dict or None
+            the stages of the unit (see :meth:`Experiment._stagedDistances()`),
+            None if they are not reusable.
+        """
+        if self.randomNum==1:
+            return self._stages.get((k,name))
+        if seed is None:
+            return None
+        signature=self._traceSignature(self.detectors[name],k,seed)
+        entry=traceMemory.get(('trace',signature))
+        if entry is None:
+            return None
+        absorbers={}
+        for absorber in self.absorbers.values():
+            dabs=traceMemory.get(('absorber',signature,absorber.form))
+            if dabs is not None:
+                absorbers[absorber.form]=dabs
+        return {'trace': signature, 'dTmap': entry[0], 'sourcePoint': entry[1], 'absorbers': absorbers}
+
+    def _importStages(self,unit,stages):
+        """The function to keep the stages of a unit calculated elsewhere (see
+        :meth:`Experiment._exportStages()`): in the Experiment if the source
+        locations are not random, otherwise in :data:`feign.cache.traceMemory`."""
+        if self.randomNum==1:
+            self._stages[unit]=stages
+        else:
+            self._storeTrace(stages,disk=False)
+            for form,dabs in stages['absorbers'].items():
+                dabs.setflags(write=False)
+                traceMemory.put(('absorber',stages['trace'],form),dabs,dabs.nbytes)
+
+    def _cachedTrace(self,signature):
+        """The function to look up the tracing stage of a work unit in the
+        process-wide memory cache (:data:`feign.cache.traceMemory`), then in the
+        disk cache (see :meth:`Experiment.set_cache()`).
+
+        The entries are keyed by the content of the geometry (see
+        :meth:`Experiment._traceSignature()`) and not by the identity of the shared
+        objects (Assembly, Pin, Collimator): the objects can be modified in place,
+        and they are different objects in each process and in each script, while
+        geometries with equal content share the entries. The random stages are drawn
+        for a given detector, thus they are shared only by detectors with the same
+        identifier.
+
+        Returns
+        -------
+        dict or None
+            the stages of the unit (see :meth:`Experiment._stagedDistances()`),
+            None if the unit is not cached.
+        """
+        entry=traceMemory.get(('trace',signature))
+        if entry is not None:
+            return {'trace': signature, 'dTmap': entry[0], 'sourcePoint': entry[1], 'absorbers': {}}
+        if self._cache is None:
+            return None
+        entry=self._cache.load(self._cache.key(signature))
+        if entry is None:
+            return None
+        stages={'trace': signature, 'dTmap': dict(zip(self.materials,entry['dT'])),
+                'sourcePoint': PointArray(entry['sourceX'],entry['sourceY']), 'absorbers': {}}
+        self._storeTrace(stages,disk=False)
+        return stages
+
+    def _storeTrace(self,stages,disk=True):
+        """The function to store the tracing stage of a work unit in the caches.
+        The stored arrays are shared by the Experiment objects of the process, thus
+        they are made read-only."""
+        dTmap=stages['dTmap']
+        sourcePoint=stages['sourcePoint']
+        for value in dTmap.values():
+            value.setflags(write=False)
+        sourcePoint._xy.setflags(write=False)
+        nbytes=sum(value.nbytes for value in dTmap.values())+sourcePoint.x.nbytes+sourcePoint.y.nbytes
+        traceMemory.put(('trace',stages['trace']),(dTmap,sourcePoint),nbytes)
+        if disk and self._cache is not None:
+            self._cache.store(self._cache.key(stages['trace']),dT=np.array([dTmap[mat] for mat in self.materials]),
+                              sourceX=sourcePoint.x,sourceY=sourcePoint.y)
+
+    def _cachedLengths(self,signature,form):
+        """The function to look up the distances within an absorber of a given
+        form in the caches (see :meth:`Experiment._cachedTrace()`)."""
+        dabs=traceMemory.get(('absorber',signature,form))
+        if dabs is None and self._cache is not None:
+            entry=self._cache.load(self._cache.key(signature,form))
+            if entry is not None:
+                dabs=entry['lengths']
+                dabs.setflags(write=False)
+                traceMemory.put(('absorber',signature,form),dabs,dabs.nbytes)
+        return dabs
+
+    def _storeLengths(self,signature,form,dabs):
+        """The function to store the distances within an absorber in the caches
+        (read-only, see :meth:`Experiment._storeTrace()`)."""
+        dabs.setflags(write=False)
+        traceMemory.put(('absorber',signature,form),dabs,dabs.nbytes)
+        if self._cache is not None:
+            self._cache.store(self._cache.key(signature,form),lengths=dabs)
+
+    def _invalidate(self,names=None):
+        """The function to drop the stored stages (see :meth:`Experiment._stagedDistances()`)
+        of the detectors names (by default of all the detectors)."""
+        for unit in list(self._stages):
+            if names is None or unit[1] in names:
+                del self._stages[unit]
+
+    def _runUnit(self,k,name,plan,results,seed,sourceNorm,verbose=True):
+        """The function to calculate the travelled distances and the contributions
+        of a work unit (random sample k, detector name). If seed is given, the
+        random source locations are drawn from the stream of the unit (see
+        :meth:`Experiment._unitRng()`), otherwise from the global numpy random stream.
+
+        Returns
+        -------
+        tuple
+            (dTmap, sourcePoint, contributionMap, geomEff) of the unit, the last two are
+            None if :attr:`elines` are not set.
+        """
+        detector=self.detectors[name]
+        if plan[name] is None:
+            if verbose:
                 print("Distance travelled to detector "+name+" is being calculated")
-                dTmap[name],sourcePoint[name]=self.distanceTravelled(self.detectors[name]) 
-            dTmaps.append(dTmap)
-            sourcePoints.append(sourcePoint)    
-            if self._elines is not None:
-                if k==0:
-                    self.get_MuTable()
-                geomefficiency={}
-                geomefficiencyAve=np.zeros(len(self._elines))
-                contributionMapAve={e: np.zeros((self.assembly.N,self.assembly.M)) for e in self._elines}
-                contributionMap={}
-                for name in self.detectors:
-                    print('Contribution to detector %s is calculated...'%(name))
-                    contributionMap[name]={}
-                    geomefficiency[name]=np.zeros(len(self._elines))
-                    for e in self._elines:
-                        print('...for gamma energy %s MeV'%(e))
-                        mue=self._mu[e]
-                        muem={key: mue[key]*self.materials[key].density for key in mue.keys()}
-                        contributionMap[name][e]=self.attenuation(dTmap[name],muem,self.detectors[name],sourcePoint[name])
-                        contributionMapAve[e]=contributionMapAve[e]+contributionMap[name][e]/len(self.detectors)
-                    geomefficiency[name]=np.array([np.sum(contribution) for contribution in contributionMap[name].values()])/sourceNorm
-                    geomefficiencyAve=geomefficiencyAve+geomefficiency[name]/len(self.detectors)
-                contributionMaps.append(contributionMap)
-                contributionMapAves.append(contributionMapAve)
-                geomefficiencies.append(geomefficiency)
-                geomefficiencyAves.append(geomefficiencyAve)            
-        self._sourcePoints=sourcePoints
-        #Various Numpy manipulations to restructure the "plural" lists containing data for
-        #each random sample. Then the mean and the std of the "plural" lists is calculated.
-        
-        #restructuring dTmaps: from the list of dictionaries, make a dictionary of lists
-        #then take the mean and std of the maps in the inner list
-        dTmapsRe={det: {mat: [dmap[det][mat] for dmap in dTmaps] for mat in self.materials} for det in self.detectors}
-        dTmap={} #will be the average
-        dTmapErr={} #will be the std
-        for det in dTmapsRe:
-            dTmap[det]={}
-            dTmapErr[det]={}
-            for mat in dTmapsRe[det]:
-                dTmapToAve=np.array([np.ravel(dT) for dT in dTmapsRe[det][mat]])
-                dTmap[det][mat]=np.mean(dTmapToAve,axis=0).reshape((self.assembly.N,self.assembly.M))
+            dTmap,sourcePoint=self._stagedDistances(k,name,seed,verbose)
+        else:
+            if verbose:
+                print("Distance travelled to detector "+name+" is derived by symmetry")
+            other,op=plan[name]
+            dTmap,sourcePoint=self._mapImage(op,results[(k,other)][0],results[(k,other)][1])
+        if self._elines is None:
+            return dTmap,sourcePoint,None,None
+        if verbose:
+            print('Contribution to detector %s is calculated for %d gamma energies'%(name,len(self._elines)))
+        #linear attenuation coefficients, rows are materials, columns are energies
+        muem=np.array([[self._mu[e][key]*self.materials[key].density for e in self._elines] for key in self.materials])
+        contributions=self.attenuations(dTmap,muem,detector,sourcePoint)
+        contributionMap={e: contributions[k] for k,e in enumerate(self._elines)}
+        geomefficiency=contributions.sum(axis=(1,2))/sourceNorm
+        return dTmap,sourcePoint,contributionMap,geomefficiency
+
+    def _newStatistics(self):
+        """The function to create the running statistics of a run (see
+        :meth:`Experiment._accumulate()`).
+
+        Returns
+        -------
+        dict
+            :class:`RunningMoments` of the travelled distances (with np.Inf set to 0,
+            see the note in the class docstring), the contribution maps and the
+            geometric efficiencies, the running sums of the travelled distances, and
+            the lists of the samples if :attr:`keepSamples` is set.
+        """
+        statistics={'dTmapSum': {det: {mat: None for mat in self.materials} for det in self.detectors},
+                    'dTmap': {det: {mat: RunningMoments() for mat in self.materials} for det in self.detectors}}
+        if self._elines is not None:
+            statistics['contributionMap']={det: {e: RunningMoments() for e in self._elines} for det in self.detectors}
+            statistics['contributionMapAve']={e: RunningMoments() for e in self._elines}
+            statistics['geomEff']={det: RunningMoments() for det in self.detectors}
+            statistics['geomEffAve']=RunningMoments()
+        if self._keepSamples:
+            statistics['samples']={'dTmaps': [], 'sourcePoints': [], 'contributionMaps': [],
+                                   'contributionMapAves': [], 'geomEffs': [], 'geomEffAves': []}
+        return statistics
+
+    def _accumulate(self,statistics,k,results):
+        """The function to add the results of random sample k to the running
+        statistics, and to remove them from results.
+
+        Parameters
+        ----------
+        statistics : dict
+            the running statistics, see :meth:`Experiment._newStatistics()`
+        k : int
+            index of the random sample
+        results : dict
+            Keys are (sample index, detector identifier) tuples, values are the
+            results of the work units (see :meth:`Experiment._runUnit()`).
+        """
+        sample={name: results.pop((k,name)) for name in self.detectors}
+        for det in self.detectors:
+            for mat in self.materials:
+                dT=sample[det][0][mat]
+                total=statistics['dTmapSum'][det][mat]
+                statistics['dTmapSum'][det][mat]=dT.copy() if total is None else total+dT
                 #dTmap elements may be np.Inf if the ray did not pass through the collimator
                 #this is useful to get 0 in attenuation() for those locations
                 #and it makes std calculation impossible, thus we set it to 0. see not in docstring!
-                dTmapToAve=np.where(dTmapToAve==np.Inf,0.0,dTmapToAve) 
-                dTmapErr[det][mat]=np.std(dTmapToAve,axis=0).reshape((self.assembly.N,self.assembly.M))
+                statistics['dTmap'][det][mat].add(np.where(dT==np.Inf,0.0,dT))
+        if self._elines is not None:
+            contributionMap={name: sample[name][2] for name in self.detectors}
+            geomefficiency={name: sample[name][3] for name in self.detectors}
+            geomefficiencyAve=np.zeros(len(self._elines))
+            contributionMapAve={e: np.zeros((self.assembly.N,self.assembly.M)) for e in self._elines}
+            for name in self.detectors:
+                for e in self._elines:
+                    contributionMapAve[e]=contributionMapAve[e]+contributionMap[name][e]/len(self.detectors)
+                geomefficiencyAve=geomefficiencyAve+geomefficiency[name]/len(self.detectors)
+            for det in self.detectors:
+                for e in self._elines:
+                    statistics['contributionMap'][det][e].add(contributionMap[det][e])
+                statistics['geomEff'][det].add(geomefficiency[det])
+            for e in self._elines:
+                statistics['contributionMapAve'][e].add(contributionMapAve[e])
+            statistics['geomEffAve'].add(geomefficiencyAve)
+        if self._keepSamples:
+            samples=statistics['samples']
+            samples['dTmaps'].append({name: sample[name][0] for name in self.detectors})
+            samples['sourcePoints'].append({name: sample[name][1] for name in self.detectors})
+            if self._elines is not None:
+                samples['contributionMaps'].append(contributionMap)
+                samples['contributionMapAves'].append(contributionMapAve)
+                samples['geomEffs'].append(geomefficiency)
+                samples['geomEffAves'].append(geomefficiencyAve)
+
+    def _finishStatistics(self,statistics):
+        """The function to compute the mean and the std of the random samples
+        from the running statistics (see :meth:`Experiment._accumulate()`), and
+        to update the attributes.
+        """
+        samples=statistics.get('samples',{})
+        self._sourcePoints=samples.get('sourcePoints')
+        self._dTmap={det: {mat: statistics['dTmapSum'][det][mat]/statistics['dTmap'][det][mat].count
+                           for mat in self.materials} for det in self.detectors}
+        self._dTmapErr={det: {mat: statistics['dTmap'][det][mat].std for mat in self.materials}
+                        for det in self.detectors}
+        self._dTmaps=samples.get('dTmaps')
+
+        if self._elines is not None:
+            self._contributionMap={det: {e: statistics['contributionMap'][det][e].mean for e in self._elines}
+                                   for det in self.detectors}
+            self._contributionMapErr={det: {e: statistics['contributionMap'][det][e].std for e in self._elines}
+                                      for det in self.detectors}
+            self._contributionMaps=samples.get('contributionMaps')
+            self._contributionMapAve={e: statistics['contributionMapAve'][e].mean for e in self._elines}
+            self._contributionMapAveErr={e: statistics['contributionMapAve'][e].std for e in self._elines}
+            self._contributionMapAves=samples.get('contributionMapAves')
+            self._geomEff={det: statistics['geomEff'][det].mean for det in self.detectors}
+            self._geomEffErr={det: statistics['geomEff'][det].std for det in self.detectors}
+            self._geomEffs=samples.get('geomEffs')
+            self._geomEffAve=statistics['geomEffAve'].mean
+            self._geomEffAveErr=statistics['geomEffAve'].std
+            self._geomEffAves=samples.get('geomEffAves')
+
+            self._writeOutput()
+
+    def RunShard(self,path,samples=None,detectors=None,workers=None):
+        """The function to run a part (shard) of an Experiment, and to save the
+        partial results into a file. The partial results of the shards can be merged
+        with :meth:`Experiment.merge_shards()`, which updates the same attributes as
+        :meth:`Experiment.Run()` (except the lists of all the samples).
+
+        Parameters
+        ----------
+        path : str
+            path of the partial result file (numpy .npz format)
+        samples : list of int, optional
+            indices of the random samples (between 0 and :attr:`randomNum`-1)
+            calculated in the shard, by default all.
+        detectors : list of str, optional
+            identifiers of the detectors calculated in the shard, by default all.
+        workers : int, optional
+            number of worker processes, see :meth:`Experiment.Run()`
+
+        Raises
+        ------
+        ValueError
+            if :attr:`seed` is not set, or the samples or the detectors are not in the Experiment.
+
+        Notes
+        -----
+        The random stream of each (sample, detector) unit is derived from :attr:`seed`,
+        the index of the sample and the detector ID, thus the results do not depend
+        on how the work is split into shards (the same seed has to be set in each shard).
+
+        The file contains the count, the sum and the sum of squared deviations from the
+        mean of the samples of the travelled distances, the contribution maps and the
+        geometric efficiencies, and the sample-wise partial sums of the detector averaged
+        quantities.
+        """
+        if self._seed is None:
+            raise ValueError('seed has to be set for sharded runs')
+        samples=list(range(self.randomNum)) if samples is None else [int(k) for k in samples]
+        detectors=list(self.detectors) if detectors is None else list(detectors)
+        if len(samples)==0 or len(set(samples))!=len(samples) or False in [0<=k<self.randomNum for k in samples]:
+            raise ValueError('samples have to be distinct indices between 0 and randomNum-1')
+        if len(detectors)==0 or len(set(detectors))!=len(detectors) or False in [name in self.detectors for name in detectors]:
+            raise ValueError('detectors have to be distinct detector IDs of the Experiment')
+        ops,sourceNorm=self._prepareRun()
+        plan=self._symmetryPlan(ops,detectors)
+        units=[(k,name) for k in samples for name in detectors]
+        results=self._runUnits(units,plan,sourceNorm,workers,self._seed)
+
+        mats=list(self.materials)
+        header={'randomNum': self.randomNum, 'detectors': detectors, 'allDetectors': list(self.detectors),
+                'samples': samples, 'materials': mats, 'elines': self._elines,
+                'N': self.assembly.N, 'M': self.assembly.M}
+        stats={}
+        for a,name in enumerate(detectors):
+            dT=np.array([[results[(k,name)][0][mat] for mat in mats] for k in samples])
+            stats['dTmapSum%d'%a]=np.sum(dT,axis=0)
+            #Inf is set to 0 for the std, see the note in the class docstring
+            n,stats['dTmapZeroSum%d'%a],stats['dTmapZeroM2%d'%a]=sampleMoments(np.where(dT==np.Inf,0.0,dT))
+            if self._elines is not None:
+                cmap=np.array([[results[(k,name)][2][e] for e in self._elines] for k in samples])
+                n,stats['contributionMapSum%d'%a],stats['contributionMapM2%d'%a]=sampleMoments(cmap)
+                geff=np.array([results[(k,name)][3] for k in samples])
+                n,stats['geomEffSum%d'%a],stats['geomEffM2%d'%a]=sampleMoments(geff)
+        if self._elines is not None:
+            #sample-wise partial sums of the detector averages
+            stats['contributionMapAvePart']=np.array([[sum(results[(k,name)][2][e] for name in detectors)/len(self.detectors)
+                                                       for e in self._elines] for k in samples])
+            stats['geomEffAvePart']=np.array([sum(results[(k,name)][3] for name in detectors)/len(self.detectors)
+                                              for k in samples])
+        np.savez_compressed(path,header=np.array(json.dumps(header)),**stats)
+
+    def merge_shards(self,*paths):
+        """The function to merge the partial results of shards (see
+        :meth:`Experiment.RunShard()`), and to update the dTmap, contributionMap,
+        contributionMapAve and geomEff attributes and their errors.
+
+        Parameters
+        ----------
+        *paths : str
+            paths of the partial result files
+
+        Raises
+        ------
+        ValueError
+            if the shards do not cover each (sample, detector) unit of the Experiment
+            exactly once, or they belong to a different Experiment.
+        """
+        shards=[]
+        for path in paths:
+            data=np.load(path)
+            shards.append((json.loads(str(data['header'])),{key: data[key] for key in data.files if key!='header'}))
+        if len(shards)==0:
+            raise ValueError('No shards to merge')
+        header=shards[0][0]
+        for h,_ in shards:
+            if (h['randomNum'],h['allDetectors'],h['materials'],h['elines'],h['N'],h['M'])!=(header['randomNum'],header['allDetectors'],header['materials'],header['elines'],header['N'],header['M']):
+                raise ValueError('Shards belong to different Experiments')
+        if header['allDetectors']!=list(self.detectors) or header['materials']!=list(self.materials) or header['randomNum']!=self.randomNum:
+            raise ValueError('Shards belong to a different Experiment')
+        units=[(k,name) for h,_ in shards for k in h['samples'] for name in h['detectors']]
+        if len(units)!=len(set(units)) or set(units)!=set((k,name) for k in range(self.randomNum) for name in self.detectors):
+            raise ValueError('Shards have to cover each sample and detector exactly once')
+
+        N,M=header['N'],header['M']
+        mats=header['materials']
+        elines=header['elines']
+        dTmap={}
+        dTmapErr={}
+        contributionMap={}
+        contributionMapErr={}
+        geomEff={}
+        geomEffErr={}
+        for name in self.detectors:
+            parts=[(h['detectors'].index(name),len(h['samples']),stats) for h,stats in shards if name in h['detectors']]
+            total=sum(stats['dTmapSum%d'%a] for a,n,stats in parts)
+            mean,std=mergeMoments([(n,stats['dTmapZeroSum%d'%a],stats['dTmapZeroM2%d'%a]) for a,n,stats in parts])
+            dTmap[name]={mat: total[m]/self.randomNum for m,mat in enumerate(mats)}
+            dTmapErr[name]={mat: std[m] for m,mat in enumerate(mats)}
+            if elines is not None:
+                mean,std=mergeMoments([(n,stats['contributionMapSum%d'%a],stats['contributionMapM2%d'%a]) for a,n,stats in parts])
+                contributionMap[name]={e: mean[ei] for ei,e in enumerate(elines)}
+                contributionMapErr[name]={e: std[ei] for ei,e in enumerate(elines)}
+                geomEff[name],geomEffErr[name]=mergeMoments([(n,stats['geomEffSum%d'%a],stats['geomEffM2%d'%a]) for a,n,stats in parts])
         self._dTmap=dTmap
         self._dTmapErr=dTmapErr
-        self._dTmaps=dTmaps
-         
-        if self._elines is not None:  
-            #restructuring contributionMaps
-            contributionMapsRe={det: {e: [cmap[det][e] for cmap in contributionMaps] for e in self._elines} for det in self.detectors}
-            contributionMap={} #will be the average
-            contributionMapErr={} #will be the stdcontributionMapAves
-            for det in contributionMapsRe:
-                contributionMap[det]={}
-                contributionMapErr[det]={}
-                for e in contributionMapsRe[det]:
-                    cMapToAve=np.array([np.ravel(cm) for cm in contributionMapsRe[det][e]])
-                    contributionMap[det][e]=np.mean(cMapToAve,axis=0).reshape((self.assembly.N,self.assembly.M))
-                    contributionMapErr[det][e]=np.std(cMapToAve,axis=0).reshape((self.assembly.N,self.assembly.M))
+        self._dTmaps=None
+        self._sourcePoints=None
+        if elines is not None:
+            cmapAves=np.zeros((self.randomNum,len(elines),N,M))
+            geffAves=np.zeros((self.randomNum,len(elines)))
+            for h,stats in shards:
+                cmapAves[h['samples']]+=stats['contributionMapAvePart']
+                geffAves[h['samples']]+=stats['geomEffAvePart']
             self._contributionMap=contributionMap
             self._contributionMapErr=contributionMapErr
-            self._contributionMaps=contributionMaps
-            
-            #restructuring contributionMapAves
-            contributionMapAvesRe={e: [cmap[e] for cmap in contributionMapAves] for e in self._elines}
-            contributionMapAve={} #will be the average
-            contributionMapAveErr={} #will be the std
-            for e in contributionMapAvesRe:
-                cMapToAve=np.array([np.ravel(cm) for cm in contributionMapAvesRe[e]])
-                contributionMapAve[e]=np.mean(cMapToAve,axis=0).reshape((self.assembly.N,self.assembly.M))
-                contributionMapAveErr[e]=np.std(cMapToAve,axis=0).reshape((self.assembly.N,self.assembly.M))
-            self._contributionMapAve=contributionMapAve
-            self._contributionMapAveErr=contributionMapAveErr
-            self._contributionMapAves=contributionMapAves
-   
-            #restructuring geomefficiencies
-            geomefficienciesRe={det: [geff[det] for geff in geomefficiencies] for det in self._detectors}
-            geomefficiency={} #will be the average
-            geomefficiencyErr={} #will be the std
-            for det in geomefficienciesRe:
-                geffToAve=np.array([geff for geff in geomefficienciesRe[det]])
-                geomefficiency[det]=np.mean(geffToAve,axis=0)
-                geomefficiencyErr[det]=np.std(geffToAve,axis=0)
-            self._geomEff=geomefficiency
-            self._geomEffErr=geomefficiencyErr
-            self._geomEffs=geomefficiencies
-            
-            #restructuring geomefficiencyAves
-            geomefficiencyAve=np.mean(np.array([geff for geff in geomefficiencyAves]),axis=0)
-            geomefficiencyAveErr=np.std(np.array([geff for geff in geomefficiencyAves]),axis=0)
-            self._geomEffAve=geomefficiencyAve
-            self._geomEffAveErr=geomefficiencyAveErr
-            self._geomEffAves=geomefficiencyAves
-            
-            if self.output is not None:
-                output=open(self.output,'w')
-                for e,c in zip(self._elines,self._geomEffAve):
-                    output.write(e+'\t'+str(c)+'\n')
-                output.close()
+            self._contributionMaps=None
+            self._contributionMapAve={e: np.mean(cmapAves[:,ei],axis=0) for ei,e in enumerate(elines)}
+            self._contributionMapAveErr={e: np.std(cmapAves[:,ei],axis=0) for ei,e in enumerate(elines)}
+            self._contributionMapAves=None
+            self._geomEff=geomEff
+            self._geomEffErr=geomEffErr
+            self._geomEffs=None
+            self._geomEffAve=np.mean(geffAves,axis=0)
+            self._geomEffAveErr=np.std(geffAves,axis=0)
+            self._geomEffAves=None
+            self._writeOutput()
+
+    def _writeOutput(self):
+        """The function to print the detector averaged geometric efficiency into :attr:`output`."""
+        if self.output is not None:
+            output=open(self.output,'w')
+            for e,c in zip(self._elines,self._geomEffAve):
+                output.write(e+'\t'+str(c)+'\n')
+            output.close()
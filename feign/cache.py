@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+feign cache module
+
+Content addressed storage of traced distance maps on disk, which can be shared
+by many runs and processes (see :meth:`feign.blocks.Experiment.set_cache()`),
+and a memory bounded cache shared by the Experiment objects of a process.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import zipfile
+import threading
+import collections
+import numpy as np
+from feign.geometry import *
+
+#version of the stored content, included in every key
+cacheVersion='feign-trace-1'
+#temporary files older than this (in seconds) are left by crashed writers
+staleSeconds=3600
+#the directory is listed again after this many stores, since other processes write as well
+rescanStores=64
+
+def canonical(obj):
+    """The function to convert a description of a geometry (nested tuples and
+    lists of str, int, float, None and geometry objects) into a JSON serializable
+    form, which does not depend on the process or the platform.
+
+    Parameters
+    ----------
+    obj : object
+        the description
+
+    Returns
+    -------
+    object
+        nested lists of str, int, bool and None. Floats are given by their shortest
+        exact repr, the geometry objects are given by their class name and arguments.
+
+    Raises
+    ------
+    TypeError
+        if obj contains an object of other type
+    """
+    if obj is None or isinstance(obj,(bool,int,str)):
+        return obj
+    elif isinstance(obj,(float,np.floating)):
+        return repr(float(obj))
+    elif isinstance(obj,Point):
+        return ['Point',repr(float(obj.x)),repr(float(obj.y))]
+    elif isinstance(obj,(Segment,Circle,Polygon)):
+        return [type(obj).__name__]+[canonical(arg) for arg in obj._args()]
+    elif isinstance(obj,(tuple,list)):
+        return [canonical(item) for item in obj]
+    else:
+        raise TypeError('%s cannot be part of a cache key'%type(obj).__name__)
+
+class TraceCache(object):
+    """A class used to represent a directory of cached arrays.
+
+    Each entry is a compressed numpy .npz file named by the sha256 hash of its
+    key. Entries are written into a temporary file first and then renamed, thus
+    concurrent readers see either the complete entry or no entry, and concurrent
+    writers of the same entry do not corrupt each other. The modification time of
+    an entry is updated when it is loaded, and the least recently used entries are
+    removed when the size of the directory exceeds maxBytes.
+
+    The size of the directory is tracked by the stores, and the directory is listed
+    only at the first store, when the tracked size exceeds maxBytes, and after every
+    :data:`rescanStores` stores (to count the entries of other processes). Temporary
+    files older than :data:`staleSeconds` (left by crashed writers) are removed when
+    the directory is listed.
+
+    Parameters
+    ----------
+    directory : str
+        path of the cache directory, it is created if it does not exist.
+    maxBytes : int, optional
+        upper limit of the total size of the entries, by default unlimited.
+
+    Attributes
+    ----------
+    directory : str
+        path of the cache directory
+    maxBytes : int or None
+        upper limit of the total size of the entries
+
+    Raises
+    ------
+    TypeError
+        if maxBytes is not int or None
+
+    Examples
+    --------
+    >>> cache=TraceCache('tracecache',maxBytes=2**30)
+    >>> key=cache.key('example',(Point(0,0),1.26))
+    >>> cache.store(key,dT=np.zeros((2,2)))
+    >>> cache.load(key)['dT'].shape
+    (2, 2)
+    """
+    def __init__(self,directory,maxBytes=None):
+        if maxBytes is not None and not isinstance(maxBytes,int):
+            raise TypeError('maxBytes has to be int or None')
+        self._directory=str(directory)
+        self._maxBytes=maxBytes
+        #size of the directory, None until it is listed
+        self._nbytes=None
+        self._stores=0
+        os.makedirs(self._directory,exist_ok=True)
+
+    def __repr__(self):
+        return "TraceCache(directory=%s)"%(self._directory)
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def maxBytes(self):
+        return self._maxBytes
+
+    def key(self,*parts):
+        """The function to create the key of an entry from the description of its
+        content (see :func:`canonical`).
+
+        Returns
+        -------
+        str
+            hexadecimal sha256 hash
+        """
+        text=json.dumps([cacheVersion,canonical(parts)],separators=(',',':'))
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def _path(self,key):
+        return os.path.join(self._directory,key+'.npz')
+
+    def load(self,key):
+        """The function to load an entry.
+
+        Returns
+        -------
+        dict or None
+            Keys are the names of the arrays, values are numpy arrays. None if the
+            entry is not in the cache (or it has been removed in the meantime).
+        """
+        path=self._path(key)
+        try:
+            with np.load(path) as data:
+                arrays={name: data[name] for name in data.files}
+        except (OSError,ValueError,EOFError,zipfile.BadZipFile):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return arrays
+
+    def store(self,key,**arrays):
+        """The function to store arrays as an entry, and to remove the least
+        recently used entries if the cache is too large."""
+        fd,tmp=tempfile.mkstemp(dir=self._directory,suffix='.tmp')
+        try:
+            with os.fdopen(fd,'wb') as f:
+                np.savez_compressed(f,**arrays)
+                size=f.tell()
+            #the cache may be shared by the jobs of other users
+            os.chmod(tmp,0o644)
+            os.replace(tmp,self._path(key))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self._stores=self._stores+1
+        if self._nbytes is None or self._stores%rescanStores==0:
+            self._scan(self._maxBytes)
+        else:
+            #a replaced entry is counted twice until the next listing
+            self._nbytes=self._nbytes+size
+            if self._maxBytes is not None and self._nbytes>self._maxBytes:
+                self._scan(self._maxBytes)
+
+    def evict(self,maxBytes=0):
+        """The function to remove the least recently used entries until the total
+        size of the entries is at most maxBytes (by default every entry is removed)."""
+        self._scan(maxBytes)
+
+    def _scan(self,maxBytes):
+        """The function to list the directory, to remove the stale temporary files
+        and the least recently used entries above maxBytes (None for no limit), and
+        to update the tracked size."""
+        entries=[]
+        total=0
+        now=time.time()
+        for name in os.listdir(self._directory):
+            if not name.endswith(('.npz','.tmp')):
+                continue
+            path=os.path.join(self._directory,name)
+            try:
+                stat=os.stat(path)
+            except FileNotFoundError:
+                continue
+            if name.endswith('.tmp'):
+                if now-stat.st_mtime>staleSeconds:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                else:
+                    #being written, it cannot be removed
+                    total=total+stat.st_size
+                continue
+            entries.append((stat.st_mtime,stat.st_size,name))
+            total=total+stat.st_size
+        if maxBytes is not None:
+            for mtime,size,name in sorted(entries):
+                if total<=maxBytes:
+                    break
+                try:
+                    os.remove(os.path.join(self._directory,name))
+                except FileNotFoundError:
+                    pass
+                total=total-size
+        self._nbytes=total
+
+class MemoryCache(object):
+    """A class used to represent a memory bounded cache of arrays within a process.
+
+    The entries are kept in the order of their last use, and the least recently
+    used entries are dropped when the total size of the arrays exceeds maxBytes.
+    The process-wide instance :data:`traceMemory` is shared by all the Experiment
+    objects (see :meth:`feign.blocks.Experiment._stagedDistances()`).
+
+    Parameters
+    ----------
+    maxBytes : int
+        upper limit of the total size of the entries (0 disables the cache)
+
+    Attributes
+    ----------
+    maxBytes : int
+        upper limit of the total size of the entries
+    nbytes : int
+        total size of the entries
+    hits : int
+        number of successful lookups
+    misses : int
+        number of lookups of missing entries
+    evictions : int
+        number of dropped entries
+
+    Examples
+    --------
+    >>> traceMemory.set_maxBytes(2**28)
+    >>> traceMemory.stats()
+    {'entries': 0, 'nbytes': 0, 'maxBytes': 268435456, 'hits': 0, 'misses': 0, 'evictions': 0}
+    """
+    def __init__(self,maxBytes):
+        self._entries=collections.OrderedDict()
+        self._lock=threading.Lock()
+        self._nbytes=0
+        self._hits=0
+        self._misses=0
+        self._evictions=0
+        self.set_maxBytes(maxBytes)
+
+    def __repr__(self):
+        return "MemoryCache(maxBytes=%d)"%(self._maxBytes)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def maxBytes(self):
+        return self._maxBytes
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    @property
+    def evictions(self):
+        return self._evictions
+
+    def set_maxBytes(self,maxBytes):
+        """The function to set the upper limit of the size of the cache, the least
+        recently used entries are dropped above it."""
+        if not isinstance(maxBytes,int) or maxBytes<0:
+            raise ValueError('maxBytes has to be a non-negative int')
+        with self._lock:
+            self._maxBytes=maxBytes
+            self._evict()
+
+    def get(self,key):
+        """The function to get an entry.
+
+        Returns
+        -------
+        object or None
+            the value of the entry, None if the key is not in the cache.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits=self._hits+1
+                return self._entries[key][0]
+            self._misses=self._misses+1
+            return None
+
+    def put(self,key,value,nbytes):
+        """The function to add an entry of nbytes size. Entries larger than
+        :attr:`maxBytes` are not kept."""
+        with self._lock:
+            if key in self._entries:
+                self._nbytes=self._nbytes-self._entries.pop(key)[1]
+            self._entries[key]=(value,nbytes)
+            self._nbytes=self._nbytes+nbytes
+            self._evict()
+
+    def _evict(self):
+        while self._nbytes>self._maxBytes and len(self._entries)>0:
+            key,(value,nbytes)=self._entries.popitem(last=False)
+            self._nbytes=self._nbytes-nbytes
+            self._evictions=self._evictions+1
+
+    def clear(self):
+        """The function to drop every entry and to reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes=0
+            self._hits=0
+            self._misses=0
+            self._evictions=0
+
+    def stats(self):
+        """The function to summarize the use of the cache.
+
+        Returns
+        -------
+        dict
+            number of entries, size, size limit, hits, misses and evictions
+        """
+        return {'entries': len(self._entries), 'nbytes': self._nbytes, 'maxBytes': self._maxBytes,
+                'hits': self._hits, 'misses': self._misses, 'evictions': self._evictions}
+
+#process-wide cache of the traced distances, shared by the Experiment objects
+traceMemory=MemoryCache(2**28)
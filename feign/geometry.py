@@ -5,13 +5,45 @@ feign geometry module
 zs. elter 2019
 """
 import math
+import operator
 import numpy as np
 eps=1e-7
 
-class Point(object):
+class _Immutable(object):
+    """Helper base class of the slotted, immutable geometry primitives.
+    The attributes are set once with :meth:`_Immutable._set`, afterwards
+    any assignment raises AttributeError. Equality and hashing are based
+    on the defining arguments (:meth:`_args`), thus the objects can be
+    used as cache keys."""
+    __slots__=()
+
+    _set=object.__setattr__
+
+    def __setattr__(self,name,value):
+        raise AttributeError('%s is immutable' % (type(self).__name__))
+
+    def __delattr__(self,name):
+        raise AttributeError('%s is immutable' % (type(self).__name__))
+
+    def __eq__(self,other):
+        return type(self) is type(other) and self._args()==other._args()
+
+    def __ne__(self,other):
+        return not self==other
+
+    def __hash__(self):
+        return hash((type(self).__name__,self._args()))
+
+    def __reduce__(self):
+        return (type(self),self._args())
+
+class Point(tuple):
     """
     A class used to represent a Point.
 
+    Points are immutable (x,y) tuples, thus they are compared and hashed by
+    their coordinates.
+
     Parameters
     ----------
     x : float
@@ -27,12 +59,19 @@ class Point(object):
         y coordinate of Point in cm
     """
 
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
+    __slots__=()
+
+    def __new__(cls, x, y):
+        return tuple.__new__(cls,(x,y))
+
+    def __getnewargs__(self):
+        return (self[0],self[1])
 
     def __repr__(self):
-        return "Point(%.3f, %.3f)" % (self.x, self.y)
+        return "Point(%.3f, %.3f)" % (self[0], self[1])
+
+    x=property(operator.itemgetter(0))
+    y=property(operator.itemgetter(1))
 
     def distance(self, other):
         """The function calculates the distance of two Point objects.
@@ -166,10 +205,21 @@ class Point(object):
         return Point(self.x+xt,self.y+yt)
 
 
-class Segment(object):
+def _inSegment(t,dx,dy):
+    """Helper to assess whether parameter t is on a Segment with direction (dx,dy).
+    Same as :meth:`Point.inBetween()` for a point on the line: the tolerance is eps
+    along the dominant axis."""
+    m=max(abs(dx),abs(dy))
+    if m==0:
+        return False
+    return -eps/m<=t<=1+eps/m
+
+class Segment(_Immutable):
     """
     A class used to represent a Segment.
 
+    Segments are immutable and hashable.
+
     Parameters
     ----------
     p : Point()
@@ -191,33 +241,48 @@ class Segment(object):
         list of p and q
 
     """
+    __slots__=('_p','_q')
+
     def __init__(self,p,q):
-        self.p=p
-        self.q=q
-        self._points=[p,q]
-        if abs(q.x-p.x)<eps:
-            self._slope=np.Inf
-            self._intercept=q.x
-            #in this case the x coordinate is returned as the intercept!
-            #the intersection functions will make use of this
-        else:
-            self._slope=(q.y-p.y)/(q.x-p.x)
-            self._intercept=p.y-self._slope*p.x
+        self._set('_p',p)
+        self._set('_q',q)
 
     def __repr__(self):
         return "Segment(Point(%.3f, %.3f),Point(%.3f, %.3f))" % (self.p.x, self.p.y,self.q.x, self.q.y)
 
+    def _args(self):
+        return (self._p,self._q)
+
+    @property
+    def p(self):
+        return self._p
+
+    @property
+    def q(self):
+        return self._q
+
     @property
     def slope(self):
-        return self._slope
+        if abs(self.q.x-self.p.x)<eps:
+            return np.Inf
+        else:
+            return (self.q.y-self.p.y)/(self.q.x-self.p.x)
 
     @property
     def intercept(self):
-        return self._intercept
+        if abs(self.q.x-self.p.x)<eps:
+            return self.q.x #in this case the x coordinate is returned as the intercept!
+        else:
+            return self.p.y-self.slope*self.p.x
 
     @property
     def points(self):
-        return self._points
+        return [self._p,self._q]
+
+    @property
+    def bbox(self):
+        """axis-aligned bounding box as (xmin, ymin, xmax, ymax)"""
+        return (min(self.p.x,self.q.x),min(self.p.y,self.q.y),max(self.p.x,self.q.x),max(self.p.y,self.q.y))
 
     def intersection(self,other):
         """The function to find the intersection of two Segment objects.
@@ -249,20 +314,70 @@ class Segment(object):
         >>> s1.intersection(s3)
          []
         """
-        if abs(self.slope-other.slope)<eps: #parallel
-            return []
-        elif self.slope==np.Inf and other.slope!=np.Inf:
-            inter=Point(self.intercept,other.slope*self.intercept+other.intercept)
-        elif self.slope!=np.Inf and other.slope==np.Inf:
-            inter=Point(other.intercept,self.slope*other.intercept+self.intercept)
-        else:
-            inter=Point((other.intercept-self.intercept)/(self.slope-other.slope),(self.slope*other.intercept-other.slope*self.intercept)/(self.slope-other.slope))
+        return [other.point_at(t) for t in self.intersection_params(other)]
+
+    def intersection_params(self,other):
+        """The function to find the intersection of two Segment objects
+        parametrically, without creating Point() objects.
+
+        Parameters
+        ----------
+        other : Segment()
+            The Segment() for which the intersection is calculated
 
-        if inter.inBetween(self.p,self.q) and inter.inBetween(other.p,other.q):
-            return [inter]
+        Returns
+        -------
+        list of float
+            list of the parameters t of the intersections along `other`
+            (ie. the intersection is other.p+t*(other.q-other.p))
+
+        Notes
+        -----
+        The semantics are the same as of :meth:`Segment.intersection()`.
+
+        Examples
+        --------
+        >>> s1=Segment(Point(2,2),Point(-2,-2))
+        >>> s2=Segment(Point(-2,2),Point(2,-2))
+        >>> s1.intersection_params(s2)
+        [0.5]
+        """
+        dx=self.q.x-self.p.x
+        dy=self.q.y-self.p.y
+        ox=other.q.x-other.p.x
+        oy=other.q.y-other.p.y
+        denom=dx*oy-dy*ox
+        if abs(denom)<=eps*math.sqrt((dx*dx+dy*dy)*(ox*ox+oy*oy)): #parallel
+            return []
+        fx=other.p.x-self.p.x
+        fy=other.p.y-self.p.y
+        t=(fx*oy-fy*ox)/denom
+        u=(fx*dy-fy*dx)/denom
+        if _inSegment(t,dx,dy) and _inSegment(u,ox,oy):
+            return [u]
         else:
             return []
 
+    def point_at(self,t):
+        """The function to create the Point at parameter t along the Segment.
+
+        Parameters
+        ----------
+        t : float
+            parameter along the Segment (0 at p, 1 at q)
+
+        Returns
+        -------
+        Point()
+            the Point p+t*(q-p)
+
+        Examples
+        --------
+        >>> Segment(Point(0,0),Point(4,2)).point_at(0.5)
+        Point(2.000, 1.000)
+        """
+        return Point(self.p.x+t*(self.q.x-self.p.x),self.p.y+t*(self.q.y-self.p.y))
+
     def rotate(self,alpha):
         """The function to rotate a Segment around the origin with alpha (deg)
 
@@ -278,10 +393,12 @@ class Segment(object):
         """
         return Segment(self.p.rotate(alpha),self.q.rotate(alpha))
 
-class Circle(object):
+class Circle(_Immutable):
     """
     A class used to represent a Circle.
 
+    Circles are immutable and hashable.
+
     Parameters
     ----------
     c : Point()
@@ -297,13 +414,31 @@ class Circle(object):
         radius of Circle
     """
 
+    __slots__=('_c','_r')
+
     def __init__(self, c, r):
-        self.c = c
-        self.r = abs(r)
+        self._set('_c',c)
+        self._set('_r',abs(r))
+
+    def _args(self):
+        return (self._c,self._r)
+
+    @property
+    def c(self):
+        return self._c
+
+    @property
+    def r(self):
+        return self._r
 
     def __repr__(self):
         return "Circle(C=(%.3f, %.3f),R=%.3f)" % (self.c.x, self.c.y,self.r)
 
+    @property
+    def bbox(self):
+        """axis-aligned bounding box as (xmin, ymin, xmax, ymax)"""
+        return (self.c.x-self.r,self.c.y-self.r,self.c.x+self.r,self.c.y+self.r)
+
     def intersection(self,seg):
         """The function to find the intersection of a Circle with a Segment.
 
@@ -340,41 +475,51 @@ class Circle(object):
         >>> s3=Segment(Point(-8,1),Point(9,1))
         [Point(6.000, 1.000), Point(-4.000, 1.000)]
         """
-        if seg.slope==np.Inf:
-            if seg.intercept>self.c.x-self.r and seg.intercept<self.c.x+self.r:
-                y1=np.sqrt(self.r**2-(seg.intercept-self.c.x)**2)+self.c.y
-                y2=-1*np.sqrt(self.r**2-(seg.intercept-self.c.x)**2)+self.c.y
-                inter1=Point(seg.intercept,y1)
-                inter2=Point(seg.intercept,y2)
-                inters=[]
-                if inter1.inBetween(seg.p,seg.q):
-                    inters.append(inter1)
-                if inter2.inBetween(seg.p,seg.q):
-                    inters.append(inter2)
-                return inters
+        return [seg.point_at(t) for t in self.intersection_params(seg)]
 
-            else:
-                return []
-        else:
-            A=1+seg.slope**2
-            B=(2*(seg.intercept-self.c.y)*seg.slope-2*self.c.x)
-            C=(self.c.x**2+(seg.intercept-self.c.y)**2-self.r**2)
-            D = B**2-4*A*C
-            if D <= eps:
-                return []
-            else:
-                x1 = (-B+math.sqrt(B**2-4*A*C))/(2*A)
-                x2 = (-B-math.sqrt(B**2-4*A*C))/(2*A)
-                y1 = seg.intercept + seg.slope*x1
-                y2 = seg.intercept + seg.slope*x2
-                inter1=Point(x1,y1)
-                inter2=Point(x2,y2)
-                inters=[]
-                if inter1.inBetween(seg.p,seg.q):
-                    inters.append(inter1)
-                if inter2.inBetween(seg.p,seg.q):
-                    inters.append(inter2)
-                return inters
+    def intersection_params(self,seg):
+        """The function to find the intersection of a Circle with a Segment
+        parametrically, without creating Point() objects.
+
+        Parameters
+        ----------
+        seg : Segment()
+            The Segment for which the intersection is calculated
+
+        Returns
+        -------
+        list of float
+            list of the parameters t of the intersections along `seg`
+            (ie. the intersection is seg.p+t*(seg.q-seg.p))
+
+        Notes
+        -----
+        The semantics and the order are the same as of :meth:`Circle.intersection()`.
+
+        Examples
+        --------
+        >>> c=Circle(Point(1,1),5)
+        >>> c.intersection_params(Segment(Point(3,1),Point(9,1)))
+        [0.5]
+        """
+        dx=seg.q.x-seg.p.x
+        dy=seg.q.y-seg.p.y
+        fx=seg.p.x-self.c.x
+        fy=seg.p.y-self.c.y
+        a=dx*dx+dy*dy
+        if a==0:
+            return []
+        b=dx*fx+dy*fy
+        disc=b*b-a*(fx*fx+fy*fy-self.r*self.r)
+        if disc/a<=eps: #no intersection or tangent
+            return []
+        sq=math.sqrt(disc)
+        t1=(-b+sq)/a
+        t2=(-b-sq)/a
+        #the intersection with the greater x (or y if vertical) comes first
+        if (dx if abs(dx)>=eps else dy)<0:
+            t1,t2=t2,t1
+        return [t for t in (t1,t2) if _inSegment(t,dx,dy)]
 
     def encloses_point(self,P):
         """The function to assess whether a point is enclosed by a Circle.
@@ -404,13 +549,517 @@ class Circle(object):
         else:
             return False
 
-class Rectangle(object):
+    def encloses_points(self,points):
+        """The function to assess whether many points are enclosed by a Circle.
+
+        Parameters
+        ----------
+        points : array_like, shape (S,2) or PointArray()
+            points to decide whether are enclosed by the Circle
+
+        Returns
+        -------
+        numpy.ndarray of bool
+            True if the point is enclosed by the Circle, False otherwise.
+        """
+        points=np.asarray(points,dtype=float).reshape(-1,2)
+        return np.hypot(points[:,0]-self.c.x,points[:,1]-self.c.y)<self.r+eps
+
+def segment_intersection_params(p,q,a,b):
+    """The function to find the intersections of many Segments with many other
+    Segments in one vectorized call.
+
+    Parameters
+    ----------
+    p : array_like, shape (S,2)
+        first end points of the Segments
+    q : array_like, shape (S,2)
+        second end points of the Segments
+    a : array_like, shape (K,2)
+        first end points of the other Segments
+    b : array_like, shape (K,2)
+        second end points of the other Segments
+
+    Returns
+    -------
+    numpy.ndarray, shape (S,K)
+        parameter of the intersection along the Segment (the point is
+        p+t*(q-p)), NaN if the Segments do not intersect
+
+    Notes
+    -----
+    The semantics follow :meth:`Segment.intersection_params()`, ie. the value
+    is the same as of Segment(a,b).intersection_params(Segment(p,q)).
+
+    Examples
+    --------
+    >>> segment_intersection_params([[-2,2]],[[2,-2]],[[2,2]],[[-2,-2]])
+    array([[0.5]])
+    """
+    p=np.asarray(p,dtype=float).reshape(-1,2)
+    q=np.asarray(q,dtype=float).reshape(-1,2)
+    a=np.asarray(a,dtype=float).reshape(-1,2)
+    b=np.asarray(b,dtype=float).reshape(-1,2)
+    dx=b[:,0]-a[:,0]
+    dy=b[:,1]-a[:,1]
+    ox=(q[:,0]-p[:,0])[:,np.newaxis]
+    oy=(q[:,1]-p[:,1])[:,np.newaxis]
+    fx=p[:,0][:,np.newaxis]-a[:,0]
+    fy=p[:,1][:,np.newaxis]-a[:,1]
+    denom=dx*oy-dy*ox
+    parallel=np.abs(denom)<=eps*np.sqrt((dx*dx+dy*dy)*(ox*ox+oy*oy))
+    with np.errstate(divide='ignore',invalid='ignore'):
+        t=(fx*oy-fy*ox)/denom
+        u=(fx*dy-fy*dx)/denom
+        tolt=eps/np.maximum(np.abs(dx),np.abs(dy))
+        tolu=eps/np.maximum(np.abs(ox),np.abs(oy))
+    hit=~parallel&(t>=-tolt)&(t<=1+tolt)&(u>=-tolu)&(u<=1+tolu)
+    return np.where(hit,u,np.nan)
+
+def view_halfplanes(p,seg):
+    """The function to compute the half-planes which bound the region of points
+    seeing a point p through a Segment (ie. the points X for which the Segment
+    between X and p intersects seg).
+
+    The region is the part of the wedge with apex p spanned by the end points of
+    seg, which is behind the line of seg (seen from p).
+
+    Parameters
+    ----------
+    p : Point()
+        the viewpoint (eg. detector location)
+    seg : Segment()
+        the Segment through which p is seen (eg. opening of a collimator)
+
+    Returns
+    -------
+    numpy.ndarray, shape (3,3) or None
+        rows (nx,ny,c) with unit normals, the point X is inside of a half-plane
+        if nx*X.x+ny*X.y<=c. None if p is on the line of the Segment.
+
+    Examples
+    --------
+    >>> planes=view_halfplanes(Point(0,0),Segment(Point(1,-1),Point(1,1)))
+    >>> halfplanes_contain([[2,0],[0.5,0],[2,3]],planes)
+    array([ True, False, False])
+    """
+    def halfplane(ux,uy,qx,qy,sign):
+        #points X with sign*cross(u,X-q)>=0
+        nx,ny=sign*uy,-sign*ux
+        norm=math.sqrt(nx*nx+ny*ny)
+        return [nx/norm,ny/norm,(nx*qx+ny*qy)/norm]
+    ax,ay=seg.p.x,seg.p.y
+    bx,by=seg.q.x,seg.q.y
+    side=(bx-ax)*(p.y-ay)-(by-ay)*(p.x-ax)
+    if abs(side)<=eps*math.sqrt((bx-ax)**2+(by-ay)**2):
+        return None
+    sign=1 if side>0 else -1
+    #behind the line of the Segment, and inside the wedge
+    return np.array([halfplane(bx-ax,by-ay,ax,ay,-sign),
+                     halfplane(ax-p.x,ay-p.y,p.x,p.y,sign),
+                     halfplane(bx-p.x,by-p.y,p.x,p.y,-sign)])
+
+def halfplanes_contain(points,planes,tol=0.0):
+    """The function to assess whether many points are inside the intersection of
+    half-planes.
+
+    Parameters
+    ----------
+    points : array_like, shape (S,2) or PointArray()
+        points to be classified
+    planes : array_like, shape (K,3)
+        rows (nx,ny,c) of unit normal half-planes nx*x+ny*y<=c
+    tol : float, optional
+        points outside of a half-plane by at most tol are still inside
+
+    Returns
+    -------
+    numpy.ndarray of bool, shape (S,)
+        True if the point is inside of all the half-planes
+    """
+    points=np.asarray(points,dtype=float).reshape(-1,2)
+    planes=np.asarray(planes,dtype=float).reshape(-1,3)
+    return np.all(points@planes[:,:2].T<=planes[:,2]+tol,axis=1)
+
+def circle_intersection_params(p,q,c,r):
+    """The function to find the intersections of many Segments with many Circles
+    in one vectorized call.
+
+    The Segments are given by their end points, the Circles by their centers and
+    radii. Every Segment is intersected with every Circle.
+
+    Parameters
+    ----------
+    p : array_like, shape (S,2)
+        first end points of the Segments
+    q : array_like, shape (S,2)
+        second end points of the Segments
+    c : array_like, shape (C,2)
+        centers of the Circles
+    r : array_like, shape (C,)
+        radii of the Circles
+
+    Returns
+    -------
+    t1 : numpy.ndarray, shape (S,C)
+        parameter of the first intersection along the Segment (the point is
+        p+t1*(q-p)), NaN if the intersection is not on the Segment
+    t2 : numpy.ndarray, shape (S,C)
+        parameter of the second intersection along the Segment, NaN if the
+        intersection is not on the Segment
+
+    Notes
+    -----
+    The semantics follow :meth:`Circle.intersection()`: tangents have no
+    intersection, and intersections are kept only if they are on the Segment
+    (within eps). So if one endpoint of the Segment is enclosed by the Circle,
+    only one of t1 and t2 is a number.
+
+    Examples
+    --------
+    >>> t1,t2=circle_intersection_params([[-8,1]],[[9,1]],[[1,1]],[5])
+    >>> t1,t2
+    (array([[0.23529412]]), array([[0.82352941]]))
+    """
+    t1,t2,tol=_circle_roots(p,q,c,r)
+    t1=np.where((t1>=-tol)&(t1<=1+tol),t1,np.nan)
+    t2=np.where((t2>=-tol)&(t2<=1+tol),t2,np.nan)
+    return t1,t2
+
+def circle_chord_lengths(p,q,c,r):
+    """The function to compute the length of the parts of many Segments which
+    are enclosed by many Circles in one vectorized call.
+
+    Parameters
+    ----------
+    p : array_like, shape (S,2)
+        first end points of the Segments
+    q : array_like, shape (S,2)
+        second end points of the Segments
+    c : array_like, shape (C,2)
+        centers of the Circles
+    r : array_like, shape (C,)
+        radii of the Circles
+
+    Returns
+    -------
+    numpy.ndarray, shape (S,C)
+        the length of each Segment within each Circle
+
+    Notes
+    -----
+    If both endpoints of the Segment are outside the Circle, the result is the
+    distance of the two intersections, if one of the endpoints is enclosed by
+    the Circle, it is the distance of the intersection and the enclosed endpoint.
+    Tangents give 0.
+
+    Examples
+    --------
+    >>> circle_chord_lengths([[-8,1],[3,1]],[[9,1],[9,1]],[[1,1]],[5])
+    array([[10.],
+           [ 3.]])
+    """
+    t1,t2,tol=_circle_roots(p,q,c,r)
+    d=np.asarray(q,dtype=float)-np.asarray(p,dtype=float)
+    length=np.sqrt(d[:,0]**2+d[:,1]**2)[:,np.newaxis]
+    chord=(np.clip(t2,0,1)-np.clip(t1,0,1))*length
+    return np.where(np.isnan(chord),0.0,chord)
+
+def annular_chord_lengths(radii,b,s,length):
+    """The function to compute the length of a Segment within the regions of
+    concentric Circles (eg. the regions of a pin) in closed form.
+
+    The chord of a line in a Circle with radius r depends only on the distance
+    b of the line from the center (impact parameter), it is 2*sqrt(r^2-b^2),
+    and it is centered at the projection of the center on the line. The chord
+    in region k is the difference of the chords in Circle k and Circle k-1.
+
+    Parameters
+    ----------
+    radii : array_like, shape (R,)
+        radii of the concentric Circles in increasing order
+    b : float or array_like
+        impact parameters, distances of the lines from the center
+    s : float or array_like, same shape as b
+        distances from the first end points of the Segments to the projection of the
+        center along the Segments (negative if the projection is behind the first end point)
+    length : float or array_like, same shape as b
+        lengths of the Segments
+
+    Returns
+    -------
+    numpy.ndarray, shape b.shape+(R,)
+        the length of the Segments within each region (between radii[k-1] and radii[k])
+
+    Notes
+    -----
+    The semantics are the same as of :func:`circle_chord_lengths`: the chord is
+    clipped to the Segment, and tangents give 0.
+
+    Examples
+    --------
+    >>> annular_chord_lengths([3,5],0,9,18)
+    array([6., 4.])
+    >>> annular_chord_lengths([3,5],4,9,18)
+    array([0., 6.])
+    """
+    radii=np.asarray(radii,dtype=float)
+    b=np.asarray(b,dtype=float)[...,np.newaxis]
+    s=np.asarray(s,dtype=float)[...,np.newaxis]
+    length=np.asarray(length,dtype=float)[...,np.newaxis]
+    h2=radii*radii-b*b
+    hit=h2>eps #same as in circle_intersection_params, misses and tangents give 0
+    h=np.sqrt(np.where(hit,h2,0.0))
+    chord=np.where(hit,np.clip(s+h,0,length)-np.clip(s-h,0,length),0.0)
+    return np.diff(chord,axis=-1,prepend=0.0)
+
+def _circle_roots(p,q,c,r):
+    """Helper for the vectorized circle intersections. Returns the ordered
+    parameters (t1<=t2) of the line-circle intersections (NaN for misses and
+    tangents) and the tolerance in parameter space which corresponds to eps."""
+    p=np.asarray(p,dtype=float).reshape(-1,2)
+    q=np.asarray(q,dtype=float).reshape(-1,2)
+    c=np.asarray(c,dtype=float).reshape(-1,2)
+    r=np.abs(np.asarray(r,dtype=float).reshape(-1))
+    dx=(q[:,0]-p[:,0])[:,np.newaxis]
+    dy=(q[:,1]-p[:,1])[:,np.newaxis]
+    fx=p[:,0][:,np.newaxis]-c[:,0]
+    fy=p[:,1][:,np.newaxis]-c[:,1]
+    a=dx*dx+dy*dy
+    b=dx*fx+dy*fy
+    cc=fx*fx+fy*fy-r*r
+    with np.errstate(divide='ignore',invalid='ignore'):
+        disc=b*b-a*cc
+        hit=disc/a>eps #the squared half chord has to be positive, otherwise miss or tangent
+        sq=np.sqrt(np.where(hit,disc,0.0))
+        t1=np.where(hit,(-b-sq)/a,np.nan)
+        t2=np.where(hit,(-b+sq)/a,np.nan)
+        #Point.inBetween() checks along the dominant axis with eps
+        tol=eps/np.maximum(np.abs(dx),np.abs(dy))
+    return t1,t2,tol
+
+class Polygon(_Immutable):
+    """
+    A class used to represent a convex Polygon.
+
+    To create a Polygon, one should give the corners in a clockwise or
+    counter-clockwise order.
+
+    Parameters
+    ----------
+    *corners : Point()
+        corners of the Polygon (at least three)
+
+    Attributes
+    ----------
+    corners : list of Point()
+        list of the corner points
+    sides : list of Segment()
+        list of the sides (side i is between corner i and corner i+1)
+
+    Raises
+    ------
+    ValueError
+        if the corners do not define a convex polygon in clockwise or
+        counter-clockwise order.
+
+    Examples
+    --------
+    >>> hexagon=Polygon(*[Point(10,0).rotate(a) for a in range(0,360,60)])
+    >>> hexagon.encloses_point(Point(8,0))
+    True
+    """
+    __slots__=('_corners','_sides')
+
+    def __init__(self,*corners):
+        if len(corners)<3 or not _isConvex(list(corners)):
+            raise ValueError('Corners do not define a convex polygon')
+        self._setCorners(corners)
+
+    def _setCorners(self,corners):
+        self._set('_corners',tuple(corners))
+        self._set('_sides',None) #created when first needed
+
+    @classmethod
+    def _trusted(cls,*corners):
+        """Fast constructor for internal use, the corners are not validated."""
+        self=cls.__new__(cls)
+        self._setCorners(tuple(corners))
+        return self
+
+    def _args(self):
+        return self._corners
+
+    def __repr__(self):
+        return "Polygon(%s)" % (",".join(["Point(%.3f, %.3f)" % (c.x, c.y) for c in self._corners]))
+
+    @property
+    def corners(self):
+        return list(self._corners)
+
+    @property
+    def sides(self):
+        if self._sides is None:
+            corners=self._corners
+            self._set('_sides',tuple(Segment(c1,c2) for c1,c2 in zip(corners,corners[1:]+corners[:1])))
+        return list(self._sides)
+
+    @property
+    def bbox(self):
+        """axis-aligned bounding box as (xmin, ymin, xmax, ymax)"""
+        xs=[c.x for c in self._corners]
+        ys=[c.y for c in self._corners]
+        return (min(xs),min(ys),max(xs),max(ys))
+
+    def encloses_point(self,P):
+        """ The function to assess whether a point is enclosed by a Polygon().
+
+        Parameters
+        ----------
+        P : Point()
+            point to decide whether is enclosed by Polygon
+
+        Returns
+        -------
+        bool
+            True if the point is enclosed by the Polygon, False otherwise.
+
+        Examples
+        --------
+        >>> rect=Rectangle(Point(3,7),Point(5,3),Point(13,5),Point(12,6))
+        >>> P=Point(6,5)
+        >>> rect.encloses_point(P)
+        True
+        >>> Q=Point(4,3)
+        >>> rect.encloses_point(Q)
+        False
+        """
+        #P is enclosed if it is on the inner side of each side (or on the side),
+        #which is decided by the sign of the cross product of the side and the
+        #vector pointing from the start of the side to P.
+        return _convexEncloses(self._corners,P.x,P.y)
+
+    def encloses_points(self,points):
+        """ The function to assess whether many points are enclosed by a Polygon().
+
+        Parameters
+        ----------
+        points : array_like, shape (S,2) or PointArray()
+            points to decide whether are enclosed by Polygon
+
+        Returns
+        -------
+        numpy.ndarray of bool
+            True if the point is enclosed by the Polygon, False otherwise.
+        """
+        return convex_encloses_points(points,[(c.x,c.y) for c in self._corners])
+
+    def rotate(self,alpha):
+        """The function to rotate a Polygon around the origin with alpha (deg)
+
+        Parameters
+        ----------
+        alpha : float
+            Rotation angle (in degrees)
+
+        Returns
+        -------
+        Polygon()
+            Polygon with rotated corners
+        """
+        #rotation keeps the order of the corners, no need to validate them again
+        return Polygon._trusted(*[c.rotate(alpha) for c in self._corners])
+
+    def intersection(self,seg):
+        """The function to find the intersection of a Polygon with a Segment.
+
+        Parameters
+        ----------
+        seg : Segment()
+            The Segment for which the intersection is calculated
+
+        Returns
+        -------
+        list of Point()
+            list of the intersections
+
+        Notes
+        -----
+
+        The list has one element if one of the endpoints of the Segment is
+        enclosed by the polygon.
+
+        The list has two elements if both endpoints of the Segment lies outside
+        the Polygon, and the Segment passes through the Polygon.
+
+        An empty list is returned if the Segment does not pass through the Polygon,
+        or in case the Segment passes through only one of the corners.
+
+        Examples
+        --------
+        >>> rect=Rectangle(Point(-10,10),Point(10,10),Point(10,-10),Point(-10,-10))
+        >>> s=Segment(Point(-30,-30),Point(30,30))
+        >>> rect.intersection(s)
+        [Point(10.000, 10.000), Point(-10.000, -10.000)]
+        """
+        return [seg.point_at(t) for t in self.intersection_params(seg)]
+
+    def intersection_params(self,seg):
+        """The function to find the intersection of a Polygon with a Segment
+        parametrically, without creating Point() objects.
+
+        Parameters
+        ----------
+        seg : Segment()
+            The Segment for which the intersection is calculated
+
+        Returns
+        -------
+        list of float
+            list of the parameters t of the intersections along `seg`
+            (ie. the intersection is seg.p+t*(seg.q-seg.p))
+
+        Notes
+        -----
+        The semantics and the order are the same as of :meth:`Polygon.intersection()`.
+        """
+        #Cyrus-Beck clipping of the line with the sides. A corner hit from
+        #outside gives zero overlap, and it is not counted as intersection.
+        clip=_convexClip(self._corners,seg)
+        if clip is None:
+            return []
+        dx=seg.q.x-seg.p.x
+        dy=seg.q.y-seg.p.y
+        inters=[(side,t) for t,side in clip if _inSegment(t,dx,dy)] #endpoints enclosed by the Polygon are not intersections
+        return [t for side,t in sorted(inters)]
+
+    def clip_params(self,p,q):
+        """The function to clip many Segments with the Polygon in one
+        vectorized call.
+
+        Parameters
+        ----------
+        p : array_like, shape (S,2) or PointArray()
+            first end points of the Segments
+        q : array_like, shape (S,2) or PointArray()
+            second end points of the Segments
+
+        Returns
+        -------
+        tin, tout : numpy.ndarray, shape (S,)
+            parameters where the lines of the Segments enter and exit the
+            Polygon, NaN if they do not pass through. See :func:`convex_clip_params()`
+        """
+        return convex_clip_params(p,q,[(c.x,c.y) for c in self._corners])
+
+class Rectangle(Polygon):
     """
     A class used to represent a Rectangle.
 
     Rectangles are actually general convex quadritlaterals.
     To create a Rectangle, one should give the four corners in a clockwise or
-    counter-clockwise order
+    counter-clockwise order. The intersection and enclosure methods are
+    inherited from Polygon().
 
     Parameters
     ----------
@@ -451,123 +1100,544 @@ class Rectangle(object):
     ValueError
         if Corners are not defined in clockwise or counter-clockwise order.
     """
+    __slots__=()
+
     def __init__(self,p1,p2,p3,p4):
-        self.p1=p1
-        self.p2=p2
-        self.p3=p3
-        self.p4=p4
-        self._corners=[p1,p2,p3,p4]
-        if Segment(p1,p3).intersection(Segment(p2,p4)) == []:
+        if len(Segment(p1,p3).intersection_params(Segment(p2,p4)))==0:
             raise ValueError('Corners defined in wrong order')
-        else:
-            self._p1p2=Segment(p1,p2)
-            self._p2p3=Segment(p2,p3)
-            self._p3p4=Segment(p3,p4)
-            self._p4p1=Segment(p4,p1)
-            self._sides=[self._p1p2,self._p2p3,self._p3p4,self._p4p1]
+        self._setCorners((p1,p2,p3,p4))
 
     def __repr__(self):
         return "Rectangle(Point(%.3f, %.3f),Point(%.3f, %.3f),Point(%.3f, %.3f),Point(%.3f, %.3f))" % (self.p1.x, self.p1.y, self.p2.x, self.p2.y, self.p3.x, self.p3.y, self.p4.x, self.p4.y)
 
+    @property
+    def p1(self):
+        return self._corners[0]
+
+    @property
+    def p2(self):
+        return self._corners[1]
+
+    @property
+    def p3(self):
+        return self._corners[2]
+
+    @property
+    def p4(self):
+        return self._corners[3]
+
     @property
     def p1p2(self):
-        return self._p1p2
+        return self.sides[0]
 
     @property
     def p2p3(self):
-        return self._p2p3
+        return self.sides[1]
 
     @property
     def p3p4(self):
-        return self._p3p4
+        return self.sides[2]
 
     @property
     def p4p1(self):
-        return self._p4p1
+        return self.sides[3]
+
+    def rotate(self,alpha):
+        """The function to rotate a Rectangle around the origin with alpha (deg)
+
+        Parameters
+        ----------
+        alpha : float
+            Rotation angle (in degrees)
+
+        Returns
+        -------
+        Rectangle()
+            Rectangle with rotated end points
+        """
+        #rotation keeps the order of the corners, no need to validate them again
+        return Rectangle._trusted(self.p1.rotate(alpha),self.p2.rotate(alpha),self.p3.rotate(alpha),self.p4.rotate(alpha))
+
+
+def _isConvex(corners):
+    """Helper to decide whether the corners define a convex polygon in clockwise
+    or counter-clockwise order (the sides turn in the same direction, and the
+    polygon turns around only once)."""
+    crosses=[]
+    angle=0
+    for c1,c2,c3 in zip(corners,corners[1:]+corners[:1],corners[2:]+corners[:2]):
+        ax,ay=c2.x-c1.x,c2.y-c1.y
+        bx,by=c3.x-c2.x,c3.y-c2.y
+        crosses.append(ax*by-ay*bx)
+        angle=angle+math.atan2(ax*by-ay*bx,ax*bx+ay*by)
+    if all(c>eps for c in crosses) or all(c<-eps for c in crosses):
+        return abs(abs(angle)-2*np.pi)<eps
+    return False
+
+def _orientation(corners):
+    """Helper to get the orientation of a polygon: 1 if counter-clockwise, -1 if clockwise"""
+    area=0
+    for c1,c2 in zip(corners,corners[1:]+corners[:1]):
+        area=area+c1.x*c2.y-c2.x*c1.y
+    return 1 if area>0 else -1
+
+def _convexEncloses(corners,x,y):
+    """Helper to decide whether the point (x,y) is enclosed by the convex
+    polygon with corners (points on the sides are enclosed)."""
+    s=_orientation(corners)
+    for c1,c2 in zip(corners,corners[1:]+corners[:1]):
+        ex=c2.x-c1.x
+        ey=c2.y-c1.y
+        if s*(ex*(y-c1.y)-ey*(x-c1.x))< -eps*math.sqrt(ex*ex+ey*ey):
+            return False
+    return True
+
+def _convexClip(corners,seg):
+    """Helper for the Cyrus-Beck clipping of the line of a Segment with a
+    convex polygon.
+
+    Returns None if the line does not pass through the polygon (touching a
+    corner or a side from outside is not passing through), otherwise the
+    entry and the exit as (t,side) pairs, where t is the parameter along the
+    Segment and side is the index of the side (side i is between corner i and
+    corner i+1)."""
+    s=_orientation(corners)
+    dx=seg.q.x-seg.p.x
+    dy=seg.q.y-seg.p.y
+    tin,sin=-np.inf,None
+    tout,sout=np.inf,None
+    for i,(c1,c2) in enumerate(zip(corners,corners[1:]+corners[:1])):
+        nx=s*(c2.y-c1.y) #outward normal
+        ny=-s*(c2.x-c1.x)
+        num=nx*(seg.p.x-c1.x)+ny*(seg.p.y-c1.y)
+        den=nx*dx+ny*dy
+        if abs(den)<=eps*eps*math.sqrt((nx*nx+ny*ny)*(dx*dx+dy*dy)): #parallel
+            if num>eps*math.sqrt(nx*nx+ny*ny): #outside of this side
+                return None
+        elif den<0: #entering
+            t=-num/den
+            if t>tin:
+                tin,sin=t,i
+        else: #exiting
+            t=-num/den
+            if t<tout:
+                tout,sout=t,i
+    m=max(abs(dx),abs(dy))
+    if m==0 or (tout-tin)*m<eps:
+        return None
+    return [(tin,sin),(tout,sout)]
+
+def convex_clip_params(p,q,corners):
+    """The function to clip many Segments with one or many convex polygons
+    in one vectorized call (Cyrus-Beck clipping).
+
+    Parameters
+    ----------
+    p : array_like, shape (S,2)
+        first end points of the Segments
+    q : array_like, shape (S,2)
+        second end points of the Segments
+    corners : array_like, shape (K,2) or (P,K,2)
+        corners of the convex polygon(s) in clockwise or counter-clockwise order
+
+    Returns
+    -------
+    tin : numpy.ndarray, shape (S,) or (S,P)
+        parameter of the point where the line of the Segment enters the polygon
+        (the point is p+tin*(q-p)), NaN if the line does not pass through the polygon
+    tout : numpy.ndarray, shape (S,) or (S,P)
+        parameter of the point where the line of the Segment exits the polygon,
+        NaN if the line does not pass through the polygon
+
+    Notes
+    -----
+    The parameters belong to the line, thus they might be outside of [0,1]. The
+    part of the Segment within the polygon is between max(tin,0) and min(tout,1).
+    Touching a corner from outside does not count as passing through, as in
+    :meth:`Polygon.intersection()`.
+
+    Examples
+    --------
+    >>> square=[[-10,10],[10,10],[10,-10],[-10,-10]]
+    >>> convex_clip_params([[-30,0],[0,0]],[[30,0],[0,30]],square)
+    (array([ 0.33333333, -0.33333333]), array([0.66666667, 0.33333333]))
+    """
+    p=np.asarray(p,dtype=float).reshape(-1,2)
+    q=np.asarray(q,dtype=float).reshape(-1,2)
+    corners=np.asarray(corners,dtype=float)
+    single=corners.ndim==2
+    c1=corners.reshape((-1,)+corners.shape[-2:]) #(P,K,2)
+    c2=np.roll(c1,-1,axis=1)
+    area=np.sum(c1[:,:,0]*c2[:,:,1]-c2[:,:,0]*c1[:,:,1],axis=1)
+    s=np.where(area>0,1.0,-1.0)[:,np.newaxis]
+    nx=s*(c2[:,:,1]-c1[:,:,1]) #outward normals, (P,K)
+    ny=-s*(c2[:,:,0]-c1[:,:,0])
+    nn=np.sqrt(nx*nx+ny*ny)
+    d=q-p
+    dd=np.sqrt(d[:,0]**2+d[:,1]**2)[:,np.newaxis,np.newaxis]
+    px=p[:,0][:,np.newaxis,np.newaxis] #(S,1,1)
+    py=p[:,1][:,np.newaxis,np.newaxis]
+    num=nx*(px-c1[:,:,0])+ny*(py-c1[:,:,1]) #(S,P,K)
+    den=nx*d[:,0][:,np.newaxis,np.newaxis]+ny*d[:,1][:,np.newaxis,np.newaxis]
+    parallel=np.abs(den)<=eps*eps*nn*dd
+    with np.errstate(divide='ignore',invalid='ignore'):
+        t=-num/den
+    tin=np.max(np.where(~parallel&(den<0),t,-np.inf),axis=2)
+    tout=np.min(np.where(~parallel&(den>0),t,np.inf),axis=2)
+    outside=np.any(parallel&(num>eps*nn),axis=2)
+    m=np.maximum(np.abs(d[:,0]),np.abs(d[:,1]))[:,np.newaxis]
+    miss=outside|((tout-tin)*m<eps)|(m==0)
+    tin=np.where(miss,np.nan,tin)
+    tout=np.where(miss,np.nan,tout)
+    if single:
+        return tin[:,0],tout[:,0]
+    return tin,tout
+
+def convex_encloses_points(points,corners):
+    """The function to assess whether many points are enclosed by a convex
+    polygon in one vectorized call.
+
+    Parameters
+    ----------
+    points : array_like, shape (S,2)
+        the points to be checked
+    corners : array_like, shape (K,2)
+        corners of the convex polygon in clockwise or counter-clockwise order
+
+    Returns
+    -------
+    numpy.ndarray of bool, shape (S,)
+        True if the point is enclosed by the polygon (or is on its side)
+
+    Examples
+    --------
+    >>> convex_encloses_points([[6,5],[4,3]],[[3,7],[5,3],[13,5],[12,6]])
+    array([ True, False])
+    """
+    points=np.asarray(points,dtype=float).reshape(-1,2)
+    c1=np.asarray(corners,dtype=float)
+    c2=np.roll(c1,-1,axis=0)
+    area=np.sum(c1[:,0]*c2[:,1]-c2[:,0]*c1[:,1])
+    s=1.0 if area>0 else -1.0
+    ex=c2[:,0]-c1[:,0]
+    ey=c2[:,1]-c1[:,1]
+    cross=ex*(points[:,1][:,np.newaxis]-c1[:,1])-ey*(points[:,0][:,np.newaxis]-c1[:,0])
+    return np.all(s*cross>=-eps*np.sqrt(ex*ex+ey*ey),axis=1)
+
+def grid_traversal(p,q,x0,y0,cell,nx,ny):
+    """The function to find the cells of a uniform grid crossed by a Segment,
+    in the order they are visited from p to q (Amanatides-Woo traversal).
+
+    Parameters
+    ----------
+    p : Point()
+        first end point of the Segment
+    q : Point()
+        second end point of the Segment
+    x0 : float
+        x coordinate of the lower left corner of the grid
+    y0 : float
+        y coordinate of the lower left corner of the grid
+    cell : float
+        size of the (square) cells
+    nx : int
+        number of cells in x direction
+    ny : int
+        number of cells in y direction
+
+    Returns
+    -------
+    list of tuples
+        (ix,iy) indices of the crossed cells, ix along x, iy along y.
+
+    Notes
+    -----
+    The traversal is conservative: if the Segment passes exactly through a
+    corner of a cell, one of the neighbouring cells touched at the corner is
+    also returned.
+
+    Examples
+    --------
+    >>> grid_traversal(Point(-1,0.5),Point(1.5,2.5),0,0,1,3,3)
+    [(0, 1), (0, 2), (1, 2)]
+    """
+    dx=q.x-p.x
+    dy=q.y-p.y
+    #clip the segment with the box of the grid
+    t0=0.0
+    t1=1.0
+    for pk,dk,lo,hi in ((p.x,dx,x0,x0+nx*cell),(p.y,dy,y0,y0+ny*cell)):
+        if dk==0:
+            if pk<lo or pk>hi:
+                return []
+        else:
+            ta=(lo-pk)/dk
+            tb=(hi-pk)/dk
+            if ta>tb:
+                ta,tb=tb,ta
+            t0=max(t0,ta)
+            t1=min(t1,tb)
+    if t0>t1:
+        return []
+    ix=min(max(int(math.floor((p.x+t0*dx-x0)/cell)),0),nx-1)
+    iy=min(max(int(math.floor((p.y+t0*dy-y0)/cell)),0),ny-1)
+    if dx>0:
+        stepx,tMaxX,tDeltaX=1,(x0+(ix+1)*cell-p.x)/dx,cell/dx
+    elif dx<0:
+        stepx,tMaxX,tDeltaX=-1,(x0+ix*cell-p.x)/dx,-cell/dx
+    else:
+        stepx,tMaxX,tDeltaX=0,np.inf,np.inf
+    if dy>0:
+        stepy,tMaxY,tDeltaY=1,(y0+(iy+1)*cell-p.y)/dy,cell/dy
+    elif dy<0:
+        stepy,tMaxY,tDeltaY=-1,(y0+iy*cell-p.y)/dy,-cell/dy
+    else:
+        stepy,tMaxY,tDeltaY=0,np.inf,np.inf
+    cells=[(ix,iy)]
+    while True:
+        if tMaxX<tMaxY:
+            if tMaxX>t1:
+                break
+            ix=ix+stepx
+            tMaxX=tMaxX+tDeltaX
+        else:
+            if tMaxY>t1:
+                break
+            iy=iy+stepy
+            tMaxY=tMaxY+tDeltaY
+        if ix<0 or ix>=nx or iy<0 or iy>=ny:
+            break
+        cells.append((ix,iy))
+    return cells
+
+class ShapeIndex(object):
+    """
+    A class used to represent a spatial index over shapes.
+
+    The shapes are registered in the cells of a uniform grid overlapped by
+    their axis-aligned bounding boxes. A query with a Segment walks through
+    the cells crossed by the Segment, thus its cost scales with the number of
+    shapes near the Segment and not with the total number of shapes.
+
+    Parameters
+    ----------
+    shapes : dict
+        shapes to be indexed (any object with a bbox attribute, eg. Segment(),
+        Circle(), Polygon()). Keys are arbitrary identifiers of the shapes.
+    cell : float, optional
+        size of the grid cells. By default the grid has roughly as many cells
+        as shapes.
+
+    Attributes
+    ----------
+    shapes : dict
+        the indexed shapes
+    cell : float
+        size of the grid cells
+
+    Examples
+    --------
+    >>> index=ShapeIndex({'a': Circle(Point(0,0),1), 'b': Circle(Point(10,10),1)})
+    >>> index.query(Segment(Point(-5,0),Point(5,0)))
+    ['a']
+    """
+
+    def __init__(self, shapes, cell=None):
+        self._shapes=dict(shapes)
+        self._cells={}
+        self._nx=0
+        self._ny=0
+        self._cell=cell
+        if len(self._shapes)==0:
+            return
+        boxes={key: shape.bbox for key,shape in self._shapes.items()}
+        xmin=min(box[0] for box in boxes.values())
+        ymin=min(box[1] for box in boxes.values())
+        xmax=max(box[2] for box in boxes.values())
+        ymax=max(box[3] for box in boxes.values())
+        width=xmax-xmin
+        height=ymax-ymin
+        if self._cell is None:
+            n=len(boxes)
+            self._cell=max(math.sqrt(width*height/n),max(width,height)/n,eps)
+        pad=self._cell*1e-6+eps #shapes on the border of cells are registered in both cells
+        self._x0=xmin-pad
+        self._y0=ymin-pad
+        self._nx=int(math.ceil((width+2*pad)/self._cell))
+        self._ny=int(math.ceil((height+2*pad)/self._cell))
+        for key,box in boxes.items():
+            ix0,iy0=self._cellOf(box[0]-pad,box[1]-pad)
+            ix1,iy1=self._cellOf(box[2]+pad,box[3]+pad)
+            for ix in range(ix0,ix1+1):
+                for iy in range(iy0,iy1+1):
+                    self._cells.setdefault((ix,iy),[]).append(key)
+
+    def __repr__(self):
+        return "ShapeIndex(shapes=%d)" % (len(self._shapes))
 
     @property
-    def corners(self):
-        return self._corners
+    def shapes(self):
+        return self._shapes
 
     @property
-    def sides(self):
-        return self._sides
+    def cell(self):
+        return self._cell
 
-    def encloses_point(self,P):
-        """ The function to assess whether a point is enclosed by a Rectangle().
+    def _cellOf(self,x,y):
+        ix=min(max(int(math.floor((x-self._x0)/self._cell)),0),self._nx-1)
+        iy=min(max(int(math.floor((y-self._y0)/self._cell)),0),self._ny-1)
+        return ix,iy
+
+    def query(self,seg):
+        """The function to find the candidate shapes which may be intersected
+        by a Segment.
 
         Parameters
         ----------
-        P : Point()
-            point to decide whether is enclosed by Rectangle
+        seg : Segment()
+            the Segment (ray) for which the candidates are searched
 
         Returns
         -------
-        bool
-            True if the point is enclosed by the Rectangle, False otherwise.
+        list
+            keys of the candidate shapes, in the order they are first met
+            along the Segment. Every shape intersected by the Segment is
+            among the candidates, but not every candidate is intersected.
+        """
+        if len(self._cells)==0:
+            return []
+        found={}
+        for cell in grid_traversal(seg.p,seg.q,self._x0,self._y0,self._cell,self._nx,self._ny):
+            for key in self._cells.get(cell,[]):
+                found[key]=True
+        return list(found)
 
-        Examples
-        --------
-        >>> rect=Rectangle(Point(3,7),Point(5,3),Point(13,5),Point(12,6))
-        >>> P=Point(6,5)
-        >>> rect.encloses_point(P)
-        True
-        >>> Q=Point(4,3)
-        >>> rect.encloses_point(Q)
-        False
+class PointArray(object):
+    """
+    A class used to represent many Points with arrays.
+
+    The coordinates are stored in one contiguous float64 buffer, where the x
+    and y coordinates are separate columns, thus operations are performed on
+    the whole array at once. The array can have any shape (eg. a pin-wise NxM
+    shape), indexing with integers returns Point() objects.
+
+    Parameters
+    ----------
+    x : array_like
+        x coordinates of the Points in cm
+    y : array_like
+        y coordinates of the Points in cm (same shape as x)
+
+    Attributes
+    ----------
+    x : numpy.ndarray
+        x coordinates of the Points in cm
+    y : numpy.ndarray
+        y coordinates of the Points in cm
+    shape : tuple
+        shape of the array
+
+    Raises
+    ------
+    ValueError
+        if x and y have different shapes
+
+    Examples
+    --------
+    >>> pa=PointArray([0,10],[10,0])
+    >>> pa.rotate(90)[1]
+    Point(0.000, 10.000)
+    >>> pa.distance(Point(0,0))
+    array([10., 10.])
+    """
+
+    def __init__(self, x, y):
+        x=np.asarray(x,dtype=float)
+        y=np.asarray(y,dtype=float)
+        if x.shape!=y.shape:
+            raise ValueError('x and y have to have the same shape')
+        self._xy=np.empty((2,)+x.shape)
+        self._xy[0]=x
+        self._xy[1]=y
+
+    def __repr__(self):
+        return "PointArray(shape=%s)" % (self.shape,)
+
+    def __len__(self):
+        return len(self._xy[0])
+
+    def __getitem__(self, index):
+        x=self._xy[0][index]
+        y=self._xy[1][index]
+        if np.ndim(x)==0:
+            return Point(float(x),float(y))
+        return PointArray(x,y)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __array__(self, dtype=None, copy=None):
+        return np.moveaxis(self._xy,0,-1).astype(dtype if dtype is not None else float)
+
+    @property
+    def x(self):
+        return self._xy[0]
+
+    @property
+    def y(self):
+        return self._xy[1]
+
+    @property
+    def shape(self):
+        return self._xy.shape[1:]
+
+    @classmethod
+    def from_points(cls, points):
+        """The function to create a PointArray from Point() objects.
+
+        Parameters
+        ----------
+        points : list of Point()
+            the Points to be stored
+
+        Returns
+        -------
+        PointArray()
+            the Points as an array
         """
-        #In case of a rectangle ABCD and point P, the function computes the area
-        #of triangles PAB, PBC, PCD and PDA with Heron's formula. Then it computes
-        #the area of the rectangle by evaluating the areas of the triangles ABC
-        #and ACD. If A_PAB+A_PBC+A_PCD+A_PDA>A_ABC+A_ACD then the function returns
-        #False. Otherwise True is returned.
-        a12=Point.distance(self.p1,P)
-        b12=Point.distance(self.p2,P)
-        c12=Point.distance(self.p1,self.p2)
-        s12=0.5*(a12+b12+c12)
-        A12=np.sqrt(s12*(s12-a12)*(s12-b12)*(s12-c12))
-
-        a23=Point.distance(self.p2,P)
-        b23=Point.distance(self.p3,P)
-        c23=Point.distance(self.p2,self.p3)
-        s23=0.5*(a23+b23+c23)
-        A23=np.sqrt(s23*(s23-a23)*(s23-b23)*(s23-c23))
-
-        a34=Point.distance(self.p3,P)
-        b34=Point.distance(self.p4,P)
-        c34=Point.distance(self.p3,self.p4)
-        s34=0.5*(a34+b34+c34)
-        A34=np.sqrt(s34*(s34-a34)*(s34-b34)*(s34-c34))
-
-        a41=Point.distance(self.p4,P)
-        b41=Point.distance(self.p1,P)
-        c41=Point.distance(self.p4,self.p1)
-        s41=0.5*(a41+b41+c41)
-        A41=np.sqrt(s41*(s41-a41)*(s41-b41)*(s41-c41))
-
-        Atris=A12+A23+A34+A41
-
-        a123=Point.distance(self.p1,self.p2)
-        b123=Point.distance(self.p2,self.p3)
-        c123=Point.distance(self.p3,self.p1)
-        s123=0.5*(a123+b123+c123)
-        A123=np.sqrt(s123*(s123-a123)*(s123-b123)*(s123-c123))
-
-        a134=Point.distance(self.p1,self.p3)
-        b134=Point.distance(self.p3,self.p4)
-        c134=Point.distance(self.p4,self.p1)
-        s134=0.5*(a134+b134+c134)
-        A134=np.sqrt(s134*(s134-a134)*(s134-b134)*(s134-c134))
-
-        Arect=A123+A134
-
-        if abs(Atris-Arect)<eps:
-            return True
-        else:
-            return False
+        return cls([point.x for point in points],[point.y for point in points])
 
-    def rotate(self,alpha):
-        """The function to rotate a Rectangle around the origin with alpha (deg)
+    def to_points(self):
+        """The function to convert a (1D) PointArray into Point() objects.
+
+        Returns
+        -------
+        list of Point()
+            the stored Points
+        """
+        return [Point(x,y) for x,y in zip(self._xy[0].ravel().tolist(),self._xy[1].ravel().tolist())]
+
+    def distance(self, other):
+        """The function calculates the distances to a Point or to the elements
+        of another PointArray.
+
+        Parameters
+        ----------
+        other : Point() or PointArray()
+            the Point(s) to which the distances are calculated
+
+        Returns
+        -------
+        numpy.ndarray
+            distances, shape as of the broadcasted arrays
+        """
+        dx=self._xy[0]-other.x
+        dy=self._xy[1]-other.y
+        return np.sqrt(dx*dx+dy*dy)
+
+    def rotate(self, alpha):
+        """The function to rotate all the Points around the origin with alpha (deg)
 
         Parameters
         ----------
@@ -576,77 +1646,171 @@ class Rectangle(object):
 
         Returns
         -------
-        Rectangle()
-            Rectangle with rotated end points
+        PointArray()
+            PointArray with rotated coordinates
         """
-        return Rectangle(self.p1.rotate(alpha),self.p2.rotate(alpha),self.p3.rotate(alpha),self.p4.rotate(alpha))
+        alpha=alpha*(np.pi/180.0)
+        cos=np.cos(alpha)
+        sin=np.sin(alpha)
+        return PointArray(self._xy[0]*cos-self._xy[1]*sin,self._xy[1]*cos+self._xy[0]*sin)
 
+    def translate(self, xt, yt):
+        """The function to translate all the Points
 
-    def intersection(self,seg):
-        """The function to find the intersection of a Rectangle with a Segment.
+        Parameters
+        ----------
+        xt : float or array_like
+            translation along x direction
+        yt : float or array_like
+            translation along y direction
+
+        Returns
+        -------
+        PointArray()
+            PointArray with translated coordinates
+        """
+        return PointArray(self._xy[0]+xt,self._xy[1]+yt)
+
+class SegmentArray(object):
+    """
+    A class used to represent many Segments with arrays.
+
+    Parameters
+    ----------
+    p : PointArray()
+        first end points of the Segments
+    q : PointArray()
+        second end points of the Segments (same shape as p)
+
+    Attributes
+    ----------
+    p : PointArray()
+        first end points of the Segments
+    q : PointArray()
+        second end points of the Segments
+    shape : tuple
+        shape of the array
+
+    Raises
+    ------
+    ValueError
+        if p and q have different shapes
+
+    Examples
+    --------
+    >>> sa=SegmentArray(PointArray([0,0],[0,0]),PointArray([3,0],[4,2]))
+    >>> sa.length
+    array([5., 2.])
+    """
+
+    def __init__(self, p, q):
+        if p.shape!=q.shape:
+            raise ValueError('p and q have to have the same shape')
+        self.p=p
+        self.q=q
+
+    def __repr__(self):
+        return "SegmentArray(shape=%s)" % (self.shape,)
+
+    def __len__(self):
+        return len(self.p)
+
+    def __getitem__(self, index):
+        p=self.p[index]
+        q=self.q[index]
+        if isinstance(p,Point):
+            return Segment(p,q)
+        return SegmentArray(p,q)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def shape(self):
+        return self.p.shape
+
+    @property
+    def length(self):
+        return self.p.distance(self.q)
+
+    @classmethod
+    def from_segments(cls, segments):
+        """The function to create a SegmentArray from Segment() objects.
 
         Parameters
         ----------
-        seg : Segment()
-            The Segment for which the intersection is calculated
+        segments : list of Segment()
+            the Segments to be stored
 
         Returns
         -------
-        list of Point()
-            list of the intersections
+        SegmentArray()
+            the Segments as an array
+        """
+        return cls(PointArray.from_points([seg.p for seg in segments]),
+                   PointArray.from_points([seg.q for seg in segments]))
 
-        Notes
-        -----
+    def to_segments(self):
+        """The function to convert a (1D) SegmentArray into Segment() objects.
 
-        The list has one element if one of the endpoints of the Segment is
-        enclosed by the rectangle.
+        Returns
+        -------
+        list of Segment()
+            the stored Segments
+        """
+        return [Segment(p,q) for p,q in zip(self.p.to_points(),self.q.to_points())]
 
-        The list has two elements if both endpoints of the Segment lies outside
-        the Rectangle, and the Segment passes through the Rectangle.
+    def distance(self, point):
+        """The function calculates the distance of a Point from each Segment.
 
-        An empty list is returned if the Segment does not pass through the Rectangle,
-        or in case the Segment passes through only one of the corners.
+        Parameters
+        ----------
+        point : Point()
+            the Point to which the distances are calculated
 
-        Examples
-        --------
-        >>> rect=Rectangle(Point(-10,10),Point(10,10),Point(10,-10),Point(-10,-10))
-        >>> s=Segment(Point(-30,-30),Point(30,30))
-        >>> rect.intersection(s)
-        [Point(10.000, 10.000), Point(-10.000, -10.000)]
+        Returns
+        -------
+        numpy.ndarray
+            distance of the Point from the closest point of each Segment
         """
-        inters=[]
-        for side in [self.p1p2,self.p2p3,self.p3p4,self.p4p1]:
-            inters=inters+side.intersection(seg)
-
-        if len(inters)==0: #segment inside rectangle or no intersection
-            return inters
-        elif len(inters)==1:
-            return inters  #one endpoint of segment is inside rectangle
-        elif len(inters)==2:
-            if inters[0].isEqual(inters[1]): #segment hitting a corner
-                if self.encloses_point(seg.p) or self.encloses_point(seg.q): #any of the endpoints are within the Rectangle()
-                    return [inters[0]]
-                else: #both endpoints are outside the rectangle -> not a real intersection
-                    return []
-            else:  #segment hits two sides not at the corner
-                return inters
-        elif len(inters)==3: #we know it is not concave, so if len(inters)>2, then there needs to be repetition due to corners
-            if inters[0].isEqual(inters[1]):
-                return [inters[0], inters[2]]
-            elif inters[0].isEqual(inters[2]):
-                return [inters[0],inters[1]]
-            elif inters[1].isEqual(inters[2]):
-                return [inters[0],inters[1]]
-            else:
-                raise ValueError('Seems to be three intersection.')
-        elif len(inters)==4:
-            if   inters[0].isEqual(inters[1]) and inters[2].isEqual(inters[3]):
-                return [inters[0], inters[2]]
-            elif inters[0].isEqual(inters[2]) and inters[1].isEqual(inters[3]):
-                return [inters[0],inters[1]]
-            elif inters[0].isEqual(inters[3]) and inters[1].isEqual(inters[2]):
-                return [inters[0],inters[1]]
-            else:
-                raise ValueError('Seems to be more than two intersection')
-        else:
-            raise ValueError('Seems to more than two intersection') #should never be reached, since we know it is not concave
+        dx=self.q.x-self.p.x
+        dy=self.q.y-self.p.y
+        fx=point.x-self.p.x
+        fy=point.y-self.p.y
+        with np.errstate(divide='ignore',invalid='ignore'):
+            t=np.clip((fx*dx+fy*dy)/(dx*dx+dy*dy),0,1)
+        t=np.where(np.isnan(t),0.0,t) #degenerate segments
+        return np.sqrt((fx-t*dx)**2+(fy-t*dy)**2)
+
+    def rotate(self, alpha):
+        """The function to rotate all the Segments around the origin with alpha (deg)
+
+        Parameters
+        ----------
+        alpha : float
+            Rotation angle (in degrees)
+
+        Returns
+        -------
+        SegmentArray()
+            SegmentArray with rotated end points
+        """
+        return SegmentArray(self.p.rotate(alpha),self.q.rotate(alpha))
+
+    def translate(self, xt, yt):
+        """The function to translate all the Segments
+
+        Parameters
+        ----------
+        xt : float or array_like
+            translation along x direction
+        yt : float or array_like
+            translation along y direction
+
+        Returns
+        -------
+        SegmentArray()
+            SegmentArray with translated end points
+        """
+        return SegmentArray(self.p.translate(xt,yt),self.q.translate(xt,yt))
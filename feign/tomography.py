@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+feign tomography module
+
+System matrices of passive gamma emission tomography: the detectors of an
+Experiment form a ring (eg. the collimated detector banks of a PGET device),
+which is rotated around the Assembly to many projection angles. Each row of
+the system matrix is the pin-wise contribution map of one detector at one
+angle, stored in compressed sparse row (CSR) format.
+"""
+
+import os
+import json
+import numpy as np
+from feign.geometry import *
+from feign.blocks import Collimator
+
+class SystemMatrix(object):
+    """A class used to represent a system matrix in CSR format.
+
+    Rows are the projections (detector, angle), columns are the pin positions of the
+    Assembly in row-major order (column i*M+j is the pin in row i and column j).
+
+    Parameters
+    ----------
+    indptr : numpy.ndarray of int, shape (rows+1,)
+        the entries of row r are at indptr[r]:indptr[r+1]
+    indices : numpy.ndarray of int, shape (nnz,)
+        column indices of the entries
+    data : numpy.ndarray, shape (nnz,)
+        values of the entries
+    shape : tuple
+        (rows, columns)
+
+    Attributes
+    ----------
+    indptr, indices, data : numpy.ndarray or numpy.memmap
+        the CSR arrays
+    shape : tuple
+        (rows, columns)
+    nnz : int
+        number of stored entries
+    """
+    def __init__(self,indptr,indices,data,shape):
+        if len(indptr)!=shape[0]+1 or len(indices)!=len(data) or indptr[-1]!=len(data):
+            raise ValueError('indptr, indices and data are not consistent with the shape')
+        self._indptr=indptr
+        self._indices=indices
+        self._data=data
+        self._shape=tuple(shape)
+
+    def __repr__(self):
+        return "SystemMatrix(shape=%s, nnz=%d)"%(self._shape,self.nnz)
+
+    @property
+    def indptr(self):
+        return self._indptr
+
+    @property
+    def indices(self):
+        return self._indices
+
+    @property
+    def data(self):
+        return self._data
+
+    @property
+    def shape(self):
+        return self._shape
+
+    @property
+    def nnz(self):
+        return len(self._data)
+
+    def dot(self,x):
+        """The function to multiply the matrix with a vector (eg. a pin-wise
+        emission map flattened in row-major order).
+
+        Returns
+        -------
+        numpy.ndarray
+            the projections, length is the number of rows
+        """
+        x=np.asarray(x,dtype=float).ravel()
+        if len(x)!=self._shape[1]:
+            raise ValueError('x has to have %d elements'%self._shape[1])
+        rows=np.repeat(np.arange(self._shape[0]),np.diff(self._indptr))
+        return np.bincount(rows,weights=self._data*x[self._indices],minlength=self._shape[0])
+
+    def tocsr(self):
+        """The function to convert the matrix into a scipy.sparse.csr_matrix
+        (requires scipy)."""
+        from scipy.sparse import csr_matrix
+        return csr_matrix((self._data,self._indices,self._indptr),shape=self._shape)
+
+    @classmethod
+    def load(cls,directory,eline):
+        """The function to open a system matrix written by :func:`build_system_matrix`,
+        the data and the indices are memory-mapped.
+
+        Parameters
+        ----------
+        directory : str
+            directory of the matrices
+        eline : str
+            energy line (as given in :meth:`feign.blocks.Experiment.set_elines()`)
+        """
+        with open(os.path.join(directory,'header.json')) as f:
+            header=json.load(f)
+        if eline not in header['elines']:
+            raise ValueError('Energy line %s is not in the matrices'%eline)
+        indptr=np.load(os.path.join(directory,'%s.indptr.npy'%eline))
+        if indptr[-1]==0:
+            indices=np.zeros(0,dtype=np.int32)
+            data=np.zeros(0)
+        else:
+            indices=np.memmap(os.path.join(directory,'%s.indices'%eline),dtype=np.int32,mode='r')
+            data=np.memmap(os.path.join(directory,'%s.data'%eline),dtype=np.float64,mode='r')
+        return cls(indptr,indices,data,header['shape'])
+
+def build_system_matrix(experiment,angles,directory=None,threshold=0.0,chunk=32):
+    """The function to build the system matrices of an Experiment rotated to
+    many projection angles.
+
+    The detectors of the Experiment (with their collimators) are the detector
+    ring at angle 0, for each angle they are rotated around the origin (the
+    center of the Assembly). The contribution maps are calculated with
+    :meth:`feign.blocks.Experiment.Scan()`, one detector at a time over chunks of
+    the angles, and only the entries above threshold are kept. The rows of a chunk
+    are written before the next chunk is calculated, thus only the dense maps of
+    one chunk are in memory at once.
+
+    Parameters
+    ----------
+    experiment : Experiment()
+        the Experiment, :attr:`elines` have to be set
+    angles : array_like
+        projection angles (in degrees)
+    directory : str, optional
+        if given, the data and the indices are written to files in this directory
+        while the matrices are built, and the returned matrices are memory-mapped
+        (see :meth:`SystemMatrix.load()`), thus they do not need to fit in memory.
+    threshold : float, optional
+        entries not larger than threshold are dropped, by default the zeros.
+    chunk : int, optional
+        number of angles scanned at once (the traversal of the Assembly is reused
+        between the angles of a chunk, see :meth:`feign.blocks.Experiment.Scan()`).
+
+    Returns
+    -------
+    dict
+        Keys are the energy lines, values are SystemMatrix() objects. Row
+        d*len(angles)+a belongs to the d-th detector at the a-th angle.
+
+    Raises
+    ------
+    ValueError
+        if elines are not set, no angles are given, or chunk is not a positive int
+
+    Examples
+    --------
+    >>> matrices=build_system_matrix(experiment,np.arange(0,360,1.0),directory='pget')
+    >>> sinogram=matrices['0.662'].dot(emission)
+    """
+    angles=[float(angle) for angle in angles]
+    elines=experiment._elines
+    if elines is None:
+        raise ValueError('elines have to be set')
+    if len(angles)==0:
+        raise ValueError('angles are missing')
+    if not isinstance(chunk,int) or chunk<1:
+        raise ValueError('chunk has to be a positive int')
+    detectors=list(experiment.detectors.values())
+    shape=(len(detectors)*len(angles),experiment.assembly.N*experiment.assembly.M)
+    indptr={e: [0] for e in elines}
+    parts={e: ([],[]) for e in elines}
+    if directory is not None:
+        os.makedirs(directory,exist_ok=True)
+        files={e: (open(os.path.join(directory,'%s.indices'%e),'wb'),open(os.path.join(directory,'%s.data'%e),'wb'))
+               for e in elines}
+    try:
+        for detector in detectors:
+            for start in range(0,len(angles),chunk):
+                part=angles[start:start+chunk]
+                locations=[detector.location.rotate(angle) for angle in part]
+                if detector.collimator is None:
+                    collimators=[None]*len(part)
+                else:
+                    collimators=[_rotatedCollimator(detector.collimator,angle) for angle in part]
+                scan=experiment.Scan(detector,locations,collimators=collimators)
+                for k,e in enumerate(elines):
+                    rows=scan['contributionMap'][:,k].reshape(len(part),-1)
+                    for row in rows:
+                        indices=np.flatnonzero(row>threshold).astype(np.int32)
+                        indptr[e].append(indptr[e][-1]+len(indices))
+                        if directory is None:
+                            parts[e][0].append(indices)
+                            parts[e][1].append(row[indices])
+                        else:
+                            indices.tofile(files[e][0])
+                            row[indices].tofile(files[e][1])
+                #the maps of the chunk are dropped before the next chunk is scanned
+                del scan
+    finally:
+        if directory is not None:
+            for f in [f for pair in files.values() for f in pair]:
+                f.close()
+    if directory is None:
+        return {e: SystemMatrix(np.array(indptr[e],dtype=np.int64),
+                                np.concatenate(parts[e][0]) if len(parts[e][0])>0 else np.zeros(0,dtype=np.int32),
+                                np.concatenate(parts[e][1]) if len(parts[e][1])>0 else np.zeros(0),shape)
+                for e in elines}
+    for e in elines:
+        np.save(os.path.join(directory,'%s.indptr.npy'%e),np.array(indptr[e],dtype=np.int64))
+    with open(os.path.join(directory,'header.json'),'w') as f:
+        json.dump({'shape': shape, 'elines': elines, 'angles': angles,
+                   'detectors': [detector._id for detector in detectors]},f)
+    return {e: SystemMatrix.load(directory,e) for e in elines}
+
+def _rotatedCollimator(collimator,angle):
+    """The function to rotate a Collimator around the origin with angle (deg)."""
+    rotated=Collimator(collimator._id)
+    rotated.set_front(collimator.front.rotate(angle))
+    rotated.set_back(collimator.back.rotate(angle))
+    if collimator.color is not None:
+        rotated.set_color(collimator.color)
+    return rotated
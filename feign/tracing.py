@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+feign tracing module
+
+Array kernels to compute the distances travelled by gamma rays from many
+source points to a detector point in one vectorized pass. They are used by
+:meth:`feign.blocks.Experiment.distanceTravelled()` when the 'vectorized'
+engine is selected (see :meth:`feign.blocks.Experiment.set_engine()`).
+"""
+
+import numpy as np
+from feign.geometry import *
+
+#upper limit of the number of (source,pin,region) elements computed at once
+chunkSize=2**20
+
+def pin_distances(sources,target,pitch,pinmap,radii,regions,nmat):
+    """The function to calculate the distances travelled in the regions of the
+    pins of a lattice by rays from many source points to a target point.
+
+    Parameters
+    ----------
+    sources : array_like, shape (S,2)
+        coordinates of the source points
+    target : array_like, shape (2,)
+        coordinates of the target (detector) point
+    pitch : float
+        pitch of the lattice, the lattice is centered at the origin
+    pinmap : array_like of int, shape (N,M)
+        pin type index of each lattice position, rows from the top
+    radii : array_like, shape (T,R)
+        radii of the regions of each pin type. Pin types with less than R
+        regions are padded with their last radius (or 0 if they have no regions).
+    regions : array_like of int, shape (T,R)
+        material index of the regions of each pin type (the value of the
+        padded regions is not used)
+    nmat : int
+        number of materials
+
+    Returns
+    -------
+    numpy.ndarray, shape (S,nmat)
+        distances travelled in each material within the pins
+
+    Notes
+    -----
+    The chords are calculated for every (source,pin,region) triplet with
+    :func:`feign.geometry.annular_chord_lengths`, pins missed by the ray give 0.
+    """
+    sources=np.asarray(sources,dtype=float).reshape(-1,2)
+    target=np.asarray(target,dtype=float)
+    pinmap=np.asarray(pinmap,dtype=int)
+    radii=np.asarray(radii,dtype=float)
+    regions=np.asarray(regions,dtype=int)
+    N,M=pinmap.shape
+    p=pitch/2
+    cx=np.tile(-p*(M-1)+np.arange(M)*2*p,N)
+    cy=np.repeat(p*(N-1)-np.arange(N)*2*p,M)
+    pinRadii=radii[pinmap.ravel()] #(P,R)
+    P,R=pinRadii.shape
+    #one-hot incidence of the (pin,region) pairs and the materials
+    incidence=np.zeros((P*R,nmat))
+    incidence[np.arange(P*R),regions[pinmap.ravel()].ravel()]=1.0
+    dist=np.zeros((len(sources),nmat))
+    step=max(1,chunkSize//max(1,P*R))
+    for k in range(0,len(sources),step):
+        src=sources[k:k+step]
+        dx=target[0]-src[:,0]
+        dy=target[1]-src[:,1]
+        length=np.sqrt(dx*dx+dy*dy)
+        ux=(dx/length)[:,np.newaxis]
+        uy=(dy/length)[:,np.newaxis]
+        fx=cx-src[:,0][:,np.newaxis]
+        fy=cy-src[:,1][:,np.newaxis]
+        b=np.abs(fx*uy-fy*ux) #(S,P)
+        s=fx*ux+fy*uy
+        chords=annular_chord_lengths(pinRadii,b,s,length[:,np.newaxis]) #(S,P,R)
+        dist[k:k+step]=chords.reshape(len(src),P*R)@incidence
+    return dist
+
+def pin_candidates(sources,target,pitch,pinmap,radii,margin=0.0):
+    """The function to find the pins of a lattice which may be crossed by rays
+    from many source points to a target point (the traversal of the lattice).
+
+    A pin is a candidate of a ray if the ray passes closer than the outermost
+    radius of the pin plus margin to the center of the pin.
+
+    Parameters
+    ----------
+    sources : array_like, shape (S,2)
+        coordinates of the source points
+    target : array_like, shape (2,)
+        coordinates of the target (detector) point
+    pitch : float
+        pitch of the lattice, the lattice is centered at the origin
+    pinmap : array_like of int, shape (N,M)
+        pin type index of each lattice position, rows from the top
+    radii : array_like, shape (T,R)
+        radii of the regions of each pin type (see :func:`pin_distances`)
+    margin : float, optional
+        the pins are enlarged with margin, thus the candidates are kept valid
+        while the rays move less than margin.
+
+    Returns
+    -------
+    rays : numpy.ndarray of int
+        indices of the sources of the (ray, pin) candidate pairs
+    pins : numpy.ndarray of int
+        flat indices (i*M+j) of the pins of the candidate pairs
+
+    Notes
+    -----
+    If the target is moved by delta, each point of a ray moves at most u*delta,
+    where u is its relative position between the source (0) and the target (1).
+    Thus the candidates found with margin are candidates of every target closer
+    than margin/u to the original one, where u is the largest relative position
+    of the ray within the lattice.
+    """
+    sources=np.asarray(sources,dtype=float).reshape(-1,2)
+    target=np.asarray(target,dtype=float)
+    pinmap=np.asarray(pinmap,dtype=int)
+    N,M=pinmap.shape
+    p=pitch/2
+    cx=np.tile(-p*(M-1)+np.arange(M)*2*p,N)
+    cy=np.repeat(p*(N-1)-np.arange(N)*2*p,M)
+    reach=np.asarray(radii,dtype=float).max(axis=1)[pinmap.ravel()]
+    #the distance of the target from the pin centers does not depend on the ray
+    toTarget=np.sqrt((cx-target[0])**2+(cy-target[1])**2)
+    rays=[]
+    pins=[]
+    step=max(1,chunkSize//max(1,N*M))
+    for k in range(0,len(sources),step):
+        src=sources[k:k+step]
+        dx=target[0]-src[:,0]
+        dy=target[1]-src[:,1]
+        length=np.sqrt(dx*dx+dy*dy)[:,np.newaxis]
+        ux=dx[:,np.newaxis]/length
+        uy=dy[:,np.newaxis]/length
+        fx=cx-src[:,0][:,np.newaxis]
+        fy=cy-src[:,1][:,np.newaxis]
+        s=fx*ux+fy*uy
+        #distance of the pin centers from the rays (Segments)
+        d=np.where(s<0,np.sqrt(fx*fx+fy*fy),np.where(s>length,toTarget,np.abs(fx*uy-fy*ux)))
+        r,c=np.nonzero((reach>0) & (d<=reach+margin))
+        rays.append(r+k)
+        pins.append(c)
+    if len(rays)==0:
+        return np.zeros(0,dtype=int),np.zeros(0,dtype=int)
+    return np.concatenate(rays),np.concatenate(pins)
+
+def candidate_distances(sources,target,rays,pins,pitch,pinmap,radii,regions,nmat):
+    """The function to calculate the distances travelled in the regions of the
+    pins by rays from many source points to a target point, only the given
+    (ray, pin) pairs are evaluated (see :func:`pin_candidates`).
+
+    Parameters
+    ----------
+    sources : array_like, shape (S,2)
+        coordinates of the source points
+    target : array_like, shape (2,)
+        coordinates of the target (detector) point
+    rays, pins : array_like of int
+        the (ray, pin) pairs, pins are flat indices (i*M+j)
+    pitch, pinmap, radii, regions, nmat :
+        see :func:`pin_distances`
+
+    Returns
+    -------
+    numpy.ndarray, shape (S,nmat)
+        distances travelled in each material within the pins, the same as
+        :func:`pin_distances` if the pairs contain all the crossed pins.
+    """
+    sources=np.asarray(sources,dtype=float).reshape(-1,2)
+    target=np.asarray(target,dtype=float)
+    rays=np.asarray(rays,dtype=int)
+    pins=np.asarray(pins,dtype=int)
+    pinmap=np.asarray(pinmap,dtype=int)
+    N,M=pinmap.shape
+    p=pitch/2
+    pinRadii=np.asarray(radii,dtype=float)[pinmap.ravel()[pins]] #(C,R)
+    pinRegions=np.asarray(regions,dtype=int)[pinmap.ravel()[pins]]
+    src=sources[rays]
+    dx=target[0]-src[:,0]
+    dy=target[1]-src[:,1]
+    length=np.sqrt(dx*dx+dy*dy)
+    fx=-p*(M-1)+(pins%M)*2*p-src[:,0]
+    fy=p*(N-1)-(pins//M)*2*p-src[:,1]
+    b=np.abs(fx*dy-fy*dx)/length
+    s=(fx*dx+fy*dy)/length
+    chords=annular_chord_lengths(pinRadii,b,s,length) #(C,R)
+    index=rays[:,np.newaxis]*nmat+pinRegions
+    return np.bincount(index.ravel(),weights=chords.ravel(),minlength=len(sources)*nmat).reshape(len(sources),nmat)
+
+def enclosed_lengths(sources,target,form):
+    """The function to calculate the length of rays from many source points to
+    a target point within a Circle or a Polygon.
+
+    Parameters
+    ----------
+    sources : array_like, shape (S,2)
+        coordinates of the source points
+    target : array_like, shape (2,)
+        coordinates of the target (detector) point
+    form : Circle() or Polygon()
+        the shape
+
+    Returns
+    -------
+    numpy.ndarray, shape (S,)
+        length of the rays within the shape
+    """
+    sources=np.asarray(sources,dtype=float).reshape(-1,2)
+    targets=np.broadcast_to(np.asarray(target,dtype=float),sources.shape)
+    if isinstance(form,Circle):
+        return circle_chord_lengths(sources,targets,[(form.c.x,form.c.y)],[form.r])[:,0]
+    elif isinstance(form,Polygon):
+        tin,tout=convex_clip_params(sources,targets,[(c.x,c.y) for c in form.corners])
+        d=targets-sources
+        inside=(np.clip(tout,0,1)-np.clip(tin,0,1))*np.sqrt(d[:,0]**2+d[:,1]**2)
+        return np.where(np.isnan(inside),0.0,np.maximum(inside,0.0))
+    else:
+        raise TypeError('Circle() or Polygon() is expected')
+
+def crosses_segment(sources,target,seg):
+    """The function to assess whether rays from many source points to a target
+    point intersect a Segment.
+
+    Parameters
+    ----------
+    sources : array_like, shape (S,2)
+        coordinates of the source points
+    target : array_like, shape (2,)
+        coordinates of the target (detector) point
+    seg : Segment()
+        the Segment
+
+    Returns
+    -------
+    numpy.ndarray of bool, shape (S,)
+        True if the ray intersects the Segment
+    """
+    sources=np.asarray(sources,dtype=float).reshape(-1,2)
+    targets=np.broadcast_to(np.asarray(target,dtype=float),sources.shape)
+    return ~np.isnan(segment_intersection_params(sources,targets,[(seg.p.x,seg.p.y)],[(seg.q.x,seg.q.y)])[:,0])
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+feign xcom module
+
+Interpolation of total attenuation coefficients given in XCOM tables.
+The coefficients are interpolated linearly in log-log scale. At absorption
+edges the tables contain the edge energy twice (the value below and above
+the edge), the segments on the two sides of the edge are interpolated
+separately, and at the edge energy the value above the edge is taken.
+
+The tables are parsed once per process: :data:`tableCache` keeps the parsed
+columns keyed by the path, the modification time and the column of the file,
+and it can store the parsed values in a binary sidecar file next to the table.
+
+Many tables can be packed into one library file (see :func:`pack` and
+:class:`Library`), which is memory-mapped, thus the processes of a machine share
+it through the page cache. Libraries can be built from the command line::
+
+    python -m feign.xcom pack materials.mulib data/*.dat
+    python -m feign.xcom list materials.mulib
+"""
+
+import os
+import re
+import sys
+import json
+import struct
+import argparse
+import tempfile
+import threading
+import numpy as np
+
+class MuTable(object):
+    """A class used to represent the attenuation coefficients of a material
+    as a function of the energy, preprocessed for log-log interpolation.
+
+    Parameters
+    ----------
+    energy : array_like
+        energies (in MeV) in increasing order, absorption edges are given twice
+    mu : array_like
+        attenuation coefficients at the energies
+
+    Attributes
+    ----------
+    energy : numpy.ndarray
+        energies of the table
+    mu : numpy.ndarray
+        attenuation coefficients of the table
+
+    Raises
+    ------
+    ValueError
+        if the energies are not increasing, or an energy is given more than twice,
+        or the table contains non-positive values.
+
+    Examples
+    --------
+    >>> table=MuTable([0.1,0.2,0.2,0.4],[4.0,1.0,2.0,0.5])
+    >>> table([0.15,0.2,0.3])
+    array([1.77777778, 2.        , 0.88888889])
+    """
+    def __init__(self,energy,mu):
+        energy=np.asarray(energy,dtype=float).ravel()
+        mu=np.asarray(mu,dtype=float).ravel()
+        if len(energy)<2 or len(energy)!=len(mu):
+            raise ValueError('At least two energies and one coefficient per energy are needed')
+        if np.any(energy<=0) or np.any(mu<=0):
+            raise ValueError('Energies and attenuation coefficients have to be positive')
+        step=np.diff(energy)
+        if np.any(step<0) or np.any((step[1:]==0) & (step[:-1]==0)):
+            raise ValueError('Energies have to be increasing (absorption edges given twice)')
+        self._energy=energy
+        self._mu=mu
+        self._logEnergy=np.log(energy)
+        self._logMu=np.log(mu)
+
+    def __repr__(self):
+        return "MuTable(%.3e-%.3e MeV)"%(self._energy[0],self._energy[-1])
+
+    @property
+    def energy(self):
+        return self._energy
+
+    @property
+    def mu(self):
+        return self._mu
+
+    def __call__(self,energy):
+        """The function to interpolate the attenuation coefficient.
+
+        Parameters
+        ----------
+        energy : float or array_like
+            energies (in MeV), outside of the table the first or the last value is taken
+
+        Returns
+        -------
+        float or numpy.ndarray
+            attenuation coefficients, same shape as energy
+        """
+        energy=np.asarray(energy,dtype=float)
+        if np.any(energy<=0):
+            raise ValueError('Energies have to be positive')
+        e=np.clip(energy,self._energy[0],self._energy[-1])
+        #the upper end of the segment is the first table energy above e, thus the segment
+        #starts with the value above the edge if e is an edge energy
+        hi=np.clip(np.searchsorted(self._energy,e,side='right'),1,len(self._energy)-1)
+        lo=hi-1
+        le=np.log(e)
+        t=(le-self._logEnergy[lo])/(self._logEnergy[hi]-self._logEnergy[lo])
+        mu=np.exp(self._logMu[lo]+t*(self._logMu[hi]-self._logMu[lo]))
+        return mu if mu.ndim>0 else float(mu)
+
+def interpolate(tables,energy):
+    """The function to interpolate the attenuation coefficients of many materials.
+
+    Parameters
+    ----------
+    tables : list of MuTable() or dict
+        tables of the materials (values are used if dict is given)
+    energy : array_like, shape (E,)
+        energies (in MeV)
+
+    Returns
+    -------
+    numpy.ndarray, shape (K,E)
+        attenuation coefficients of the K materials at the energies
+    """
+    if isinstance(tables,dict):
+        tables=list(tables.values())
+    energy=np.asarray(energy,dtype=float).ravel()
+    return np.array([table(energy) for table in tables]).reshape(len(tables),len(energy))
+
+#data lines of the tables start with a number, the header and edge labels do not
+_dataLine=re.compile(r'^[ \t]*[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?(?:[ \t].*)?$',re.M)
+
+def parse(path):
+    """The function to parse an XCOM datafile.
+
+    Lines which do not start with a number (headers, absorption edge labels)
+    are skipped, the other lines are read in bulk.
+
+    Parameters
+    ----------
+    path : str
+        path to the file
+
+    Returns
+    -------
+    numpy.ndarray, shape (n,C)
+        the numeric columns of the file
+    """
+    with open(path,'r') as f:
+        lines=_dataLine.findall(f.read())
+    if len(lines)==0:
+        raise ValueError('%s does not contain data lines'%path)
+    return np.loadtxt(lines,ndmin=2)
+
+def resolve(path):
+    """The function to locate a datafile. Paths which do not exist are also
+    tried relative to the working directory (as os.getcwd()+path).
+    """
+    if not os.path.exists(path) and os.path.exists(os.getcwd()+path):
+        return os.getcwd()+path
+    return path
+
+class TableCache(object):
+    """A class used to represent the parsed XCOM tables of a process.
+
+    The entries are keyed by the real path, the modification time, the size and
+    the column of the file, thus a table is parsed again only if the file has
+    changed. If sidecar is set, the numeric columns of a parsed file are also
+    saved next to it (as path+'.npy'), and the sidecar is loaded instead of the
+    text as long as it is newer than the file, which helps new processes (eg.
+    restarted workers). Sidecars are skipped silently if the directory is not
+    writable.
+
+    Attributes
+    ----------
+    sidecar : bool
+        whether binary sidecars are used
+    hits : int
+        number of lookups served from the cache
+    misses : int
+        number of lookups which needed reading the file or the sidecar
+
+    Examples
+    --------
+    >>> tableCache.set_sidecar(True)
+    >>> tableCache.get('data/UO2.dat',1)(0.662)
+    """
+    def __init__(self,sidecar=False):
+        self._tables={}
+        self._lock=threading.Lock()
+        self._hits=0
+        self._misses=0
+        self.set_sidecar(sidecar)
+
+    def __repr__(self):
+        return "TableCache(sidecar=%s)"%(self._sidecar)
+
+    def __len__(self):
+        return len(self._tables)
+
+    @property
+    def sidecar(self):
+        return self._sidecar
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    def set_sidecar(self,sidecar):
+        """The function to set whether binary sidecars are used."""
+        if not isinstance(sidecar,bool):
+            raise TypeError('sidecar has to be bool')
+        self._sidecar=sidecar
+
+    def clear(self):
+        """The function to remove every entry (the sidecars are kept)."""
+        with self._lock:
+            self._tables={}
+            self._hits=0
+            self._misses=0
+
+    def get(self,path,column):
+        """The function to get the table of a column of an XCOM datafile.
+
+        Parameters
+        ----------
+        path : str
+            path to the file
+        column : int
+            column which contains the total attenuation coefficients
+
+        Returns
+        -------
+        MuTable()
+            the table of energies (first column) and coefficients
+        """
+        path=resolve(path)
+        stat=os.stat(path)
+        key=(os.path.realpath(path),stat.st_mtime_ns,stat.st_size,column)
+        with self._lock:
+            table=self._tables.get(key)
+            if table is not None:
+                self._hits+=1
+                return table
+            self._misses+=1
+        values=self._read(path,stat)
+        if column<1 or column>=values.shape[1]:
+            raise ValueError('%s has no column %s'%(path,column))
+        table=MuTable(values[:,0],values[:,column])
+        with self._lock:
+            self._tables[key]=table
+        return table
+
+    def _read(self,path,stat):
+        """The function to read the numeric columns from the sidecar if it is
+        up to date, otherwise from the file (and to write the sidecar)."""
+        sidecar=path+'.npy'
+        if self._sidecar:
+            try:
+                if os.stat(sidecar).st_mtime_ns>=stat.st_mtime_ns:
+                    return np.load(sidecar)
+            except (OSError,ValueError):
+                pass
+        values=parse(path)
+        if self._sidecar:
+            try:
+                fd,tmp=tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),suffix='.tmp')
+                try:
+                    with os.fdopen(fd,'wb') as f:
+                        np.save(f,values)
+                    os.chmod(tmp,0o644)
+                    os.replace(tmp,sidecar)
+                except BaseException:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+                    raise
+            except OSError:
+                pass
+        return values
+
+#the process-wide instance used by feign.blocks.readMu() and Experiment.get_MuTable()
+tableCache=TableCache()
+
+#first bytes of a library file, followed by the length of the header (uint64)
+libraryMagic=b'FEIGNMU1'
+
+def pack(path,entries):
+    """The function to write a library of attenuation coefficient tables.
+
+    The file starts with :data:`libraryMagic`, the length of the JSON header as
+    a little-endian uint64 and the header (padded to 8 bytes), which is followed
+    by a float64 block with the energies and then the coefficients of each entry.
+
+    Parameters
+    ----------
+    path : str
+        path of the library file
+    entries : dict
+        keys are the names of the entries, values are (path, column) tuples of
+        XCOM datafiles (as in :meth:`feign.blocks.Material.set_path()`) or
+        MuTable() objects.
+
+    Raises
+    ------
+    ValueError
+        if no entries are given
+    """
+    if len(entries)==0:
+        raise ValueError('Library has to have entries')
+    header={'entries': {}}
+    blocks=[]
+    offset=0
+    for name,entry in entries.items():
+        table=entry if isinstance(entry,MuTable) else tableCache.get(entry[0],entry[1])
+        n=len(table.energy)
+        header['entries'][str(name)]={'offset': offset, 'length': n}
+        blocks.append(np.concatenate([table.energy,table.mu]))
+        offset+=2*n
+    text=json.dumps(header).encode()
+    text+=b' '*(-(len(libraryMagic)+8+len(text))%8)
+    fd,tmp=tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),suffix='.tmp')
+    try:
+        with os.fdopen(fd,'wb') as f:
+            f.write(libraryMagic+struct.pack('<Q',len(text))+text)
+            np.concatenate(blocks).astype('<f8').tofile(f)
+        os.chmod(tmp,0o644)
+        os.replace(tmp,path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+class Library(object):
+    """A class used to represent a library of attenuation coefficient tables
+    written by :func:`pack`.
+
+    Only the header is read when the library is opened, the data block is
+    memory-mapped and the tables are created when they are first needed. Pickled
+    libraries (eg. sent to worker processes) are reopened from the path.
+
+    Parameters
+    ----------
+    path : str
+        path of the library file
+
+    Attributes
+    ----------
+    path : str
+        path of the library file
+    names : list of str
+        names of the entries
+
+    Raises
+    ------
+    ValueError
+        if the file is not a library
+
+    Examples
+    --------
+    >>> library=Library('materials.mulib')
+    >>> library['UO2'](0.662)
+    """
+    def __init__(self,path):
+        self._open(path)
+
+    def _open(self,path):
+        with open(path,'rb') as f:
+            start=f.read(len(libraryMagic)+8)
+            if len(start)!=len(libraryMagic)+8 or start[:len(libraryMagic)]!=libraryMagic:
+                raise ValueError('%s is not a feign library'%path)
+            length=struct.unpack('<Q',start[len(libraryMagic):])[0]
+            header=json.loads(f.read(length).decode())
+        self._path=path
+        self._entries=header['entries']
+        self._data=np.memmap(path,dtype='<f8',mode='r',offset=len(libraryMagic)+8+length)
+        self._tables={}
+
+    def __getstate__(self):
+        return {'path': self._path}
+
+    def __setstate__(self,state):
+        self._open(state['path'])
+
+    def __repr__(self):
+        return "Library(%s, %d entries)"%(self._path,len(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self,name):
+        return name in self._entries
+
+    def __getitem__(self,name):
+        """The function to get the MuTable() of an entry."""
+        if name not in self._entries:
+            raise KeyError('Entry %s is not in library %s'%(name,self._path))
+        if name not in self._tables:
+            offset,n=self._entries[name]['offset'],self._entries[name]['length']
+            self._tables[name]=MuTable(self._data[offset:offset+n],self._data[offset+n:offset+2*n])
+        return self._tables[name]
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def names(self):
+        return list(self._entries)
+
+#libraries opened in the process, keyed by the real path, modification time and size
+_libraries={}
+_librariesLock=threading.Lock()
+
+def open_library(path):
+    """The function to open a library, the Library() object is shared within the
+    process as long as the file is not changed."""
+    stat=os.stat(path)
+    key=(os.path.realpath(path),stat.st_mtime_ns,stat.st_size)
+    with _librariesLock:
+        if key not in _libraries:
+            _libraries[key]=Library(path)
+        return _libraries[key]
+
+def main(argv=None):
+    """The function of the command line interface (python -m feign.xcom)."""
+    parser=argparse.ArgumentParser(prog='python -m feign.xcom',description='Pack XCOM datafiles into a feign library.')
+    commands=parser.add_subparsers(dest='command',required=True)
+    packer=commands.add_parser('pack',help='write a library, entries are named after the files')
+    packer.add_argument('library',help='path of the library file')
+    packer.add_argument('files',nargs='+',help='XCOM datafiles, [NAME=]FILE[:COLUMN]')
+    packer.add_argument('--column',type=int,default=1,help='column of the total attenuation coefficients (default 1)')
+    lister=commands.add_parser('list',help='list the entries of a library')
+    lister.add_argument('library',help='path of the library file')
+    args=parser.parse_args(argv)
+    if args.command=='pack':
+        entries={}
+        for name in args.files:
+            path,column=name,args.column
+            if '=' in name:
+                name,path=name.split('=',1)
+            if ':' in path and path.rsplit(':',1)[1].isdigit():
+                path,column=path.rsplit(':',1)[0],int(path.rsplit(':',1)[1])
+            if name==path or name.rsplit(':',1)[0]==path:
+                name=os.path.splitext(os.path.basename(path))[0]
+            if name in entries:
+                parser.error('entry %s is given twice, name it as NAME=FILE'%name)
+            entries[name]=(path,column)
+        pack(args.library,entries)
+        print('%d entries written to %s'%(len(entries),args.library))
+    else:
+        library=Library(args.library)
+        for name in library.names:
+            table=library[name]
+            print('%s %d %.3e-%.3e MeV'%(name,len(table.energy),table.energy[0],table.energy[-1]))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
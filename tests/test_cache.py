@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test functions of TraceCache()
+"""
+
+import os
+import tempfile
+import unittest
+from feign.cache import *
+
+class TestTraceCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir=tempfile.TemporaryDirectory()
+        self.cache=TraceCache(self.tmpdir.name)
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    def test_key_content(self):
+        with self.subTest():
+            self.assertEqual(self.cache.key((Point(0,0),1.26)),self.cache.key([Point(0.0,0.0),1.26]))
+        with self.subTest():
+            self.assertNotEqual(self.cache.key((Point(0,0),1.26)),self.cache.key((Point(0,0),1.27)))
+        with self.subTest():
+            rect=Rectangle(Point(0,0),Point(0,1),Point(1,1),Point(1,0))
+            self.assertNotEqual(self.cache.key(rect),self.cache.key(Polygon(*rect.corners)))
+    def test_key_wrong(self):
+        with self.assertRaises(TypeError):
+            self.cache.key(object())
+    def test_store_load(self):
+        key=self.cache.key('a')
+        self.cache.store(key,dT=np.arange(6.0).reshape(2,3))
+        with self.subTest():
+            np.testing.assert_array_equal(self.cache.load(key)['dT'],np.arange(6.0).reshape(2,3))
+        with self.subTest():
+            self.assertIsNone(self.cache.load(self.cache.key('b')))
+    def test_evict_least_recently_used(self):
+        keys=[self.cache.key(k) for k in range(3)]
+        for k,key in enumerate(keys):
+            self.cache.store(key,dT=np.full(100,k))
+            os.utime(os.path.join(self.tmpdir.name,key+'.npz'),(k,k))
+        self.cache.load(keys[0])
+        size=sum(os.path.getsize(os.path.join(self.tmpdir.name,key+'.npz')) for key in keys)
+        self.cache.evict(size-1)
+        self.assertListEqual([self.cache.load(key) is None for key in keys],[False,True,False])
+    def test_listed_when_full(self):
+        from unittest import mock
+        cache=TraceCache(self.tmpdir.name,maxBytes=2**20)
+        with mock.patch('os.listdir',wraps=os.listdir) as listdir:
+            for k in range(10):
+                cache.store(cache.key(k),dT=np.full(100,k))
+            with self.subTest():
+                self.assertEqual(listdir.call_count,1)
+            cache.store(cache.key('large'),dT=np.random.default_rng(0).random(2**18))
+            with self.subTest():
+                self.assertEqual(listdir.call_count,2)
+        self.assertIsNone(cache.load(cache.key(0)))
+    def test_stale_temporary(self):
+        stale=os.path.join(self.tmpdir.name,'crashed.tmp')
+        writing=os.path.join(self.tmpdir.name,'writing.tmp')
+        for path in [stale,writing]:
+            with open(path,'wb') as f:
+                f.write(b'0'*100)
+        os.utime(stale,(0,0))
+        self.cache.store(self.cache.key('a'),dT=np.zeros(3))
+        with self.subTest():
+            self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(writing))
+
+if __name__ == '__main__':
+    unittest.main()
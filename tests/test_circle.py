@@ -51,6 +51,23 @@ class TestCircleIntersection(unittest.TestCase):
         self.assertTrue(len(c.intersection(s1)) == 1)
         
         
+class TestCircleIntersectionParams(unittest.TestCase):
+    def test_params_order(self):
+        c=Circle(Point(1,1),5)
+        s1=Segment(Point(9,1),Point(-8,1))
+        ts=c.intersection_params(s1)
+        self.assertTrue(s1.point_at(ts[0]).isEqual(Point(6,1)))
+    def test_params_same_as_points(self):
+        c=Circle(Point(1,1),5)
+        s1=Segment(Point(-9,-9),Point(9,9))
+        for t,inter in zip(c.intersection_params(s1),c.intersection(s1)):
+            with self.subTest():
+                self.assertTrue(s1.point_at(t).isEqual(inter))
+    def test_params_tangent(self):
+        c=Circle(Point(1,1),5)
+        s1=Segment(Point(-4,-8),Point(-4,10))
+        self.assertListEqual(c.intersection_params(s1),[])
+
 class TestCircleEncloses(unittest.TestCase):
     def test_encloses_in(self):
         c=Circle(Point(1,1),5)
@@ -61,6 +78,61 @@ class TestCircleEncloses(unittest.TestCase):
         P=Point(10,11)
         self.assertFalse(c.encloses_point(P))
 
+class TestCircleIntersectionVectorized(unittest.TestCase):
+    def test_params_through(self):
+        t1,t2=circle_intersection_params([[-9,1]],[[11,1]],[[1,1]],[5])
+        with self.subTest():
+            self.assertAlmostEqual(t1[0][0],0.25)
+        with self.subTest():
+            self.assertAlmostEqual(t2[0][0],0.75)
+    def test_params_one_end_inside(self):
+        t1,t2=circle_intersection_params([[3,1]],[[9,1]],[[1,1]],[5])
+        with self.subTest():
+            self.assertTrue(np.isnan(t1[0][0]))
+        with self.subTest():
+            self.assertAlmostEqual(t2[0][0],0.5)
+    def test_params_tangent(self):
+        t1,t2=circle_intersection_params([[-4,6]],[[4,6]],[[1,1]],[5])
+        self.assertTrue(np.isnan(t1[0][0]) and np.isnan(t2[0][0]))
+    def test_chords_shape(self):
+        chords=circle_chord_lengths([[-9,1],[1,-9],[7,7]],[[11,1],[1,11],[9,10]],[[1,1],[1,1]],[5,3])
+        self.assertEqual(chords.shape,(3,2))
+    def test_chords_as_scalar(self):
+        segs=[Segment(Point(-9,-9),Point(9,9)),Segment(Point(3,1),Point(9,1)),
+              Segment(Point(-4,-8),Point(-4,10)),Segment(Point(7,7),Point(9,10))]
+        c=Circle(Point(1,1),5)
+        chords=circle_chord_lengths([(s.p.x,s.p.y) for s in segs],[(s.q.x,s.q.y) for s in segs],[(1,1)],[5])
+        for seg,chord in zip(segs,chords[:,0]):
+            inters=c.intersection(seg)
+            if len(inters)==2:
+                D=inters[0].distance(inters[1])
+            elif len(inters)==1:
+                D=inters[0].distance(seg.p if c.encloses_point(seg.p) else seg.q)
+            else:
+                D=0.0
+            with self.subTest(seg=seg):
+                self.assertAlmostEqual(chord,D)
+
+class TestAnnularChords(unittest.TestCase):
+    def test_annular_through(self):
+        chords=annular_chord_lengths([3,5],0,9,18)
+        with self.subTest():
+            self.assertAlmostEqual(chords[0],6)
+        with self.subTest():
+            self.assertAlmostEqual(chords[1],4)
+    def test_annular_as_circle_chords(self):
+        p=np.array([[-9.,-9.],[3.,1.],[-4.,-8.],[7.,7.],[1.,1.5]])
+        q=np.array([[9.,9.],[9.,1.],[-4.,10.],[9.,10.],[-3.,-6.]])
+        radii=[2,3,5]
+        cumulative=circle_chord_lengths(p,q,[(1,1)]*3,radii)
+        expected=np.diff(cumulative,axis=1,prepend=0)
+        d=q-p
+        length=np.sqrt(d[:,0]**2+d[:,1]**2)
+        fx,fy=1-p[:,0],1-p[:,1]
+        b=np.abs(fx*d[:,1]-fy*d[:,0])/length
+        s=(fx*d[:,0]+fy*d[:,1])/length
+        np.testing.assert_allclose(annular_chord_lengths(radii,b,s,length),expected,atol=1e-9)
+
 if __name__ == '__main__':
     unittest.main()
 
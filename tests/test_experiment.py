@@ -10,6 +10,7 @@ functions only an Experiment() object will be manipulated.
 """
 
 
+import os
 import unittest
 from feign.blocks import *
 uo2=Material('1')
@@ -133,7 +134,61 @@ elines=['0.4971',
  '1.988',
  '2.112',
  '2.185']
- 
+
+
+dataDir=os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','data')
+
+dataElines=['0.662','1.205']
+
+def dataMaterials():
+    """the materials of the tests with the attenuation tables of the data directory"""
+    materials=[]
+    for material,name in zip([uo2,he,h2o,zr,ss,air],['UO2','He','H2O','Zr','SS','Air']):
+        dataMaterial=Material(material._id)
+        dataMaterial.set_density(material.density)
+        dataMaterial.set_path((os.path.join(dataDir,name+'.dat'),1))
+        materials.append(dataMaterial)
+    return materials
+
+def pwrExperiment(detectors=(F5,F15),absorbers=(),random=None,seed=None,symmetry=None,elines=None):
+    """the Experiment of the tests with the pwrOrig assembly"""
+    pwrClab=Experiment()
+    pwrClab.set_assembly(pwrOrig)
+    pwrClab.set_detectors(*detectors)
+    pwrClab.set_absorbers(*absorbers)
+    if elines is None:
+        pwrClab.set_materials(uo2,he,h2o,zr,ss,air)
+    else:
+        pwrClab.set_materials(*dataMaterials())
+        pwrClab.set_elines(elines)
+    if random is not None:
+        pwrClab.set_random(random)
+    if seed is not None:
+        pwrClab.set_seed(seed)
+    if symmetry is not None:
+        pwrClab.set_symmetry(symmetry)
+    return pwrClab
+
+def runResults(pwrClab):
+    """the results of a run, keys are (attribute, detector, material or energy line) tuples"""
+    results={}
+    for attr in ['dTmap','dTmapErr','contributionMap','contributionMapErr']:
+        if getattr(pwrClab,attr) is not None:
+            for det,maps in getattr(pwrClab,attr).items():
+                for key,value in maps.items():
+                    results[(attr,det,key)]=value
+    for attr in ['geomEff','geomEffErr']:
+        if getattr(pwrClab,attr) is not None:
+            for det,value in getattr(pwrClab,attr).items():
+                results[(attr,det)]=value
+    for attr in ['contributionMapAve','contributionMapAveErr']:
+        if getattr(pwrClab,attr) is not None:
+            for e,value in getattr(pwrClab,attr).items():
+                results[(attr,e)]=value
+    for attr in ['geomEffAve','geomEffAveErr']:
+        if getattr(pwrClab,attr) is not None:
+            results[(attr,)]=getattr(pwrClab,attr)
+    return results
 
 class TestExperimentCheckComplete(unittest.TestCase):
     def test_experiment_missing_assembly(self):
@@ -231,7 +286,548 @@ class TestExperimentCheckComplete(unittest.TestCase):
         pwrClab.set_absorbers(F5steel21mm)
         pwrClab.set_materials(uo2,he,h2o,zr,ss,air)
         self.assertTrue(pwrClab.checkComplete())
-        
+
+class TestExperimentEngines(unittest.TestCase):
+    def assertSameMaps(self,map1,map2):
+        for key in map1:
+            with self.subTest(material=key):
+                np.testing.assert_allclose(map1[key],map2[key],rtol=1e-9,atol=1e-9)
+    def test_engines_same_dTmap(self):
+        pwrClab=pwrExperiment(absorbers=[F5steel21mm])
+        for det in [F5,F15]:
+            dTmapLoop,sourceLoop=pwrClab.distanceTravelled(det)
+            pwrClab.set_engine('vectorized')
+            dTmapVec,sourceVec=pwrClab.distanceTravelled(det)
+            pwrClab.set_engine('loop')
+            self.assertSameMaps(dTmapLoop,dTmapVec)
+    def test_engines_same_dTmap_collimator(self):
+        coll=Collimator('coll')
+        coll.set_front(Segment(Point(100,-3),Point(100,4)))
+        coll.set_back(Segment(Point(120,-1),Point(120,2.5)))
+        F3=Detector('F3')
+        F3.set_location(Point(150,0))
+        F3.set_collimator(coll)
+        pwrClab=pwrExperiment(detectors=[F3])
+        dTmapLoop,sourceLoop=pwrClab.distanceTravelled(F3)
+        pwrClab.set_engine('vectorized')
+        dTmapVec,sourceVec=pwrClab.distanceTravelled(F3)
+        self.assertSameMaps(dTmapLoop,dTmapVec)
+    def test_engine_wrong(self):
+        with self.assertRaises(ValueError):
+            Experiment().set_engine('gpu')
+    def test_pin_tables_kept(self):
+        pwrClab=pwrExperiment(detectors=[F5])
+        tables=pwrClab._chordTables()
+        pwrClab.distanceTravelled(F5)
+        with self.subTest():
+            self.assertIs(pwrClab._chordTables(),tables)
+        with self.subTest():
+            self.assertIs(pwrClab._pinTables(),pwrClab._pinTables())
+        pwrClab.set_materials(uo2,he,h2o,zr,ss,air,Material('7'))
+        with self.subTest():
+            self.assertIsNot(pwrClab._chordTables(),tables)
+    def test_moved_collimator(self):
+        coll=Collimator('coll')
+        coll.set_front(Segment(Point(100,-3),Point(100,4)))
+        coll.set_back(Segment(Point(120,-1),Point(120,2.5)))
+        F3=Detector('F3')
+        F3.set_location(Point(150,0))
+        F3.set_collimator(coll)
+        pwrClab=pwrExperiment(detectors=[F3])
+        pwrClab.distanceTravelled(F3)
+        #the collimator and the detector are moved without the setters of the Experiment
+        coll.set_front(Segment(Point(-3,100),Point(4,100)))
+        coll.set_back(Segment(Point(-1,120),Point(2.5,120)))
+        F3.set_location(Point(0,150))
+        dTmap,source=pwrClab.distanceTravelled(F3)
+        fresh=pwrExperiment(detectors=[F3])
+        with self.subTest():
+            self.assertTrue(np.isfinite(dTmap['1']).any())
+        self.assertSameMaps(dTmap,fresh.distanceTravelled(F3)[0])
+
+class TestExperimentSymmetry(unittest.TestCase):
+    def test_symmetries_without_absorber(self):
+        pwrClab=pwrExperiment()
+        self.assertEqual(len(pwrClab.sceneSymmetries()),8)
+    def test_symmetries_with_absorber(self):
+        pwrClab=pwrExperiment(absorbers=[F5steel21mm])
+        self.assertNotIn((-1,0,0,-1),pwrClab.sceneSymmetries())
+    def test_symmetric_image(self):
+        pwrClab=pwrExperiment()
+        computed={'F5': pwrClab.distanceTravelled(F5)}
+        dTmapImage,sourceImage=pwrClab.symmetricImage(F15,computed)
+        dTmap,source=pwrClab.distanceTravelled(F15)
+        with self.subTest():
+            np.testing.assert_allclose(np.asarray(sourceImage),np.asarray(source))
+        for key in dTmap:
+            with self.subTest(material=key):
+                np.testing.assert_allclose(dTmapImage[key],dTmap[key],rtol=1e-9,atol=1e-9)
+
+class TestExperimentWorkers(unittest.TestCase):
+    def runWith(self,workers,absorbers=()):
+        pwrClab=pwrExperiment(absorbers=absorbers,random=3,seed=42,elines=dataElines)
+        pwrClab.Run(workers=workers)
+        return pwrClab
+    def test_workers_reproducible(self):
+        results1=runResults(self.runWith(1,[F5steel21mm]))
+        results2=runResults(self.runWith(2,[F5steel21mm]))
+        with self.subTest():
+            self.assertEqual(set(results1),set(results2))
+        for key in results1:
+            with self.subTest(key=key):
+                np.testing.assert_array_equal(results1[key],results2[key])
+    def test_colocated_detectors(self):
+        from feign.cache import traceMemory
+        A=Detector('A')
+        A.set_location(F5.location)
+        B=Detector('B')
+        B.set_location(F5.location)
+        exps=[]
+        for detectors,workers in [((A,B),None),((A,B),2),((B,),None)]:
+            traceMemory.clear()
+            pwrClab=pwrExperiment(detectors=detectors,random=2,seed=7,symmetry=False)
+            pwrClab.Run(workers=workers)
+            exps.append(pwrClab)
+        for mat in exps[0].dTmap['B']:
+            with self.subTest(mat=mat):
+                np.testing.assert_array_equal(exps[1].dTmap['B'][mat],exps[0].dTmap['B'][mat])
+                np.testing.assert_array_equal(exps[2].dTmap['B'][mat],exps[0].dTmap['B'][mat])
+        #the source locations are drawn from the stream of each detector
+        self.assertFalse(np.array_equal(exps[0].dTmap['A']['1'],exps[0].dTmap['B']['1']))
+    def test_workers_wrong(self):
+        with self.assertRaises(ValueError):
+            self.runWith(0)
+
+class TestExperimentShards(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.tmpdir=tempfile.TemporaryDirectory()
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    def experiment(self):
+        return pwrExperiment(absorbers=[F5steel21mm],random=3,seed=5,elines=dataElines)
+    def test_shards_same_as_run(self):
+        import os
+        full=self.experiment()
+        full.Run()
+        paths=[os.path.join(self.tmpdir.name,'shard%d.npz'%k) for k in range(3)]
+        self.experiment().RunShard(paths[0],samples=[0,2],detectors=['F5'])
+        self.experiment().RunShard(paths[1],samples=[1],detectors=['F5'])
+        self.experiment().RunShard(paths[2],detectors=['F15'])
+        merged=self.experiment()
+        merged.merge_shards(*paths)
+        fullResults=runResults(full)
+        mergedResults=runResults(merged)
+        with self.subTest():
+            self.assertEqual(set(mergedResults),set(fullResults))
+        for key in fullResults:
+            #the errors are summed up in another order
+            rtol=1e-6 if key[0].endswith('Err') else 1e-9
+            with self.subTest(key=key):
+                np.testing.assert_allclose(mergedResults[key],fullResults[key],rtol=rtol,atol=1e-9*np.max(fullResults[key]))
+    def test_shards_missing(self):
+        import os
+        path=os.path.join(self.tmpdir.name,'shard.npz')
+        self.experiment().RunShard(path,detectors=['F5'])
+        with self.assertRaises(ValueError):
+            self.experiment().merge_shards(path)
+    def test_shard_without_seed(self):
+        pwrClab=self.experiment()
+        pwrClab.set_seed(None)
+        with self.assertRaises(ValueError):
+            pwrClab.RunShard('shard.npz')
+
+class TestExperimentAsync(unittest.TestCase):
+    def experiment(self):
+        return pwrExperiment(absorbers=[F5steel21mm],random=2,seed=3,elines=dataElines)
+    def assertSameResults(self,exp1,exp2):
+        results1=runResults(exp1)
+        results2=runResults(exp2)
+        with self.subTest():
+            self.assertEqual(set(results1),set(results2))
+        for key in results1:
+            with self.subTest(key=key):
+                np.testing.assert_array_equal(results1[key],results2[key])
+    def test_async_same_as_run(self):
+        import asyncio
+        full=self.experiment()
+        full.Run()
+        progress=[]
+        pwrClab=self.experiment()
+        asyncio.run(pwrClab.run_async(progress=lambda done,total: progress.append((done,total))))
+        with self.subTest():
+            self.assertEqual(progress[-1],(4,4))
+        self.assertSameResults(pwrClab,full)
+    def test_async_cancel(self):
+        import asyncio
+        pwrClab=self.experiment()
+        async def run():
+            task=asyncio.current_task()
+            def progress(done,total):
+                if done==1:
+                    task.cancel()
+            await pwrClab.run_async(progress=progress)
+        with self.assertRaises(asyncio.CancelledError):
+            asyncio.run(run())
+        self.assertIsNone(pwrClab.dTmap)
+    def test_async_cancel_waits(self):
+        import time
+        import asyncio
+        from unittest import mock
+        active=[]
+        runUnit=Experiment._runUnit
+        def slow(experiment,*args,**kwargs):
+            active.append(True)
+            time.sleep(0.3)
+            try:
+                return runUnit(experiment,*args,**kwargs)
+            finally:
+                active.pop()
+        pwrClab=self.experiment()
+        async def run():
+            #cancelled while the second unit is being calculated
+            asyncio.get_running_loop().call_later(0.45,asyncio.current_task().cancel)
+            try:
+                await pwrClab.run_async()
+            except asyncio.CancelledError:
+                #nothing is calculated in the background any more
+                self.assertEqual(active,[])
+                raise
+        with mock.patch.object(Experiment,'_runUnit',slow):
+            with self.assertRaises(asyncio.CancelledError):
+                asyncio.run(run())
+        pwrClab.Run()
+        self.assertIsNotNone(pwrClab.dTmap)
+    def test_async_workers_not_on_loop(self):
+        import asyncio
+        import threading
+        from unittest import mock
+        onLoop=[]
+        runUnit=Experiment._runUnit
+        def recorded(experiment,*args,**kwargs):
+            onLoop.append(threading.current_thread() is threading.main_thread())
+            return runUnit(experiment,*args,**kwargs)
+        #F15 is derived from F5 by symmetry in the main process
+        pwrClab=pwrExperiment()
+        with mock.patch.object(Experiment,'_runUnit',recorded):
+            asyncio.run(pwrClab.run_async(workers=1))
+        self.assertEqual(onLoop,[False])
+    def test_async_workers_window(self):
+        import asyncio
+        #more traced units than submitted ahead by one worker
+        full=self.experiment()
+        full.set_random(6)
+        full.Run()
+        progress=[]
+        pwrClab=self.experiment()
+        pwrClab.set_random(6)
+        asyncio.run(pwrClab.run_async(workers=1,progress=lambda done,total: progress.append((done,total))))
+        with self.subTest():
+            self.assertEqual(progress[-1],(12,12))
+        self.assertSameResults(pwrClab,full)
+
+class TestExperimentIncremental(unittest.TestCase):
+    def setUp(self):
+        from feign.cache import traceMemory
+        traceMemory.clear()
+    def experiment(self,*absorbers):
+        return pwrExperiment(absorbers=absorbers,symmetry=False)
+    def traced(self,pwrClab):
+        from unittest import mock
+        with mock.patch.object(pwrClab,'_traceBase',wraps=pwrClab._traceBase) as traceBase:
+            pwrClab.Run()
+        return traceBase.call_count
+    def assertSameDTmap(self,exp1,exp2):
+        for det in exp1.dTmap:
+            for mat in exp1.dTmap[det]:
+                with self.subTest(det=det,mat=mat):
+                    np.testing.assert_array_equal(exp1.dTmap[det][mat],exp2.dTmap[det][mat])
+    def test_absorber_change_not_traced(self):
+        pwrClab=self.experiment()
+        with self.subTest():
+            self.assertEqual(self.traced(pwrClab),2)
+        pwrClab.add_absorber(F5steel21mm)
+        with self.subTest():
+            self.assertEqual(self.traced(pwrClab),0)
+        full=self.experiment(F5steel21mm)
+        full.Run()
+        self.assertSameDTmap(pwrClab,full)
+    def test_new_detector_traced_alone(self):
+        pwrClab=self.experiment()
+        pwrClab.Run()
+        F3=Detector('F3')
+        F3.set_location(Point(-174.726, 174.726))
+        pwrClab.add_detector(F3)
+        self.assertEqual(self.traced(pwrClab),1)
+    def test_moved_detector_traced(self):
+        F3=Detector('F3')
+        F3.set_location(Point(-174.726, 174.726))
+        pwrClab=self.experiment()
+        pwrClab.add_detector(F3)
+        pwrClab.Run()
+        F3.set_location(Point(-150.0, 174.726))
+        with self.subTest():
+            self.assertEqual(self.traced(pwrClab),1)
+        full=self.experiment()
+        full.add_detector(F3)
+        full.Run()
+        self.assertSameDTmap(pwrClab,full)
+    def test_cache_shared(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as directory:
+            pwrClab=self.experiment(F5steel21mm)
+            pwrClab.set_cache(directory)
+            pwrClab.Run()
+            other=self.experiment(F5steel21mm)
+            other.set_cache(directory)
+            with self.subTest():
+                self.assertEqual(self.traced(other),0)
+            self.assertSameDTmap(pwrClab,other)
+    def test_cache_random_per_detector(self):
+        import tempfile
+        from feign.cache import traceMemory
+        A=Detector('A')
+        A.set_location(F5.location)
+        B=Detector('B')
+        B.set_location(F5.location)
+        with tempfile.TemporaryDirectory() as directory:
+            pwrClab=pwrExperiment(detectors=[A],random=2,seed=7,symmetry=False)
+            pwrClab.set_cache(directory)
+            pwrClab.Run()
+            traceMemory.clear()
+            other=pwrExperiment(detectors=[B],random=2,seed=7,symmetry=False)
+            other.set_cache(directory)
+            with self.subTest():
+                self.assertEqual(self.traced(other),2)
+            traceMemory.clear()
+            fresh=pwrExperiment(detectors=[B],random=2,seed=7,symmetry=False)
+            fresh.Run()
+            self.assertSameDTmap(other,fresh)
+    def test_memory_random_per_detector(self):
+        import io
+        import contextlib
+        A=Detector('A')
+        A.set_location(F5.location)
+        B=Detector('B')
+        B.set_location(F5.location)
+        pwrClab=pwrExperiment(detectors=[A,B],random=2,seed=7,symmetry=False)
+        output=io.StringIO()
+        with contextlib.redirect_stdout(output):
+            with self.subTest():
+                self.assertEqual(self.traced(pwrClab),4)
+        self.assertNotIn('taken from the cache',output.getvalue())
+    def test_memory_shared(self):
+        from feign.cache import traceMemory
+        pwrClab=self.experiment()
+        pwrClab.Run()
+        other=self.experiment(F5steel21mm)
+        with self.subTest():
+            self.assertEqual(self.traced(other),0)
+        with self.subTest():
+            self.assertEqual(traceMemory.hits,2)
+        full=self.experiment(F5steel21mm)
+        traceMemory.set_maxBytes(0)
+        with self.subTest():
+            self.assertEqual(self.traced(full),2)
+        traceMemory.set_maxBytes(2**28)
+        self.assertSameDTmap(other,full)
+    def test_memory_not_modified(self):
+        pwrClab=self.experiment()
+        pwrClab.set_keep_samples(True)
+        pwrClab.Run()
+        source=np.array(pwrClab.sourcePoints[0]['F5'])
+        pwrClab.sourcePoints[0]['F5'].x[0,0]=1000.0
+        pwrClab.dTmap['F5']['1'][0,0]=-1.0
+        other=self.experiment()
+        other.set_keep_samples(True)
+        with self.subTest():
+            self.assertEqual(self.traced(other),0)
+        with self.subTest():
+            np.testing.assert_array_equal(np.array(other.sourcePoints[0]['F5']),source)
+        self.assertGreater(other.dTmap['F5']['1'][0,0],0.0)
+    def test_random_without_seed_traced(self):
+        pwrClab=self.experiment()
+        pwrClab.set_random(2)
+        pwrClab.Run()
+        self.assertEqual(self.traced(pwrClab),4)
+    def test_stages_per_detector(self):
+        pwrClab=self.experiment(F5steel21mm)
+        pwrClab.Run()
+        pwrClab.Run()
+        self.assertEqual(len(pwrClab._stages),2)
+    def test_random_stages_in_memory_cache(self):
+        pwrClab=self.experiment(F5steel21mm)
+        pwrClab.set_random(3)
+        pwrClab.set_seed(5)
+        pwrClab.Run(workers=2)
+        with self.subTest():
+            self.assertEqual(len(pwrClab._stages),0)
+        with self.subTest():
+            self.assertEqual(self.traced(pwrClab),0)
+        full=self.experiment(F5steel21mm)
+        full.set_random(3)
+        full.set_seed(5)
+        full.Run()
+        self.assertSameDTmap(pwrClab,full)
+    def test_stages_not_growing(self):
+        for workers in [None,2]:
+            for randomNum in [2,8]:
+                pwrClab=self.experiment(F5steel21mm)
+                pwrClab.set_random(randomNum)
+                pwrClab.set_seed(5)
+                pwrClab.Run(workers=workers)
+                with self.subTest(workers=workers,randomNum=randomNum):
+                    self.assertEqual(len(pwrClab._stages),0)
+
+class TestExperimentScan(unittest.TestCase):
+    def experiment(self,detector):
+        return pwrExperiment(detectors=[detector],absorbers=[F5steel21mm])
+    def test_scan_same_as_run(self):
+        path=[Point(174.726, 174.726),Point(150.0, 190.0)]
+        scan=self.experiment(F5).Scan(F5,path)
+        for p,location in enumerate(path):
+            F5b=Detector('F5')
+            F5b.set_location(location)
+            pwrClab=self.experiment(F5b)
+            pwrClab.Run()
+            for mat in pwrClab.dTmap['F5']:
+                with self.subTest(p=p,mat=mat):
+                    np.testing.assert_allclose(scan['dTmap'][mat][p],pwrClab.dTmap['F5'][mat],rtol=1e-9,atol=1e-9)
+    def test_engines_same(self):
+        path=[Point(174.726, 174.726),Point(150.0, 190.0)]
+        pwrClab=self.experiment(F5)
+        pwrClab.set_engine('vectorized')
+        vectorized=pwrClab.Scan(F5,path)
+        loop=self.experiment(F5).Scan(F5,path)
+        for mat in loop['dTmap']:
+            with self.subTest(mat=mat):
+                np.testing.assert_allclose(vectorized['dTmap'][mat],loop['dTmap'][mat],rtol=1e-9,atol=1e-9)
+    def test_traversal_reused(self):
+        path=[Point(174.726, 174.726+0.2*p) for p in range(4)]
+        pwrClab=self.experiment(F5)
+        pwrClab.set_engine('vectorized')
+        scan=pwrClab.Scan(F5,path)
+        #every ray is traversed by the loop engine
+        loop=self.experiment(F5).Scan(F5,path)
+        with self.subTest():
+            np.testing.assert_array_equal(loop['traced'],loop['traced'][0])
+        with self.subTest():
+            self.assertEqual(scan['traced'][0],loop['traced'][0])
+        with self.subTest():
+            self.assertTrue(np.all(scan['traced'][1:]<scan['traced'][0]/10))
+        F5b=Detector('F5')
+        F5b.set_location(path[-1])
+        pwrClab=self.experiment(F5b)
+        pwrClab.Run()
+        for mat in pwrClab.dTmap['F5']:
+            with self.subTest(mat=mat):
+                np.testing.assert_allclose(scan['dTmap'][mat][-1],pwrClab.dTmap['F5'][mat],rtol=1e-9,atol=1e-9)
+    def test_scan_function_path(self):
+        scan=self.experiment(F5).Scan(F5,lambda a: F5.location.rotate(a),ts=[0,45,90])
+        np.testing.assert_allclose(scan['locations'][2],[-174.726,174.726])
+    def test_scan_wrong_detector(self):
+        with self.assertRaises(ValueError):
+            self.experiment(F5).Scan(F15,[Point(0,200)])
+
+class TestExperimentSamples(unittest.TestCase):
+    def runWith(self,keepSamples=None,workers=None):
+        pwrClab=pwrExperiment(random=4,seed=5)
+        if keepSamples is not None:
+            pwrClab.set_keep_samples(keepSamples)
+        pwrClab.Run(workers=workers)
+        return pwrClab
+    def test_samples_not_kept(self):
+        pwrClab=self.runWith()
+        with self.subTest():
+            self.assertIsNone(pwrClab.dTmaps)
+        with self.subTest():
+            self.assertIsNone(pwrClab.sourcePoints)
+    def test_samples_kept(self):
+        pwrClab=self.runWith(True)
+        with self.subTest():
+            self.assertEqual(len(pwrClab.dTmaps),4)
+        for det in pwrClab.dTmap:
+            for mat in pwrClab.dTmap[det]:
+                dT=np.array([dTmap[det][mat] for dTmap in pwrClab.dTmaps])
+                with self.subTest(det=det,mat=mat):
+                    np.testing.assert_array_equal(pwrClab.dTmap[det][mat],np.mean(dT,axis=0))
+                    np.testing.assert_allclose(pwrClab.dTmapErr[det][mat],np.std(np.where(dT==np.Inf,0.0,dT),axis=0),rtol=1e-9,atol=1e-12)
+    def test_same_with_workers(self):
+        exp1=self.runWith(True)
+        exp2=self.runWith(workers=2)
+        for det in exp1.dTmap:
+            for mat in exp1.dTmap[det]:
+                with self.subTest(det=det,mat=mat):
+                    np.testing.assert_array_equal(exp1.dTmapErr[det][mat],exp2.dTmapErr[det][mat])
+    def test_keep_samples_wrong(self):
+        with self.assertRaises(TypeError):
+            Experiment().set_keep_samples(1)
+
+class TestExperimentAttenuation(unittest.TestCase):
+    def setUp(self):
+        self.pwrClab=pwrExperiment(detectors=[F5])
+        rng=np.random.default_rng(1)
+        N,M=pwrOrig.N,pwrOrig.M
+        self.dTmap={key: rng.uniform(0,2,(N,M)) for key in self.pwrClab.materials}
+        #blocked by the collimator
+        for key in self.dTmap:
+            self.dTmap[key][0,:5]=np.Inf
+        xs=(np.arange(M)-(M-1)/2)*pwrOrig.pitch
+        ys=((N-1)/2-np.arange(N))*pwrOrig.pitch
+        self.sourcePoint=PointArray(*np.meshgrid(xs,ys))
+        self.mues=[{key: 0.1*(k+1)*(e+1) for k,key in enumerate(self.pwrClab.materials)} for e in range(3)]
+    def muem(self,mues):
+        return np.array([[mue[key] for mue in mues] for key in self.pwrClab.materials])
+    def reference(self,mue):
+        contribmap=np.zeros((pwrOrig.N,pwrOrig.M))
+        for i in range(pwrOrig.N):
+            for j in range(pwrOrig.M):
+                if pwrOrig.fuelmap[i][j]!='1' or self.dTmap['1'][i][j]==np.Inf:
+                    continue
+                d2=(self.sourcePoint.x[i][j]-F5.location.x)**2+(self.sourcePoint.y[i][j]-F5.location.y)**2
+                contribmap[i][j]=np.exp(-sum(mue[key]*self.dTmap[key][i][j] for key in mue))/(4*np.pi*d2)
+        return contribmap
+    def test_attenuation_scalar(self):
+        for mue in self.mues:
+            np.testing.assert_allclose(self.pwrClab.attenuation(self.dTmap,mue,F5,self.sourcePoint),self.reference(mue),rtol=1e-12)
+    def test_attenuations_shape(self):
+        contribmaps=self.pwrClab.attenuations(self.dTmap,self.muem(self.mues),F5,self.sourcePoint)
+        with self.subTest():
+            self.assertEqual(contribmaps.shape,(3,pwrOrig.N,pwrOrig.M))
+        for e,mue in enumerate(self.mues):
+            with self.subTest(e=e):
+                np.testing.assert_allclose(contribmaps[e],self.pwrClab.attenuation(self.dTmap,mue,F5,self.sourcePoint),rtol=1e-12)
+    def test_zeros(self):
+        contribmaps=self.pwrClab.attenuations(self.dTmap,self.muem(self.mues),F5,self.sourcePoint)
+        guides=np.array(pwrOrig.fuelmap)=='3'
+        with self.subTest():
+            np.testing.assert_array_equal(contribmaps[:,guides],0.0)
+        with self.subTest():
+            np.testing.assert_array_equal(contribmaps[:,0,:5],0.0)
+        with self.subTest():
+            self.assertTrue(np.all(contribmaps[:,~guides][:,5:]>0))
+    def test_zero_attenuation(self):
+        mue=dict(self.mues[0])
+        mue['6']=0.0
+        contribmap=self.pwrClab.attenuation(self.dTmap,mue,F5,self.sourcePoint)
+        with self.subTest():
+            self.assertFalse(np.any(np.isnan(contribmap)))
+        np.testing.assert_allclose(contribmap,self.reference(mue),rtol=1e-12)
+
+class TestRunningMoments(unittest.TestCase):
+    def test_moments(self):
+        samples=np.random.default_rng(1).random((20,3,2))
+        moments=RunningMoments()
+        for sample in samples:
+            moments.add(sample)
+        with self.subTest():
+            np.testing.assert_array_equal(moments.mean,np.mean(samples,axis=0))
+        with self.subTest():
+            np.testing.assert_allclose(moments.std,np.std(samples,axis=0),rtol=1e-12)
+        with self.subTest():
+            mean,std=mergeMoments([moments.moments(),sampleMoments(samples)])
+            np.testing.assert_allclose(std,np.std(np.concatenate([samples,samples]),axis=0),rtol=1e-12)
+
 if __name__ == '__main__':
     unittest.main()
 
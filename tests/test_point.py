@@ -65,6 +65,36 @@ class TestDistance(unittest.TestCase):
     def test_distance_to_self(self):
         self.assertAlmostEqual(Point(3,4).distance(Point(3,4)),0,delta=0.000001)
     
+class TestImmutable(unittest.TestCase):
+    def test_point_immutable(self):
+        P=Point(3,4)
+        with self.assertRaises(AttributeError):
+            P.x=5
+    def test_point_hashable(self):
+        self.assertEqual({Point(3,4): 'a'}[Point(3,4)],'a')
+    def test_segment_immutable(self):
+        s=Segment(Point(0,0),Point(1,1))
+        with self.assertRaises(AttributeError):
+            s.p=Point(2,2)
+    def test_segment_equal(self):
+        s1=Segment(Point(0,0),Point(1,1))
+        s2=Segment(Point(0,0),Point(1,1))
+        with self.subTest():
+            self.assertEqual(s1,s2)
+        with self.subTest():
+            self.assertEqual(hash(s1),hash(s2))
+        with self.subTest():
+            self.assertNotEqual(s1,Segment(Point(1,1),Point(0,0)))
+    def test_circle_as_key(self):
+        cache={Circle(Point(1,1),5): 1}
+        self.assertIn(Circle(Point(1,1),5),cache)
+    def test_rectangle_pickle(self):
+        import pickle
+        rect=Rectangle(Point(0,1),Point(1,1),Point(1,0),Point(0,0))
+        self.assertEqual(pickle.loads(pickle.dumps(rect)),rect)
+    def test_rectangle_trusted(self):
+        rect=Rectangle(Point(0,1),Point(1,1),Point(1,0),Point(0,0))
+        self.assertEqual(Rectangle._trusted(*rect.corners),rect)
 
 
 if __name__ == '__main__':
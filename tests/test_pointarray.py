@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test functions of PointArray() and SegmentArray()
+"""
+
+import unittest
+from feign.geometry import *
+
+class TestPointArray(unittest.TestCase):
+    def test_pointarray_wrong_shape(self):
+        with self.assertRaises(ValueError):
+            pa=PointArray([1,2,3],[1,2])
+    def test_pointarray_getitem_point(self):
+        pa=PointArray([[1,2],[3,4]],[[5,6],[7,8]])
+        p=pa[1][0]
+        with self.subTest():
+            self.assertIsInstance(p,Point)
+        with self.subTest():
+            self.assertTrue(p.isEqual(Point(3,7)))
+    def test_pointarray_roundtrip(self):
+        points=[Point(1,2),Point(-3,4),Point(5.5,-6)]
+        back=PointArray.from_points(points).to_points()
+        self.assertTrue(all(p.isEqual(b) for p,b in zip(points,back)))
+    def test_pointarray_rotate(self):
+        pa=PointArray([10,10],[0,10]).rotate(45)
+        for p,q in zip(pa,[Point(10,0).rotate(45),Point(10,10).rotate(45)]):
+            with self.subTest():
+                self.assertTrue(p.isEqual(q))
+    def test_pointarray_translate(self):
+        pa=PointArray([10,0],[0,10]).translate(5,3)
+        self.assertTrue(pa[1].isEqual(Point(5,13)))
+    def test_pointarray_distance(self):
+        pa=PointArray([3,0],[4,0])
+        d=pa.distance(PointArray([0,0],[0,2]))
+        np.testing.assert_allclose(d,[5,2])
+    def test_pointarray_as_array(self):
+        pa=PointArray([1,2],[3,4])
+        np.testing.assert_allclose(np.asarray(pa),[[1,3],[2,4]])
+
+class TestSegmentArray(unittest.TestCase):
+    def test_segmentarray_length(self):
+        sa=SegmentArray(PointArray([0,1],[0,1]),PointArray([3,1],[4,4]))
+        np.testing.assert_allclose(sa.length,[5,3])
+    def test_segmentarray_roundtrip(self):
+        segs=[Segment(Point(0,0),Point(1,1)),Segment(Point(2,3),Point(-1,5))]
+        back=SegmentArray.from_segments(segs).to_segments()
+        for s,b in zip(segs,back):
+            with self.subTest():
+                self.assertTrue(s.p.isEqual(b.p) and s.q.isEqual(b.q))
+    def test_segmentarray_rotate(self):
+        sa=SegmentArray.from_segments([Segment(Point(10,0),Point(20,0))]).rotate(90)
+        self.assertTrue(sa[0].q.isEqual(Point(0,20)))
+    def test_segmentarray_distance(self):
+        sa=SegmentArray.from_segments([Segment(Point(-1,0),Point(1,0)),Segment(Point(2,0),Point(4,0))])
+        np.testing.assert_allclose(sa.distance(Point(0,3)),[3,np.sqrt(13)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test functions of Polygon()
+"""
+
+import unittest
+from feign.geometry import *
+
+hexagon=Polygon(*[Point(10,0).rotate(a) for a in range(0,360,60)])
+
+class TestPolygonDefinition(unittest.TestCase):
+    def test_polygon_concave_shape(self):
+        with self.assertRaises(ValueError):
+            poly=Polygon(Point(0,0),Point(10,0),Point(5,2),Point(10,10),Point(0,10))
+    def test_polygon_star_shape(self):
+        with self.assertRaises(ValueError):
+            poly=Polygon(*[Point(10,0).rotate(a) for a in range(0,720,144)])
+    def test_polygon_too_few_corners(self):
+        with self.assertRaises(ValueError):
+            poly=Polygon(Point(0,0),Point(10,0))
+    def test_polygon_clockwise(self):
+        poly=Polygon(*reversed([Point(10,0).rotate(a) for a in range(0,360,60)]))
+        self.assertEqual(len(poly.sides),6)
+    def test_rectangle_is_polygon(self):
+        rect=Rectangle(Point(-10,10),Point(10,10),Point(10,-10),Point(-10,-10))
+        self.assertIsInstance(rect,Polygon)
+
+class TestPolygonEnclosesPoint(unittest.TestCase):
+    def test_encloses_point_yes(self):
+        self.assertTrue(hexagon.encloses_point(Point(8,1)))
+    def test_encloses_point_no(self):
+        self.assertFalse(hexagon.encloses_point(Point(9.5,4)))
+    def test_encloses_points(self):
+        inside=hexagon.encloses_points([[8,1],[9.5,4],[0,0]])
+        self.assertListEqual(list(inside),[True,False,True])
+
+class TestPolygonIntersection(unittest.TestCase):
+    def test_intersection_through(self):
+        inters=hexagon.intersection(Segment(Point(-20,0),Point(20,0)))
+        with self.subTest():
+            self.assertEqual(len(inters),2)
+        with self.subTest():
+            self.assertAlmostEqual(inters[0].distance(inters[1]),20.0)
+    def test_intersection_one_endpoint_in(self):
+        inters=hexagon.intersection(Segment(Point(0,0),Point(0,20)))
+        with self.subTest():
+            self.assertEqual(len(inters),1)
+        with self.subTest():
+            self.assertAlmostEqual(inters[0].y,10*np.sqrt(3)/2)
+    def test_intersection_through_corner(self):
+        s=Segment(Point(10,-10),Point(10,10))
+        self.assertListEqual(hexagon.intersection(s),[])
+    def test_clip_params(self):
+        tin,tout=hexagon.clip_params([[-20,0],[-20,20]],[[20,0],[20,20]])
+        with self.subTest():
+            self.assertAlmostEqual((tout[0]-tin[0])*40,20.0)
+        with self.subTest():
+            self.assertTrue(np.isnan(tin[1]))
+
+class TestPolygonRotate(unittest.TestCase):
+    def test_rotate(self):
+        rotated=hexagon.rotate(30)
+        self.assertTrue(rotated.corners[0].isEqual(Point(10,0).rotate(30)))
+
+if __name__ == '__main__':
+    unittest.main()
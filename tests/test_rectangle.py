@@ -80,7 +80,49 @@ class TestRectIntersection(unittest.TestCase):
             self.assertTrue(inters[0].isEqual(Point(10,10)) or inters[1].isEqual(Point(10,10)))
         with self.subTest():
             self.assertTrue(inters[0].isEqual(Point(-10,-10)) or inters[1].isEqual(Point(-10,-10)))
-            
+
+
+class TestRectIntersectionParams(unittest.TestCase):
+    def test_rect_params_corner_out(self):
+        rect=Rectangle(Point(-10,10),Point(10,10),Point(10,-10),Point(-10,-10))
+        s=Segment(Point(0,20),Point(20,0))
+        self.assertListEqual(rect.intersection_params(s),[])
+    def test_rect_params_same_as_points(self):
+        rect=Rectangle(Point(-10,10),Point(10,10),Point(10,-10),Point(-10,-10))
+        s=Segment(Point(-30,30),Point(15,0))
+        for t,inter in zip(rect.intersection_params(s),rect.intersection(s)):
+            with self.subTest():
+                self.assertTrue(s.point_at(t).isEqual(inter))
+
+class TestConvexVectorized(unittest.TestCase):
+    def test_clip_as_scalar(self):
+        rect=Rectangle(Point(-10,10),Point(10,10),Point(10,-10),Point(-10,-10))
+        segs=[Segment(Point(11,11),Point(13,17)),Segment(Point(0,20),Point(20,0)),
+              Segment(Point(0,0),Point(0,20)),Segment(Point(0,15),Point(15,0)),
+              Segment(Point(-30,-30),Point(30,30)),Segment(Point(-3,2),Point(4,1))]
+        tin,tout=convex_clip_params([(s.p.x,s.p.y) for s in segs],[(s.q.x,s.q.y) for s in segs],
+                                    [(c.x,c.y) for c in rect.corners])
+        for s,a,b in zip(segs,tin,tout):
+            ts=[t for t in (a,b) if 0<=t<=1]
+            with self.subTest(seg=s):
+                self.assertEqual(sorted(ts),sorted(rect.intersection_params(s)))
+    def test_clip_many_polygons(self):
+        squares=[[[0,1],[1,1],[1,0],[0,0]],[[0,3],[1,3],[1,2],[0,2]]]
+        tin,tout=convex_clip_params([[-1,0.5]],[[3,0.5]],squares)
+        with self.subTest():
+            self.assertEqual(tin.shape,(1,2))
+        with self.subTest():
+            self.assertTrue(np.isnan(tin[0][1]))
+        with self.subTest():
+            self.assertAlmostEqual(tout[0][0]-tin[0][0],0.25)
+    def test_encloses_points(self):
+        rect=Rectangle(Point(3,7),Point(5,3),Point(13,5),Point(12,6))
+        points=[(6,5),(4,3),(5,3),(12,5.9)]
+        inside=convex_encloses_points(points,[(c.x,c.y) for c in rect.corners])
+        for P,ins in zip(points,inside):
+            with self.subTest(P=P):
+                self.assertEqual(ins,rect.encloses_point(Point(*P)))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -71,6 +71,46 @@ class TestSegmentIntersection(unittest.TestCase):
         s2=Segment(Point(-3,-4),Point(-6,-7))
         self.assertListEqual(s1.intersection(s2),[])
 
+class TestSegmentIntersectionParams(unittest.TestCase):
+    def test_params_yes(self):
+        s1=Segment(Point(2,2),Point(-2,-2))
+        s2=Segment(Point(-2,2),Point(2,-2))
+        self.assertAlmostEqual(s1.intersection_params(s2)[0],0.5)
+    def test_params_parallel(self):
+        s1=Segment(Point(3,4),Point(5,7))
+        s2=Segment(Point(1,4),Point(3,7))
+        self.assertListEqual(s1.intersection_params(s2),[])
+    def test_params_vertical_vertical(self):
+        s1=Segment(Point(3,4),Point(3,7))
+        s2=Segment(Point(1,4),Point(1,7))
+        self.assertListEqual(s1.intersection_params(s2),[])
+    def test_params_endpoint(self):
+        s1=Segment(Point(3,4),Point(7,4))
+        s2=Segment(Point(7,4),Point(1,9))
+        self.assertAlmostEqual(s1.intersection_params(s2)[0],0.0)
+    def test_point_at(self):
+        s=Segment(Point(1,1),Point(5,9))
+        self.assertTrue(s.point_at(0.25).isEqual(Point(2,3)))
+
+class TestSegmentVectorized(unittest.TestCase):
+    def test_params_as_scalar(self):
+        s1=Segment(Point(2,2),Point(-2,-2))
+        rays=[Segment(Point(-2,2),Point(2,-2)),Segment(Point(3,4),Point(5,7)),Segment(Point(7,4),Point(1,9))]
+        t=segment_intersection_params([(r.p.x,r.p.y) for r in rays],[(r.q.x,r.q.y) for r in rays],[(2,2)],[(-2,-2)])
+        for ray,ti in zip(rays,t[:,0]):
+            ts=s1.intersection_params(ray)
+            with self.subTest(ray=ray):
+                self.assertEqual(len(ts),0 if np.isnan(ti) else 1)
+    def test_view_halfplanes(self):
+        slit=Segment(Point(1,-1),Point(1,1))
+        planes=view_halfplanes(Point(0,0),slit)
+        points=[(2,0),(0.5,0),(2,3),(-2,0),(3,2.5)]
+        inside=halfplanes_contain(points,planes)
+        for P,isIn in zip(points,inside):
+            with self.subTest(P=P):
+                self.assertEqual(isIn,len(slit.intersection_params(Segment(Point(*P),Point(0,0))))==1)
+    def test_view_halfplanes_on_line(self):
+        self.assertIsNone(view_halfplanes(Point(1,5),Segment(Point(1,-1),Point(1,1))))
 
 
 if __name__ == '__main__':
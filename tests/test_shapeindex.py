@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test functions of ShapeIndex() and grid_traversal()
+"""
+
+import unittest
+import random
+from feign.geometry import *
+
+class TestGridTraversal(unittest.TestCase):
+    def test_traversal_diagonal(self):
+        cells=grid_traversal(Point(-1,0.5),Point(1.5,2.5),0,0,1,3,3)
+        self.assertListEqual(cells,[(0,1),(0,2),(1,2)])
+    def test_traversal_horizontal(self):
+        cells=grid_traversal(Point(2.5,0.5),Point(0.5,0.5),0,0,1,3,3)
+        self.assertListEqual(cells,[(2,0),(1,0),(0,0)])
+    def test_traversal_outside(self):
+        cells=grid_traversal(Point(-1,5),Point(5,6),0,0,1,3,3)
+        self.assertListEqual(cells,[])
+
+class TestShapeIndex(unittest.TestCase):
+    def test_bbox(self):
+        with self.subTest():
+            self.assertEqual(Circle(Point(1,1),2).bbox,(-1,-1,3,3))
+        with self.subTest():
+            self.assertEqual(Segment(Point(3,-1),Point(1,2)).bbox,(1,-1,3,2))
+        with self.subTest():
+            self.assertEqual(Rectangle(Point(0,1),Point(2,1),Point(2,0),Point(0,0)).bbox,(0,0,2,1))
+    def test_query_empty(self):
+        index=ShapeIndex({})
+        self.assertListEqual(index.query(Segment(Point(0,0),Point(1,1))),[])
+    def test_query_order(self):
+        index=ShapeIndex({'a': Circle(Point(0,0),1), 'b': Circle(Point(10,0),1), 'c': Circle(Point(0,10),1)})
+        self.assertListEqual(index.query(Segment(Point(12,0),Point(-2,0))),['b','a'])
+    def test_query_superset(self):
+        random.seed(5)
+        shapes={}
+        for k in range(50):
+            x,y=random.uniform(-20,20),random.uniform(-20,20)
+            if k%2:
+                shapes[k]=Circle(Point(x,y),random.uniform(0.1,2))
+            else:
+                shapes[k]=Rectangle(Point(x,y+1),Point(x+1,y+1),Point(x+1,y),Point(x,y))
+        index=ShapeIndex(shapes)
+        for _ in range(50):
+            seg=Segment(Point(random.uniform(-25,25),random.uniform(-25,25)),Point(random.uniform(-25,25),random.uniform(-25,25)))
+            candidates=index.query(seg)
+            for key,shape in shapes.items():
+                if len(shape.intersection_params(seg))>0:
+                    with self.subTest(key=key):
+                        self.assertIn(key,candidates)
+
+if __name__ == '__main__':
+    unittest.main()
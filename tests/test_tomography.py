@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test functions of SystemMatrix() and build_system_matrix()
+"""
+
+import os
+import tempfile
+import unittest
+from feign.blocks import *
+from feign.tomography import *
+
+dataDir=os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','data')
+
+def pgetExperiment():
+    uo2=Material('1')
+    uo2.set_density(10.5)
+    uo2.set_path((os.path.join(dataDir,'UO2.dat'),1))
+    h2o=Material('2')
+    h2o.set_density(1.0)
+    h2o.set_path((os.path.join(dataDir,'H2O.dat'),1))
+    fuel=Pin('1')
+    fuel.add_region(uo2,0.41)
+    water=Pin('2')
+    assy=Assembly(3,3)
+    assy.set_pitch(1.26)
+    assy.set_source(uo2)
+    assy.set_coolant(h2o)
+    assy.set_surrounding(h2o)
+    assy.set_pins(fuel,water)
+    assy.set_fuelmap([['1','1','1'],['1','2','1'],['1','1','1']])
+    det1=Detector('1')
+    det1.set_location(Point(20,0))
+    det2=Detector('2')
+    det2.set_location(Point(20,1.26))
+    coll=Collimator('2')
+    coll.set_front(Segment(Point(10,0.76),Point(10,1.76)))
+    coll.set_back(Segment(Point(15,0.76),Point(15,1.76)))
+    det2.set_collimator(coll)
+    experiment=Experiment()
+    experiment.set_assembly(assy)
+    experiment.set_detectors(det1,det2)
+    experiment.set_materials(uo2,h2o)
+    experiment.set_elines(['0.662','1.205'])
+    return experiment
+
+class TestSystemMatrix(unittest.TestCase):
+    def test_dot(self):
+        A=SystemMatrix(np.array([0,2,2,3]),np.array([0,2,1]),np.array([1.0,2.0,3.0]),(3,3))
+        np.testing.assert_array_equal(A.dot([1,10,100]),[201.0,0.0,30.0])
+    def test_inconsistent(self):
+        with self.assertRaises(ValueError):
+            SystemMatrix(np.array([0,2]),np.array([0,2,1]),np.array([1.0,2.0,3.0]),(1,3))
+
+class TestBuildSystemMatrix(unittest.TestCase):
+    def test_rows_as_run(self):
+        experiment=pgetExperiment()
+        matrices=build_system_matrix(experiment,[0,90,180])
+        experiment.set_symmetry(False)
+        experiment.Run()
+        A=matrices['0.662']
+        with self.subTest():
+            self.assertEqual(A.shape,(6,9))
+        for d,name in enumerate(experiment.detectors):
+            row=np.zeros(9)
+            start,end=A.indptr[3*d],A.indptr[3*d+1]
+            row[A.indices[start:end]]=A.data[start:end]
+            with self.subTest(detector=name):
+                np.testing.assert_allclose(row.reshape(3,3),experiment.contributionMap[name]['0.662'],rtol=1e-12)
+    def test_chunks(self):
+        from unittest import mock
+        experiment=pgetExperiment()
+        whole=build_system_matrix(experiment,[0,30,60,90,120])
+        with mock.patch.object(experiment,'Scan',wraps=experiment.Scan) as scan:
+            chunked=build_system_matrix(experiment,[0,30,60,90,120],chunk=2)
+        with self.subTest():
+            self.assertEqual([len(call.args[1]) for call in scan.call_args_list],[2,2,1,2,2,1])
+        for e in whole:
+            with self.subTest(e=e):
+                np.testing.assert_array_equal(chunked[e].indptr,whole[e].indptr)
+                np.testing.assert_array_equal(chunked[e].indices,whole[e].indices)
+                np.testing.assert_allclose(chunked[e].data,whole[e].data,rtol=1e-12)
+    def test_chunk_wrong(self):
+        with self.assertRaises(ValueError):
+            build_system_matrix(pgetExperiment(),[0,45],chunk=0)
+    def test_memmapped(self):
+        experiment=pgetExperiment()
+        inMemory=build_system_matrix(experiment,[0,45])
+        with tempfile.TemporaryDirectory() as directory:
+            mapped=build_system_matrix(experiment,[0,45],directory=directory)
+            for e in inMemory:
+                with self.subTest(e=e):
+                    np.testing.assert_array_equal(mapped[e].indptr,inMemory[e].indptr)
+                    np.testing.assert_array_equal(mapped[e].data,inMemory[e].data)
+            del mapped
+
+if __name__ == '__main__':
+    unittest.main()
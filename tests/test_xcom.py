@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test functions of MuTable(), interpolate(), TableCache() and Library()
+"""
+
+import os
+import io
+import pickle
+import tempfile
+import unittest
+import contextlib
+import numpy as np
+from feign.xcom import *
+from feign.blocks import Material, Experiment
+
+dataDir=os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','data')
+
+class TestMuTable(unittest.TestCase):
+    def setUp(self):
+        self.table=MuTable([0.1,0.2,0.2,0.4],[4.0,1.0,2.0,0.5])
+    def test_nodes(self):
+        np.testing.assert_allclose(self.table([0.1,0.4]),[4.0,0.5])
+    def test_loglog(self):
+        self.assertAlmostEqual(self.table(0.15),4.0*1.5**-2)
+    def test_edge(self):
+        with self.subTest():
+            self.assertAlmostEqual(self.table(0.2),2.0)
+        with self.subTest():
+            self.assertAlmostEqual(self.table(0.2*(1-1e-9)),1.0,places=6)
+    def test_outside(self):
+        np.testing.assert_allclose(self.table([0.01,1.0]),[4.0,0.5])
+    def test_not_increasing(self):
+        with self.assertRaises(ValueError):
+            MuTable([0.1,0.3,0.2],[1.0,1.0,1.0])
+    def test_interpolate_shape(self):
+        mu=interpolate({'a': self.table, 'b': MuTable([0.1,1.0],[1.0,1.0])},np.linspace(0.1,0.4,7))
+        self.assertEqual(mu.shape,(2,7))
+
+class TestTableCache(unittest.TestCase):
+    def setUp(self):
+        self.directory=tempfile.TemporaryDirectory()
+        self.path=os.path.join(self.directory.name,'mat.dat')
+        self.write([4.0,1.0,2.0,0.5])
+    def tearDown(self):
+        self.directory.cleanup()
+    def write(self,mu,mtime=None):
+        with open(self.path,'w') as f:
+            f.write('Photon    Tot. w/\nEnergy    Coherent\n\n')
+            for e,m in zip([0.1,0.2,0.2,0.4],mu):
+                f.write('%.3E %.3E %.3E \n'%(e,m,m/2))
+        if mtime is not None:
+            os.utime(self.path,ns=(mtime,mtime))
+    def test_parse(self):
+        np.testing.assert_array_equal(parse(self.path)[:,1],[4.0,1.0,2.0,0.5])
+    def test_hit(self):
+        cache=TableCache()
+        first=cache.get(self.path,1)
+        with self.subTest():
+            self.assertIs(cache.get(self.path,1),first)
+        with self.subTest():
+            self.assertEqual((cache.hits,cache.misses),(1,1))
+        with self.subTest():
+            self.assertAlmostEqual(cache.get(self.path,2)(0.4),0.25)
+    def test_changed_file(self):
+        cache=TableCache()
+        cache.get(self.path,1)
+        self.write([8.0,1.0,2.0,0.5],mtime=os.stat(self.path).st_mtime_ns+10**9)
+        self.assertAlmostEqual(cache.get(self.path,1)(0.1),8.0)
+    def test_sidecar(self):
+        TableCache(sidecar=True).get(self.path,1)
+        with self.subTest():
+            self.assertTrue(os.path.exists(self.path+'.npy'))
+        #a new process reads the sidecar, not the text
+        np.save(self.path+'.npy',np.array([[0.1,3.0],[0.4,3.0]]))
+        self.assertAlmostEqual(TableCache(sidecar=True).get(self.path,1)(0.2),3.0)
+    def test_wrong_column(self):
+        with self.assertRaises(ValueError):
+            TableCache().get(self.path,3)
+
+class TestLibrary(unittest.TestCase):
+    def setUp(self):
+        self.directory=tempfile.TemporaryDirectory()
+        self.path=os.path.join(self.directory.name,'materials.mulib')
+        pack(self.path,{'UO2': (os.path.join(dataDir,'UO2.dat'),1),
+                        'H2O': (os.path.join(dataDir,'H2O.dat'),1),
+                        'test': MuTable([0.1,1.0],[2.0,1.0])})
+    def tearDown(self):
+        self.directory.cleanup()
+    def test_entries(self):
+        library=Library(self.path)
+        with self.subTest():
+            self.assertEqual(library.names,['UO2','H2O','test'])
+        with self.subTest():
+            self.assertIsInstance(library._data,np.memmap)
+        with self.subTest():
+            self.assertEqual(library['UO2'](0.662),tableCache.get(os.path.join(dataDir,'UO2.dat'),1)(0.662))
+        with self.subTest():
+            with self.assertRaises(KeyError):
+                library['Pb']
+    def test_pickle(self):
+        library=pickle.loads(pickle.dumps(Library(self.path)))
+        self.assertAlmostEqual(library['test'](1.0),1.0)
+    def test_not_library(self):
+        with self.assertRaises(ValueError):
+            Library(os.path.join(dataDir,'UO2.dat'))
+    def test_shared(self):
+        self.assertIs(open_library(self.path),open_library(self.path))
+    def test_command_line(self):
+        path=os.path.join(self.directory.name,'cli.mulib')
+        with contextlib.redirect_stdout(io.StringIO()):
+            main(['pack',path,os.path.join(dataDir,'Pb.dat'),'lead='+os.path.join(dataDir,'Pb.dat:2')])
+        library=Library(path)
+        with self.subTest():
+            self.assertEqual(library.names,['Pb','lead'])
+        with self.subTest():
+            self.assertEqual(library['lead'](0.662),tableCache.get(os.path.join(dataDir,'Pb.dat'),2)(0.662))
+    def test_experiment(self):
+        uo2=Material('1')
+        uo2.set_path((os.path.join(dataDir,'UO2.dat'),1))
+        h2o=Material('2')
+        h2o.set_entry('H2O')
+        experiment=Experiment()
+        experiment.set_materials(uo2,h2o)
+        experiment.set_elines(['0.662','1.205'])
+        with self.subTest():
+            with self.assertRaises(ValueError):
+                experiment.get_MuTable()
+        experiment.set_library(self.path)
+        experiment.get_MuTable()
+        with self.subTest():
+            self.assertEqual(experiment.mu['1.205']['2'],tableCache.get(os.path.join(dataDir,'H2O.dat'),1)(1.205))
+        with self.subTest():
+            self.assertEqual(experiment.mu['0.662']['1'],Library(self.path)['UO2'](0.662))
+
+if __name__ == '__main__':
+    unittest.main()